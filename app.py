@@ -1,12 +1,16 @@
+import html
 import json
-import os
+from concurrent.futures import TimeoutError as FutureTimeout
+
 import streamlit as st
-import streamlit_antd_components as sac
 from dotenv import load_dotenv
 
 from utils.ai_engine import (
     analyze_prompt,
+    refine_best_of,
     refine_prompt,
+    regenerate_sections,
+    translate_to_english,
     AVAILABLE_MODELS,
     DEFAULT_MODEL,
     MODEL_TAGS,
@@ -14,6 +18,11 @@ from utils.ai_engine import (
     DEFAULT_TEMPLATE,
     QUESTION_TYPES,
     DEFAULT_QUESTION_TYPE,
+    ENGINE_REPORT_ENABLED,
+    get_repair_stats,
+    get_parse_stats,
+    get_prompt_stats,
+    get_best_of_stats,
 )
 from utils.auth import (
     _auth_available,
@@ -22,14 +31,48 @@ from utils.auth import (
     is_logged_in,
     should_show_login_screen,
 )
+from utils.cancellation import CallCancelled, get_cancel_stats
+from utils.key_pool import get_key_pool_stats
+from utils.context_compressor import compress_context
+from utils.history import (
+    load_history_entry,
+    save_history_entry,
+    search_history,
+)
+from utils.jobs import (
+    JOB_POLL_SECONDS,
+    cancel_jobs,
+    get_job,
+    get_job_stats,
+    heartbeat,
+    reattach_job,
+    submit_job,
+    take_job,
+)
 from utils.i18n import (
     get_language,
     set_language,
     t,
 )
+from utils.profiler import add_spans, finish_rerun, get_profile_summary, mark, start_rerun
 from utils.rate_limiter import (
+    get_job_owner,
     get_remaining_prompts,
 )
+from utils.section_mapper import affected_sections, section_tokens, word_diff_html
+from utils.security import validate_and_sanitize_stream
+from utils.session_store import (
+    MEMORY_REPORT_ENABLED,
+    enforce_working_set,
+    get_artifact,
+    memory_report,
+)
+from utils.template_recommender import (
+    recommend_template,
+    record_template_choice,
+)
+from utils.template_store import search_templates
+from utils.text_utils import estimate_tokens, looks_english
 from utils.ui_config import inject_custom_css
 
 load_dotenv()
@@ -42,27 +85,46 @@ st.set_page_config(
     initial_sidebar_state="collapsed",
 )
 
+# ── Profiling (PROFILE_RERUNS=1 or ?debug=profile) ─────────────────
+_debug = st.query_params.get("debug")
+start_rerun(enabled=_debug in ("profile", "all"), label=st.session_state.get("step", "input"))
+mark("session_state")
+
 # ── Session State ───────────────────────────────────────────────────
 def init_state():
     defaults = {
         "step": "input",
         "raw_prompt": "",
         "questions": [],
+        "questions_source": "ai",
+        "compression_stats": None,
+        "best_of_report": None,
         "answers": {},
         "refined_prompt": "",
+        "english_prompt": None,
+        "previous_refined_prompt": None,
+        "last_update": None,
+        "english_output": False,
+        "best_of": False,
         "guest_mode": False,
         "theme": "dark",
+        "template_chosen_manually": False,
+        "history_page": 0,
+        "templates_page": 0,
     }
     for k, v in defaults.items():
         if k not in st.session_state:
             st.session_state[k] = v
 
 init_state()
+enforce_working_set(st.session_state.step)
 
 # ── Inject Design System (dark theme only) ────────────────────────
+mark("inject_css")
 inject_custom_css(theme="dark")
 
 # ── Login Logic (DISABLED) ──────────────────────────────────────────
+mark("login")
 if should_show_login_screen():
     col1, col2, col3 = st.columns([1, 2, 1])
     with col2:
@@ -79,18 +141,191 @@ if should_show_login_screen():
     st.stop()
 
 # ── User Context ────────────────────────────────────────────────────
+mark("user_context")
 user_id, is_anon = get_user_identifier()
 remaining = get_remaining_prompts(user_id, is_anon)
 
-# ── Load sidebar templates from data/ ───────────────────────────────
-_templates_file = os.path.join(os.path.dirname(__file__), "data", "templates.json")
-with open(_templates_file, "r", encoding="utf-8") as f:
-    _sidebar_templates = json.load(f)
+# ── Engine Jobs ─────────────────────────────────────────────────────
+# Upstream calls run off the script thread and belong to the client token
+# in the URL, so a reload or reconnect resumes them instead of calling
+# again; a call that belongs to a step the user has left (Back, Start
+# Over, history) is cancelled.
+def _analyze_fingerprint(raw: str, model: str, question_type: str, output_template: str) -> str:
+    return "\x00".join([raw.strip(), model, question_type, output_template])
+
+
+def _refine_fingerprint(
+    raw: str, answers: dict, model: str, output_template: str, english: bool, best_of: bool
+) -> str:
+    return "\x00".join([
+        raw.strip(), json.dumps(answers, sort_keys=True), model, output_template, str(english), str(best_of)
+    ])
+
+
+def _run_refinement(raw_prompt, answers, model, output_template, english, best_of=False, cancel_token=None):
+    """Compress the context and refine (once, or best-of-N); runs on the job pool."""
+    compact_prompt, compact_answers, compression_stats = compress_context(raw_prompt, answers)
+    report = None
+    if best_of:
+        refined, report = refine_best_of(
+            compact_prompt,
+            compact_answers,
+            model=model,
+            output_template=output_template,
+            english=english,
+            cancel_token=cancel_token,
+        )
+    else:
+        refined = refine_prompt(
+            compact_prompt,
+            compact_answers,
+            model=model,
+            output_template=output_template,
+            english=english,
+            cancel_token=cancel_token,
+        )
+    return refined, compression_stats, report
+
+
+def _run_answer_update(
+    raw_prompt, old_refined, answers, sections, model, output_template, english, best_of=False, cancel_token=None
+):
+    """
+    Rewrite the sections affected by edited answers, or refine again when
+    no section could be mapped; runs on the job pool.
+    """
+    report = None
+    if sections:
+        compact_prompt, compact_answers, _ = compress_context(raw_prompt, answers)
+        refined = regenerate_sections(
+            old_refined, compact_prompt, compact_answers, sections,
+            model=model, output_template=output_template, english=english, cancel_token=cancel_token,
+        )
+    else:
+        refined, _, report = _run_refinement(
+            raw_prompt, answers, model, output_template, english, best_of, cancel_token=cancel_token
+        )
+    return refined, old_refined, answers, sections, report
+
+
+# The step a job's result moves the session to
+_RESULT_STEPS = {"analyze": "questions", "refine": "result", "update": "result", "translate": "result"}
+
+
+def _await_job(job, message: str):
+    """
+    Wait briefly for ``job``. Returns its result once done (None if it was
+    cancelled); otherwise reruns the script to poll again.
+    """
+    if not job.done():
+        st.button(t("job_cancel_button"), key=f"cancel_job_{job.id}",
+                  on_click=cancel_jobs, args=(job.owner, "cancelled by user"))
+        with st.spinner(message):
+            try:
+                job.future.result(timeout=JOB_POLL_SECONDS)
+            except FutureTimeout:
+                pass
+            except Exception:
+                pass  # re-raised below once the job is done
+        if not job.done():
+            st.rerun()
+    if take_job(job, _RESULT_STEPS[job.kind]):
+        add_spans(job.trace)
+    try:
+        return job.future.result()
+    except CallCancelled:
+        return None
+
+
+def _apply_questions(result) -> None:
+    st.session_state.questions = result["questions"]
+    st.session_state.questions_source = result.get("source", "ai")
+    st.session_state.step = "questions"
+
+
+def _apply_refinement(result, save: bool = True) -> None:
+    refined, compression_stats, best_of_report = result
+    st.session_state.refined_prompt = refined
+    st.session_state.english_prompt = None
+    st.session_state.previous_refined_prompt = None
+    st.session_state.last_update = None
+    st.session_state.compression_stats = compression_stats
+    st.session_state.best_of_report = best_of_report
+    if save:
+        save_history_entry(
+            user_id,
+            get_artifact("raw_prompt", ""),
+            get_artifact("questions", []),
+            get_artifact("answers", {}),
+            refined,
+            template=st.session_state.get('selected_template'),
+            model=st.session_state.get('selected_model'),
+        )
+    st.session_state.step = "result"
+
+
+def _apply_answer_update(result, save: bool = True) -> None:
+    refined, old_refined, answers, sections, best_of_report = result
+    output_template = st.session_state.get('selected_template', DEFAULT_TEMPLATE)
+    st.session_state.previous_refined_prompt = old_refined
+    st.session_state.last_update = {
+        "sections": ", ".join(sections) or t("step3_all_sections"),
+        "output_tokens": (
+            section_tokens(refined, OUTPUT_TEMPLATES[output_template], sections)
+            if sections else estimate_tokens(refined)
+        ),
+        "full_tokens": estimate_tokens(refined),
+    }
+    st.session_state.refined_prompt = refined
+    st.session_state.answers = answers
+    st.session_state.english_prompt = None
+    if best_of_report is not None:
+        st.session_state.best_of_report = best_of_report
+    if save:
+        save_history_entry(
+            user_id,
+            get_artifact("raw_prompt", ""),
+            get_artifact("questions", []),
+            answers,
+            refined,
+            template=output_template,
+            model=st.session_state.get('selected_model'),
+        )
+    st.session_state.step = "result"
+
+
+def _resume_job(job) -> None:
+    """Rebuild a new session around a job a previous session started."""
+    for key, value in job.context.items():
+        st.session_state[key] = value
+    if not job.taken:
+        st.session_state.step = job.step
+    else:
+        # The lost session already applied (and saved) this result
+        if job.kind == "analyze":
+            _apply_questions(job.future.result())
+        elif job.kind == "update":
+            _apply_answer_update(job.future.result(), save=False)
+        elif job.kind == "translate":
+            st.session_state.english_prompt = job.future.result()
+        else:
+            _apply_refinement(job.future.result(), save=False)
+
+
+job_owner = get_job_owner(user_id, is_anon)
+heartbeat(job_owner)
+if "jobs_resume_checked" not in st.session_state:
+    st.session_state.jobs_resume_checked = True
+    resumed_job = reattach_job(job_owner)
+    if resumed_job is not None:
+        _resume_job(resumed_job)
+cancel_jobs(job_owner, "navigated away", keep_step=st.session_state.step)
 
 # ── Sidebar ─────────────────────────────────────────────────────────
 
 with st.sidebar:
     # 1. Header
+    mark("sidebar.header")
     st.markdown(f"<div style='margin-bottom: 0.5rem; font-weight:700; font-size:1.2rem;'>Prompt <span style='color:#FACC15'>Improver</span></div>", unsafe_allow_html=True)
     st.markdown(f"<div style='margin-bottom: 2rem; color: #94A3B8; font-size:0.85rem;'>{t('app_subtitle')}</div>", unsafe_allow_html=True)
 
@@ -108,11 +343,12 @@ with st.sidebar:
         )
 
     # 3. Templates (Dropdown)
+    mark("sidebar.templates")
     # Prepare menu items
     with st.expander(t("sidebar_templates"), expanded=False):
         lang = get_language()
         
-        # Helper to map bootstrap icons to emojis for standard st.radio
+        # Helper to map bootstrap icons to emojis for the template buttons
         def _get_icon_emoji(icon_name):
             return {
                 "file-text": "📄",
@@ -135,34 +371,91 @@ with st.sidebar:
                 "robot": "🤖"
             }.get(icon_name, "📄")
 
-        # Create options map
-        template_options = list(_sidebar_templates.keys())
-        
-        def _format_template(name):
-            data = _sidebar_templates[name]
-            icon = data.get("icon", "file-text")
-            return f"{_get_icon_emoji(icon)}  {name}"
-
-        selected_item = st.radio(
-            "Select Template",
-            options=template_options,
-            format_func=_format_template,
+        def _reset_templates_page():
+            st.session_state.templates_page = 0
+
+        templates_query = st.text_input(
+            "Search templates",
+            key="templates_query",
+            placeholder=t("templates_search_placeholder"),
             label_visibility="collapsed",
-            key="templates_radio"
+            on_change=_reset_templates_page,
         )
+        # Only one page is read from the store, however large the library
+        page_templates, templates_has_more = search_templates(
+            templates_query, page=st.session_state.templates_page
+        )
+        if not page_templates:
+            st.caption(t("templates_empty"))
+        for template_data in page_templates:
+            label = f"{_get_icon_emoji(template_data['icon'])}  {template_data['name']}"
+            if st.button(label, key=f"template_{template_data['template_id']}", use_container_width=True):
+                template_text = template_data.get(lang) or template_data.get("en", "")
+                st.session_state.raw_prompt = template_text
+                st.session_state.input_prompt = template_text
+                st.session_state.step = "input"
+                st.rerun()
 
-    # Handle Template Selection
-    if selected_item and selected_item in _sidebar_templates:
-        if st.session_state.get("last_selected_template") != selected_item:
-            template_data = _sidebar_templates[selected_item]
-            template_text = template_data.get(lang, template_data.get("en", ""))
-            st.session_state.raw_prompt = template_text
-            st.session_state.input_prompt = template_text
-            st.session_state.step = "input"
-            st.session_state.last_selected_template = selected_item
-            st.rerun()
+        col_prev, col_next = st.columns(2)
+        with col_prev:
+            if st.session_state.templates_page > 0 and st.button(t("history_prev"), key="templates_prev"):
+                st.session_state.templates_page -= 1
+                st.rerun()
+        with col_next:
+            if templates_has_more and st.button(t("history_next"), key="templates_next"):
+                st.session_state.templates_page += 1
+                st.rerun()
+
+    # 4. History (Dropdown)
+    mark("sidebar.history")
+    with st.expander(t("sidebar_history"), expanded=False):
+        def _reset_history_page():
+            st.session_state.history_page = 0
+
+        history_query = st.text_input(
+            "Search history",
+            key="history_query",
+            placeholder=t("history_search_placeholder"),
+            label_visibility="collapsed",
+            on_change=_reset_history_page,
+        )
+        history_entries, history_has_more = search_history(
+            user_id, history_query, page=st.session_state.history_page
+        )
+        if not history_entries:
+            st.caption(t("history_empty"))
+        for entry in history_entries:
+            if st.button(entry["title"], key=f"history_{entry['id']}", use_container_width=True):
+                restored = load_history_entry(user_id, entry["id"])
+                if restored:
+                    st.session_state.raw_prompt = restored["raw_prompt"]
+                    st.session_state.input_prompt = restored["raw_prompt"]
+                    st.session_state.questions = restored["questions"]
+                    st.session_state.answers = restored["answers"]
+                    st.session_state.refined_prompt = restored["refined_prompt"]
+                    st.session_state.english_prompt = None
+                    st.session_state.previous_refined_prompt = None
+                    st.session_state.last_update = None
+                    st.session_state.compression_stats = None
+                    st.session_state.best_of_report = None
+                    if restored["template"] in OUTPUT_TEMPLATES:
+                        st.session_state.selected_template = restored["template"]
+                        st.session_state.template_chosen_manually = True
+                    st.session_state.step = "result"
+                    st.rerun()
+
+        col_prev, col_next = st.columns(2)
+        with col_prev:
+            if st.session_state.history_page > 0 and st.button(t("history_prev"), key="history_prev"):
+                st.session_state.history_page -= 1
+                st.rerun()
+        with col_next:
+            if history_has_more and st.button(t("history_next"), key="history_next"):
+                st.session_state.history_page += 1
+                st.rerun()
 
-    # 4. Settings (Dropdown)
+    # 5. Settings (Dropdown)
+    mark("sidebar.settings")
     with st.expander(t("settings_title"), expanded=False):
         # Language Options
         current_lang = get_language()
@@ -183,7 +476,11 @@ with st.sidebar:
                 set_language(new_lang)
                 st.rerun()
 
-    # 5. Creator Profile
+        st.checkbox(t("settings_english_output"), key="english_output")
+        st.checkbox(t("settings_best_of"), key="best_of", help=t("settings_best_of_help"))
+
+    # 6. Creator Profile
+    mark("sidebar.creator")
     st.markdown("---")
     st.markdown(f"**{t('sidebar_creator_title')}**")
     
@@ -203,6 +500,10 @@ with st.sidebar:
 
 
 # ── Main Content Layout ─────────────────────────────────────────────
+# Characters of the raw prompt shown above the questions
+_PREVIEW_CHARS = 400
+
+mark("main.options")
 left_col, main_col, right_col = st.columns([1, 6, 1])
 
 with main_col:
@@ -228,11 +529,27 @@ with main_col:
         )
     with col_template:
         template_names = list(OUTPUT_TEMPLATES.keys())
+
+        # Preselect the locally recommended format until the user picks one;
+        # not while an analysis runs, since its fingerprint includes the format
+        if (
+            not st.session_state.template_chosen_manually
+            and st.session_state.step == "input"
+            and get_job(job_owner) is None
+        ):
+            suggestion_source = st.session_state.get("input_prompt")
+            if suggestion_source is None:
+                suggestion_source = get_artifact("raw_prompt", "")
+            st.session_state.selected_template = recommend_template(suggestion_source)
+
+        def _mark_template_manual():
+            st.session_state.template_chosen_manually = True
+
         selected_template = st.selectbox(
             "Output Format",
             options=template_names,
-            index=template_names.index(DEFAULT_TEMPLATE),
             key="selected_template",
+            on_change=_mark_template_manual,
         )
     with col_questions:
         selected_q_type = st.selectbox(
@@ -245,14 +562,35 @@ with main_col:
 
     # ━━ STEP 1: INPUT ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
     if st.session_state.step == "input":
+        mark("step.input")
+        def _load_uploaded_prompt():
+            uploaded = st.session_state.get("prompt_upload")
+            st.session_state.upload_error = None
+            if uploaded is None:
+                return
+            text, error = validate_and_sanitize_stream(uploaded)
+            if error:
+                st.session_state.upload_error = error
+            else:
+                st.session_state.raw_prompt = text
+                st.session_state.input_prompt = text
+
         st.text_area(
             "Input Prompt", 
-            value=st.session_state.raw_prompt,
+            value=get_artifact("raw_prompt", ""),
             height=200,
             key="input_prompt",
             placeholder=t("step1_placeholder"),
             label_visibility="collapsed"
         )
+        st.file_uploader(
+            t("step1_upload_label"),
+            type=["txt", "md", "markdown", "rst", "csv", "json", "yaml", "yml", "py", "js", "ts", "java", "go", "rs", "html", "sql"],
+            key="prompt_upload",
+            on_change=_load_uploaded_prompt,
+        )
+        if st.session_state.get("upload_error"):
+            st.error(st.session_state.upload_error)
         
         col_actions = st.columns([4, 1])
         with col_actions[1]:
@@ -262,28 +600,60 @@ with main_col:
                     st.warning(t("step1_empty_error"))
                 else:
                     st.session_state.raw_prompt = raw
-                    with st.spinner(t("spinner_analyzing")):
-                        try:
-                            result = analyze_prompt(
-                                raw,
-                                model=selected_model,
-                                question_type=selected_q_type,
-                                output_template=selected_template,
-                            )
-                            st.session_state.questions = result["questions"]
-                            st.session_state.step = "questions"
-                            st.rerun()
-                        except Exception as e:
-                            st.error(str(e))
+                    # Learn only from formats the user picked, not from our own suggestions
+                    if st.session_state.template_chosen_manually:
+                        record_template_choice(raw, selected_template)
+                    submit_job(
+                        job_owner, "input", "analyze",
+                        _analyze_fingerprint(raw, selected_model, selected_q_type, selected_template),
+                        {
+                            "raw_prompt": raw,
+                            "selected_model": selected_model,
+                            "selected_q_type": selected_q_type,
+                            "selected_template": selected_template,
+                            "template_chosen_manually": True,
+                        },
+                        analyze_prompt,
+                        raw,
+                        model=selected_model,
+                        question_type=selected_q_type,
+                        output_template=selected_template,
+                    )
+                    st.rerun()
+
+        analyze_job = get_job(job_owner)
+        if analyze_job is not None and analyze_job.kind == "analyze":
+            current = _analyze_fingerprint(
+                st.session_state.input_prompt, selected_model, selected_q_type, selected_template
+            )
+            if analyze_job.fingerprint != current:
+                # The prompt or options changed mid-call: that answer is no longer wanted
+                cancel_jobs(job_owner, "inputs changed")
+            else:
+                try:
+                    result = _await_job(analyze_job, t("spinner_analyzing"))
+                    if result is not None:
+                        _apply_questions(result)
+                        st.rerun()
+                except Exception as e:
+                    st.error(str(e))
 
     # ━━ STEP 2: QUESTIONS ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
     elif st.session_state.step == "questions":
-        st.markdown(f"<div style='padding:1rem; border:1px solid var(--border-color); border-radius:0.5rem; margin-bottom:2rem; background:var(--bg-surface); color:var(--text-secondary);'><em>{st.session_state.raw_prompt}</em></div>", unsafe_allow_html=True)
+        mark("step.questions")
+        # Escaped (an uploaded .html must not render) and short (uploads can be megabytes)
+        raw_preview = get_artifact('raw_prompt', '')
+        if len(raw_preview) > _PREVIEW_CHARS:
+            raw_preview = raw_preview[:_PREVIEW_CHARS].rstrip() + " …"
+        st.markdown(f"<div style='padding:1rem; border:1px solid var(--border-color); border-radius:0.5rem; margin-bottom:2rem; background:var(--bg-surface); color:var(--text-secondary);'><em>{html.escape(raw_preview)}</em></div>", unsafe_allow_html=True)
         
+        if st.session_state.questions_source == "fallback":
+            st.info(t("step2_offline_notice"))
+
         with st.form("questions_form"):
             st.markdown(f"### {t('step2_title')}")
             answers = {}
-            for i, q in enumerate(st.session_state.questions):
+            for i, q in enumerate(get_artifact("questions", [])):
                 st.markdown(f"**{i+1}. {q}**")
                 answers[q] = st.text_input(f"answer_{i}", label_visibility="collapsed", placeholder=t("step2_answer_help"))
             
@@ -296,31 +666,236 @@ with main_col:
             with c2:
                 if st.form_submit_button(t("step2_generate_button"), type="primary"):
                     st.session_state.answers = answers
-                    with st.spinner(t("spinner_refining")):
-                        try:
-                            refined = refine_prompt(
-                                st.session_state.raw_prompt,
-                                answers,
-                                model=st.session_state.get('selected_model', DEFAULT_MODEL),
-                                output_template=st.session_state.get('selected_template', DEFAULT_TEMPLATE),
-                            )
-                            st.session_state.refined_prompt = refined
-                            st.session_state.step = "result"
-                            st.rerun()
-                        except Exception as e:
-                            st.error(str(e))
+                    raw = get_artifact("raw_prompt", "")
+                    model = st.session_state.get('selected_model', DEFAULT_MODEL)
+                    output_template = st.session_state.get('selected_template', DEFAULT_TEMPLATE)
+                    english = st.session_state.english_output
+                    best_of = st.session_state.best_of
+                    submit_job(
+                        job_owner, "questions", "refine",
+                        _refine_fingerprint(raw, answers, model, output_template, english, best_of),
+                        {
+                            "raw_prompt": raw,
+                            "questions": get_artifact("questions", []),
+                            "questions_source": st.session_state.questions_source,
+                            "answers": answers,
+                            "selected_model": model,
+                            "selected_template": output_template,
+                            "template_chosen_manually": True,
+                            "english_output": english,
+                            "best_of": best_of,
+                        },
+                        _run_refinement,
+                        raw,
+                        answers,
+                        model,
+                        output_template,
+                        english,
+                        best_of,
+                    )
+                    st.rerun()
+
+        refine_job = get_job(job_owner)
+        if refine_job is not None and refine_job.kind == "refine":
+            try:
+                result = _await_job(refine_job, t("spinner_refining"))
+                if result is not None:
+                    _apply_refinement(result)
+                    st.rerun()
+            except Exception as e:
+                st.error(str(e))
 
     # ━━ STEP 3: RESULT ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
     elif st.session_state.step == "result":
+        mark("step.result")
         st.success(t("step3_success") if t("step3_success") != "step3_success" else "Prompt Refined Successfully!")
         st.markdown(f"### {t('step3_title') if t('step3_title') != 'step3_title' else 'Final Prompt'}")
-        st.code(st.session_state.refined_prompt, language="markdown")
+        st.code(get_artifact("refined_prompt", ""), language="markdown")
+
+        stats = st.session_state.compression_stats
+        if stats and stats["tokens_saved"] > 0:
+            st.caption(t("step3_tokens_saved").format(**stats))
+        best_of_report = st.session_state.best_of_report
+        if best_of_report:
+            st.caption(t("step3_best_of").format(**best_of_report))
+
+        # ── Changes from the last answer edit ──
+        previous_text = get_artifact("previous_refined_prompt")
+        last_update = st.session_state.last_update
+        if previous_text is not None and last_update:
+            st.caption(t("step3_update_stats").format(**last_update))
+            with st.expander(t("step3_diff_title"), expanded=True):
+                st.html(
+                    "<div style='white-space: pre-wrap; font-family: monospace; font-size: 0.85rem;'>"
+                    f"{word_diff_html(previous_text, get_artifact('refined_prompt', ''))}</div>"
+                )
+
+        # ── Edit answers: regenerate only the sections they affect ──
+        current_answers = get_artifact("answers", {})
+        if current_answers:
+            with st.expander(t("step3_edit_answers")):
+                with st.form("edit_answers_form"):
+                    edited = {
+                        q: st.text_input(q, value=a, key=f"edit_answer_{i}")
+                        for i, (q, a) in enumerate(current_answers.items())
+                    }
+                    if st.form_submit_button(t("step3_update_button"), type="primary"):
+                        changed = {
+                            q: (current_answers[q], a) for q, a in edited.items() if a != current_answers[q]
+                        }
+                        if not changed:
+                            st.info(t("step3_no_changes"))
+                        else:
+                            output_template = st.session_state.get('selected_template', DEFAULT_TEMPLATE)
+                            model = st.session_state.get('selected_model', DEFAULT_MODEL)
+                            english = st.session_state.english_output
+                            best_of = st.session_state.best_of
+                            raw = get_artifact("raw_prompt", "")
+                            old_refined = get_artifact("refined_prompt", "")
+                            sections = affected_sections(changed, OUTPUT_TEMPLATES[output_template], old_refined)
+                            submit_job(
+                                job_owner, "result", "update",
+                                _refine_fingerprint(raw, edited, model, output_template, english, best_of)
+                                + "\x00" + ",".join(sections),
+                                {
+                                    "raw_prompt": raw,
+                                    "questions": get_artifact("questions", []),
+                                    "answers": current_answers,
+                                    "refined_prompt": old_refined,
+                                    "selected_model": model,
+                                    "selected_template": output_template,
+                                    "template_chosen_manually": True,
+                                    "english_output": english,
+                                    "best_of": best_of,
+                                },
+                                _run_answer_update,
+                                raw,
+                                old_refined,
+                                edited,
+                                sections,
+                                model,
+                                output_template,
+                                english,
+                                best_of,
+                            )
+                            st.rerun()
 
-        # ── Token Savings Tip (Indonesian only) ──
-        if get_language() == "id":
-            st.info(t("step3_tip_english_tokens"))
+        update_job = get_job(job_owner)
+        if update_job is not None and update_job.kind == "update":
+            try:
+                result = _await_job(update_job, t("spinner_refining"))
+                if result is not None:
+                    _apply_answer_update(result)
+                    st.rerun()
+            except Exception as e:
+                st.error(str(e))
+
+        # ── English variant of a non-English result ──
+        refined_text = get_artifact("refined_prompt", "")
+        if st.session_state.english_output and not looks_english(get_artifact("raw_prompt", "")):
+            # Asked for English in the refine call itself: no native version exists
+            st.caption(t("step3_english_direct_tokens").format(english=estimate_tokens(refined_text)))
+        elif not looks_english(refined_text):
+            english_text = get_artifact("english_prompt")
+            if english_text is None:
+                if get_language() == "id":
+                    st.info(t("step3_tip_english_tokens"))
+                if st.button(t("step3_english_button")):
+                    model = st.session_state.get('selected_model', DEFAULT_MODEL)
+                    submit_job(
+                        job_owner, "result", "translate", "\x00".join([refined_text, model]),
+                        {
+                            "raw_prompt": get_artifact("raw_prompt", ""),
+                            "questions": get_artifact("questions", []),
+                            "answers": get_artifact("answers", {}),
+                            "refined_prompt": refined_text,
+                            "selected_model": model,
+                            "selected_template": st.session_state.get('selected_template', DEFAULT_TEMPLATE),
+                        },
+                        translate_to_english,
+                        refined_text,
+                        model=model,
+                    )
+                    st.rerun()
+
+                translate_job = get_job(job_owner)
+                if translate_job is not None and translate_job.kind == "translate":
+                    try:
+                        result = _await_job(translate_job, t("spinner_translating"))
+                        if result is not None:
+                            st.session_state.english_prompt = result
+                            st.rerun()
+                    except Exception as e:
+                        st.error(str(e))
+            else:
+                st.markdown(f"#### {t('step3_english_title')}")
+                st.code(english_text, language="markdown")
+                original_tokens = estimate_tokens(refined_text)
+                english_tokens = estimate_tokens(english_text)
+                st.caption(t("step3_english_tokens").format(
+                    original=original_tokens,
+                    english=english_tokens,
+                    saved=original_tokens - english_tokens,
+                    percent=round(100 * (original_tokens - english_tokens) / max(original_tokens, 1)),
+                ))
         
         if st.button(t("step3_restart") if t("step3_restart") != "step3_restart" else "Start Over"):
             st.session_state.step = "input"
             st.session_state.raw_prompt = ""
+            st.session_state.english_prompt = None
+            st.session_state.previous_refined_prompt = None
+            st.session_state.last_update = None
+            st.session_state.template_chosen_manually = False
+            st.session_state.compression_stats = None
+            st.session_state.best_of_report = None
             st.rerun()
+
+# ── Keep the session within its memory cap while it sits idle ──────
+mark("working_set")
+enforce_working_set(st.session_state.step)
+
+# ── Debug panels (?debug=memory | engine | profile | all) ──────────
+_profile_spans = finish_rerun()
+if _debug in ("memory", "all") and MEMORY_REPORT_ENABLED:
+    with st.expander("Session memory report", expanded=True):
+        st.dataframe(memory_report(), use_container_width=True)
+if _debug in ("engine", "all") and ENGINE_REPORT_ENABLED:
+    with st.expander("Engine stats", expanded=True):
+        st.json({
+            "section_repair": get_repair_stats(),
+            "analyze_parse": get_parse_stats(),
+            "interviewer_prompt": get_prompt_stats(),
+            "best_of": get_best_of_stats(),
+            "cancellation": get_cancel_stats(),
+            "jobs": get_job_stats(),
+            "api_keys": get_key_pool_stats(),
+        })
+if _profile_spans:
+    with st.expander("Rerun profile", expanded=True):
+        import altair as alt
+        import pandas as pd
+
+        waterfall = pd.DataFrame(_profile_spans)
+        waterfall["end_ms"] = waterfall["start_ms"] + waterfall["duration_ms"]
+        st.caption(f"{waterfall.loc[waterfall['depth'] == 0, 'duration_ms'].sum():.1f} ms this rerun")
+        st.altair_chart(
+            alt.Chart(waterfall).mark_bar().encode(
+                x=alt.X("start_ms:Q", title="ms since rerun start"),
+                x2="end_ms:Q",
+                y=alt.Y("name:N", sort=None, title=None),
+                color=alt.Color("depth:O", legend=None),
+                tooltip=["name", "start_ms", "duration_ms"],
+            ),
+            use_container_width=True,
+        )
+        summary = get_profile_summary()
+        st.dataframe(
+            [{"section": name, **entry} for name, entry in summary["sections"].items()],
+            use_container_width=True,
+        )
+        st.download_button(
+            "Export aggregated timings",
+            data=json.dumps(summary, indent=2),
+            file_name="rerun_profile.json",
+            mime="application/json",
+        )
@@ -0,0 +1,191 @@
+"""
+Interviewer Prompt Benchmark
+=============================
+Compares the full and lean interviewer system prompts
+(INTERVIEWER_PROMPT_MODE) on the calibration prompt set × question types,
+and reports per mode:
+
+  • system_tokens  — mean estimated tokens of the system prompt
+  • latency_ms     — median end-to-end analyze_prompt latency
+  • valid_rate     — share of calls that returned model questions (no
+                     local fallback, no parse failure)
+  • coverage       — share of template sections that some question
+                     shares a content word with
+  • relevance      — share of questions sharing a content word with the
+                     raw prompt
+  • distinct       — share of questions that are not near-duplicates of
+                     another question in the same reply
+
+plus ``agreement``: the mean word overlap (Jaccard) between the two
+modes' questions for the same request. The quality columns are local
+proxies; they flag a lean prompt that drifts, they do not replace
+reading the questions.
+
+Usage:
+    python scripts/bench_interviewer.py [--model ID] [--samples 1]
+                                        [--types General Technical ...]
+                                        [--stub [--prefill-tps 2000] | --base-url URL]
+                                        [--json out.json]
+
+Under --stub the replies are canned, so only system_tokens and
+latency_ms (with --prefill-tps) are meaningful.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import utils.ai_engine as ai_engine  # noqa: E402
+from calibrate_models import CALIBRATION_PROMPTS  # noqa: E402
+from utils.ai_engine import (  # noqa: E402
+    DEFAULT_MODEL,
+    OUTPUT_TEMPLATES,
+    QUESTION_TYPES,
+    analyze_prompt,
+    build_interviewer_instruction,
+)
+from utils.template_recommender import recommend_template  # noqa: E402
+from utils.text_utils import estimate_tokens, tokenize  # noqa: E402
+
+MODES = ("full", "lean")
+# Questions sharing at least this share of words count as duplicates
+_DUPLICATE_JACCARD = 0.6
+
+
+def _jaccard(a: set[str], b: set[str]) -> float:
+    return len(a & b) / len(a | b) if a | b else 1.0
+
+
+def _quality(prompt: str, output_template: str, questions: list[str]) -> dict[str, float]:
+    """Local quality proxies for one reply."""
+    sections = OUTPUT_TEMPLATES[output_template]["sections"]
+    question_terms = [set(tokenize(q)) for q in questions]
+    all_terms = set().union(*question_terms) if question_terms else set()
+    prompt_terms = set(tokenize(prompt))
+
+    covered = sum(1 for section in sections if set(tokenize(section)) & all_terms)
+    duplicates = sum(
+        1 for i, terms in enumerate(question_terms)
+        if any(_jaccard(terms, other) >= _DUPLICATE_JACCARD for other in question_terms[:i])
+    )
+    return {
+        "coverage": covered / len(sections),
+        "relevance": sum(1 for terms in question_terms if terms & prompt_terms) / len(questions),
+        "distinct": 1 - duplicates / len(questions),
+    }
+
+
+def run_mode(mode: str, model: str, question_types: list[str], samples: int) -> list[dict]:
+    """Run every request once per sample in one prompt mode."""
+    ai_engine.INTERVIEWER_PROMPT_MODE = mode
+    runs = []
+    for _ in range(samples):
+        for prompt in CALIBRATION_PROMPTS:
+            output_template = recommend_template(prompt)
+            for question_type in question_types:
+                instruction = build_interviewer_instruction(question_type, output_template, prompt)
+                run = {
+                    "request": (prompt, question_type),
+                    "system_tokens": estimate_tokens(instruction),
+                    "questions": [],
+                }
+                start = time.perf_counter()
+                try:
+                    result = analyze_prompt(
+                        prompt,
+                        model=model,
+                        question_type=question_type,
+                        output_template=output_template,
+                        precomputed=False,
+                    )
+                    if result.get("source") != "fallback" and result["questions"]:
+                        run["questions"] = result["questions"]
+                        run.update(_quality(prompt, output_template, result["questions"]))
+                except Exception as e:
+                    print(f"  {mode}: request failed ({type(e).__name__}: {e})")
+                run["latency"] = time.perf_counter() - start
+                runs.append(run)
+    return runs
+
+
+def summarize(runs: list[dict]) -> dict:
+    valid = [r for r in runs if r["questions"]]
+    summary = {
+        "requests": len(runs),
+        "system_tokens": round(statistics.mean(r["system_tokens"] for r in runs), 1),
+        "latency_ms": round(statistics.median(r["latency"] for r in runs) * 1000),
+        "valid_rate": round(len(valid) / len(runs), 3),
+    }
+    for metric in ("coverage", "relevance", "distinct"):
+        summary[metric] = round(statistics.mean(r[metric] for r in valid), 3) if valid else None
+    return summary
+
+
+def agreement(full_runs: list[dict], lean_runs: list[dict]) -> float | None:
+    """Mean word overlap between the two modes' replies to the same request."""
+    scores = []
+    for full, lean in zip(full_runs, lean_runs):
+        if full["questions"] and lean["questions"]:
+            full_terms = set(tokenize(" ".join(full["questions"])))
+            lean_terms = set(tokenize(" ".join(lean["questions"])))
+            scores.append(_jaccard(full_terms, lean_terms))
+    return round(statistics.mean(scores), 3) if scores else None
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="model that writes the questions")
+    parser.add_argument("--samples", type=int, default=1, help="passes over the request set per mode")
+    parser.add_argument("--types", nargs="*", default=QUESTION_TYPES, help="question types to include")
+    parser.add_argument("--stub", action="store_true", help="run against a local stub upstream")
+    parser.add_argument("--prefill-tps", type=float, default=2000.0,
+                        help="stub input tokens per second, so prompt size affects latency")
+    parser.add_argument("--base-url", help="alternative OpenAI-compatible endpoint")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    if args.stub:
+        from stub_server import start_stub_server
+
+        os.environ["CEREBRAS_BASE_URL"] = start_stub_server(prefill_tokens_per_sec=args.prefill_tps)
+        os.environ.setdefault("CEREBRAS_API_KEY", "stub")
+    elif args.base_url:
+        os.environ["CEREBRAS_BASE_URL"] = args.base_url
+    # Measure the upstream, not the degraded-mode budget
+    ai_engine.ANALYZE_LATENCY_BUDGET = 60.0
+
+    results = {}
+    for mode in MODES:
+        print(f"Running {mode} prompts ...")
+        results[mode] = run_mode(mode, args.model, args.types, args.samples)
+
+    report = {mode: summarize(runs) for mode, runs in results.items()}
+    full, lean = report["full"], report["lean"]
+    report["comparison"] = {
+        "token_reduction": round(1 - lean["system_tokens"] / full["system_tokens"], 3),
+        "latency_change_ms": lean["latency_ms"] - full["latency_ms"],
+        "agreement": agreement(results["full"], results["lean"]),
+    }
+
+    print(f"\n{'':<8}{'tokens':>8}{'latency':>10}{'valid':>8}{'coverage':>10}{'relevance':>11}{'distinct':>10}")
+    for mode in MODES:
+        row = report[mode]
+        cells = [f"{row[m]:.2f}" if row[m] is not None else "—" for m in ("valid_rate", "coverage", "relevance", "distinct")]
+        print(f"{mode:<8}{row['system_tokens']:>8.0f}{row['latency_ms']:>8} ms"
+              f"{cells[0]:>8}{cells[1]:>10}{cells[2]:>11}{cells[3]:>10}")
+    print(f"\n{json.dumps(report['comparison'])}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,371 @@
+"""
+Multi-Session Load Benchmark
+=============================
+Starts app.py under a real Streamlit server and drives many simulated
+users through the full input → questions → result flow at once, over
+the same websocket protocol the browser uses, to find where one worker
+starts queueing reruns. Reported:
+
+  • interaction latency — from sending an action (first load, typing the
+    prompt, Analyze, Generate, a plain rerun of the result page) until
+    the server finishes the last script run it caused, as p50 / p90 /
+    p99 / max, overall and per action
+  • CPU per script run  — server CPU time divided by the number of
+    app.py executions (an action may run the script several times, e.g.
+    while a job is polled)
+  • memory per session  — server resident-set growth per connected user
+  • per-section script time from the server's rerun profiler, so a slower
+    sidebar or a new widget shows up under its own name
+
+The engine talks to scripts/stub_server.py instead of the real upstream,
+with a configurable time to first token and token rate, so the numbers
+measure the app rather than the model.
+
+The JSON written with --json has the same shape on every run; pass an
+earlier file as --baseline to print the differences.
+
+Usage:
+    python scripts/bench_sessions.py [--users 20] [--concurrency 10]
+                                     [--ttft 0.05] [--tps 2000]
+                                     [--json out.json] [--baseline old.json]
+                                     [--max-p90 MS]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+import uuid
+
+import websockets
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stub_server import start_stub_server  # noqa: E402
+
+APP_PATH = os.path.join(ROOT, "app.py")
+ACTIONS = ("first_load", "type_prompt", "analyze", "generate", "result_rerun")
+# Seconds one action may take before the user counts as failed
+ACTION_TIMEOUT = 120.0
+
+USER_PROMPTS = [
+    "Write a blog post about remote work for small teams.",
+    "Debug my Python script that crashes when reading a large CSV file.",
+    "Summarize this quarterly report for the executive team.",
+    "Design the architecture for a real-time chat application.",
+    "Tulis email profesional kepada klien tentang keterlambatan proyek.",
+]
+
+
+# ── Server ──────────────────────────────────────────────────────────
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(workdir: str, upstream_url: str, profile_log: str) -> tuple[subprocess.Popen, int]:
+    """Run ``streamlit run app.py`` in ``workdir`` and wait until it is healthy."""
+    port = _free_port()
+    env = {
+        **os.environ,
+        "CEREBRAS_BASE_URL": upstream_url,
+        "CEREBRAS_API_KEY": "stub",
+        "PROFILE_RERUNS": "1",
+        "PROFILE_LOG": profile_log,
+    }
+    server = subprocess.Popen(
+        [
+            sys.executable, "-m", "streamlit", "run", APP_PATH,
+            "--server.port", str(port),
+            "--server.address", "127.0.0.1",
+            "--server.headless", "true",
+            "--server.fileWatcherType", "none",
+            "--browser.gatherUsageStats", "false",
+        ],
+        cwd=workdir,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1):
+                return server, port
+        except OSError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError("Streamlit server did not become healthy")
+
+
+def server_cpu_seconds(pid: int) -> float:
+    """User + system CPU time of a process, from /proc."""
+    with open(f"/proc/{pid}/stat", "r") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def server_rss_bytes(pid: int) -> int:
+    with open(f"/proc/{pid}/statm", "r") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+# ── One simulated user ──────────────────────────────────────────────
+class SimulatedUser:
+    """A browser tab: tracks the widgets on screen and the values it set."""
+
+    def __init__(self, port: int, index: int):
+        self.url = f"ws://127.0.0.1:{port}/_stcore/stream"
+        self.index = index
+        self.query_string = f"cid={uuid.uuid4().hex}"
+        self.widgets: list[tuple[str, object]] = []  # (type, proto) of the last run
+        self.values: dict[str, tuple[str, object]] = {}
+        self.script_runs = 0
+        self.errors = 0
+        self.ws = None
+
+    async def connect(self) -> None:
+        self.ws = await websockets.connect(self.url, subprotocols=["streamlit"], max_size=None)
+
+    async def close(self) -> None:
+        await self.ws.close()
+
+    def find(self, widget_type: str, match) -> object | None:
+        return next((w for t, w in self.widgets if t == widget_type and match(w)), None)
+
+    async def rerun(self, triggers: tuple[str, ...] = ()) -> None:
+        """Send a rerun with the current widget values and wait for the script to settle."""
+        message = BackMsg()
+        message.rerun_script.query_string = self.query_string
+        message.rerun_script.page_script_hash = ""
+        for widget_id, (field, value) in self.values.items():
+            state = message.rerun_script.widget_states.widgets.add()
+            state.id = widget_id
+            setattr(state, field, value)
+        for widget_id in triggers:
+            state = message.rerun_script.widget_states.widgets.add()
+            state.id = widget_id
+            state.trigger_value = True
+        await self.ws.send(message.SerializeToString())
+
+        widgets = []
+        while True:
+            forward = ForwardMsg()
+            forward.ParseFromString(await asyncio.wait_for(self.ws.recv(), ACTION_TIMEOUT))
+            kind = forward.WhichOneof("type")
+            if kind == "delta" and forward.delta.WhichOneof("type") == "new_element":
+                element = forward.delta.new_element
+                element_type = element.WhichOneof("type")
+                if element_type == "exception":
+                    self.errors += 1
+                widget = getattr(element, element_type)
+                if getattr(widget, "id", ""):
+                    widgets.append((element_type, widget))
+            elif kind == "script_finished":
+                self.script_runs += 1
+                if forward.script_finished == ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                    widgets = []  # the app reran itself; wait for the run that settles
+                    continue
+                if forward.script_finished == ForwardMsg.FINISHED_WITH_COMPILE_ERROR:
+                    self.errors += 1
+                self.widgets = widgets
+                return
+
+    async def run_flow(self, timings: dict[str, list[float]]) -> None:
+        prompt = USER_PROMPTS[self.index % len(USER_PROMPTS)]
+
+        async def timed(action: str, step) -> None:
+            start = time.perf_counter()
+            await step()
+            timings[action].append(time.perf_counter() - start)
+
+        async def click(widget, name: str) -> None:
+            if widget is None:
+                labels = [w.label for t, w in self.widgets if t == "button"]
+                raise RuntimeError(f"{name} button not on screen (buttons: {labels})")
+            await self.rerun(triggers=(widget.id,))
+
+        await timed("first_load", self.rerun)
+
+        prompt_box = self.find("text_area", lambda w: w.id.endswith("-input_prompt"))
+        self.values[prompt_box.id] = ("string_value", prompt)
+        await timed("type_prompt", self.rerun)
+
+        await timed("analyze", lambda: click(self.find("button", lambda w: "→" in w.label and not w.form_id), "analyze"))
+
+        # Form fields only reach the server together with the submit button
+        for i, field in enumerate(w for t, w in self.widgets if t == "text_input" and w.form_id):
+            self.values[field.id] = ("string_value", f"answer {i} from user {self.index}")
+        await timed("generate", lambda: click(self.find("button", lambda w: w.form_id and "✨" in w.label), "generate"))
+
+        await timed("result_rerun", self.rerun)
+        if self.find("text_input", lambda w: w.id.endswith("-edit_answer_0")) is None:
+            raise RuntimeError("did not reach the result page")
+
+
+# ── Report ──────────────────────────────────────────────────────────
+def percentiles(values: list[float]) -> dict[str, float]:
+    ordered = sorted(values)
+
+    def pick(q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+
+    return {
+        "count": len(ordered),
+        "p50_ms": round(statistics.median(ordered) * 1000, 1),
+        "p90_ms": round(pick(0.90), 1),
+        "p99_ms": round(pick(0.99), 1),
+        "max_ms": round(ordered[-1] * 1000, 1),
+    }
+
+
+def section_means(profile_log: str) -> dict[str, float]:
+    """Mean ms per script run of each top-level section in the profiler log."""
+    totals: dict[str, float] = {}
+    runs = 0
+    with open(profile_log, "r", encoding="utf-8") as f:
+        for line in f:
+            runs += 1
+            for span in json.loads(line)["spans"]:
+                if span["depth"] == 0:
+                    totals[span["name"]] = totals.get(span["name"], 0.0) + span["duration_ms"]
+    return {name: round(total / max(runs, 1), 3) for name, total in sorted(totals.items(), key=lambda kv: -kv[1])}
+
+
+async def drive_users(port: int, users: int, concurrency: int, pid: int) -> dict:
+    timings: dict[str, list[float]] = {action: [] for action in ACTIONS}
+    gate = asyncio.Semaphore(concurrency)
+    simulated = [SimulatedUser(port, i) for i in range(users)]
+    failures = 0
+
+    async def run_one(user: SimulatedUser) -> None:
+        nonlocal failures
+        async with gate:
+            await user.connect()
+            try:
+                await user.run_flow(timings)
+            except Exception as e:
+                failures += 1
+                print(f"  user {user.index} failed: {type(e).__name__}: {e}")
+
+    rss_before = server_rss_bytes(pid)
+    cpu_before = server_cpu_seconds(pid)
+    start = time.perf_counter()
+    await asyncio.gather(*(run_one(user) for user in simulated))
+    wall = time.perf_counter() - start
+    cpu = server_cpu_seconds(pid) - cpu_before
+    # Every user is still connected here, so their sessions are all alive
+    rss_after = server_rss_bytes(pid)
+    for user in simulated:
+        if user.ws is not None:
+            await user.close()
+
+    script_runs = sum(user.script_runs for user in simulated)
+    return {
+        "wall_s": round(wall, 2),
+        "errors": failures + sum(user.errors for user in simulated),
+        "interactions": percentiles([v for values in timings.values() for v in values]),
+        "by_action": {action: percentiles(values) for action, values in timings.items() if values},
+        "script_runs": script_runs,
+        "cpu_ms_per_script_run": round(cpu / max(script_runs, 1) * 1000, 2),
+        "rss_kb_per_session": round((rss_after - rss_before) / users / 1024, 1),
+    }
+
+
+def run_benchmark(users: int, concurrency: int, ttft: float, tps: float) -> dict:
+    workdir = tempfile.mkdtemp(prefix="bench_sessions_")
+    profile_log = os.path.join(workdir, "profile.jsonl")
+    upstream = start_stub_server(ttft=ttft, tokens_per_sec=tps)
+    server, port = start_server(workdir, upstream, profile_log)
+    try:
+        # One user first, so imports and caches are not charged to the load
+        asyncio.run(drive_users(port, 1, 1, server.pid))
+        open(profile_log, "w").close()
+        result = asyncio.run(drive_users(port, users, concurrency, server.pid))
+        time.sleep(0.5)  # let the server flush the last profile lines
+        result["sections_mean_ms"] = section_means(profile_log)
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+    return {"config": {"users": users, "concurrency": concurrency, "ttft": ttft, "tps": tps}, **result}
+
+
+def _flatten(data: dict, prefix: str = "") -> dict[str, float]:
+    flat = {}
+    for key, value in data.items():
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def print_report(result: dict, baseline: dict | None) -> None:
+    base = _flatten(baseline) if baseline else {}
+    flat = _flatten(result)
+
+    def fmt(key: str) -> str:
+        value = flat[key]
+        if not base.get(key):
+            return f"{value}"
+        return f"{value} ({(value - base[key]) / base[key] * 100:+.0f}%)"
+
+    config = result["config"]
+    print(f"{config['users']} users, concurrency {config['concurrency']} — "
+          f"{result['wall_s']} s, {result['errors']} errors")
+    print("── Interaction latency (ms) ──")
+    for name in ("interactions", *(f"by_action.{a}" for a in ACTIONS)):
+        if f"{name}.p50_ms" in flat:
+            print(f"  {name:<24} p50 {fmt(f'{name}.p50_ms'):<16} p90 {fmt(f'{name}.p90_ms'):<16} "
+                  f"p99 {fmt(f'{name}.p99_ms'):<16} max {flat[f'{name}.max_ms']}")
+    print("── Server cost ──")
+    for key in ("script_runs", "cpu_ms_per_script_run", "rss_kb_per_session"):
+        print(f"  {key:<24} {fmt(key)}")
+    print("── Slowest sections (mean ms per script run) ──")
+    for name in list(result["sections_mean_ms"])[:10]:
+        print(f"  {name:<24} {fmt(f'sections_mean_ms.{name}')}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20, help="simulated users")
+    parser.add_argument("--concurrency", type=int, default=10, help="users active at the same time")
+    parser.add_argument("--ttft", type=float, default=0.05, help="stub upstream seconds to first token")
+    parser.add_argument("--tps", type=float, default=2000.0, help="stub upstream output tokens per second")
+    parser.add_argument("--json", dest="json_path", help="also write the results to this file")
+    parser.add_argument("--baseline", help="earlier --json output to compare against")
+    parser.add_argument("--max-p90", type=float, help="fail if the overall p90 exceeds this (ms)")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    result = run_benchmark(args.users, args.concurrency, args.ttft, args.tps)
+    print_report(result, baseline)
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+
+    if result["errors"]:
+        return 1
+    if args.max_p90 is not None and result["interactions"]["p90_ms"] > args.max_p90:
+        print(f"FAIL: p90 above {args.max_p90:.0f} ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+"""
+Cold-Start Benchmark
+=====================
+Measures how long a fresh worker takes to become useful:
+
+  • import time per module, from ``python -X importtime`` on the modules
+    app.py imports (self and cumulative, in milliseconds)
+  • time to first rendered page — a fresh interpreter running app.py once
+    through Streamlit's AppTest — and the time of a second rerun
+
+Each measurement runs in its own subprocess so nothing is cached.
+
+Usage:
+    python scripts/bench_startup.py [--runs 3] [--top 15] [--json out.json]
+                                    [--max-first-run SECONDS]
+
+With --max-first-run the script exits non-zero when the median first
+render exceeds the threshold, so it can guard against regressions in CI.
+"""
+
+import argparse
+import ast
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_FILE = os.path.join(ROOT, "app.py")
+
+
+def startup_imports(app_file: str = APP_FILE) -> str:
+    """
+    Everything app.py pulls in before the first st.* call renders: its
+    module-level imports, read from the source so the list cannot go stale.
+    """
+    with open(app_file, encoding="utf-8") as f:
+        tree = ast.parse(f.read(), filename=app_file)
+    modules: list[str] = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            modules.append(node.module)
+    return "import " + ", ".join(dict.fromkeys(modules))
+
+_FIRST_RENDER_SCRIPT = """
+import json, time
+from streamlit.testing.v1 import AppTest
+start = time.perf_counter()
+at = AppTest.from_file({app!r}, default_timeout=60).run()
+first = time.perf_counter() - start
+start = time.perf_counter()
+at.run()
+rerun = time.perf_counter() - start
+print(json.dumps({{"first_run": first, "rerun": rerun, "errors": len(at.exception)}}))
+"""
+
+
+def measure_import_times() -> list[dict]:
+    """Run -X importtime in a fresh interpreter and parse its report."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", startup_imports()],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append({
+            "module": name.strip(),
+            "self_ms": int(self_us) / 1000,
+            "cumulative_ms": int(cumulative_us) / 1000,
+        })
+    return rows
+
+
+def measure_first_render() -> dict:
+    """Time the first and second run of app.py in a fresh interpreter."""
+    script = _FIRST_RENDER_SCRIPT.format(app=os.path.join(ROOT, "app.py"))
+    proc = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="fresh-process first renders to time")
+    parser.add_argument("--top", type=int, default=15, help="slowest modules to list")
+    parser.add_argument("--json", dest="json_path", help="also write the results to this file")
+    parser.add_argument("--max-first-run", type=float, help="fail if median first render exceeds this (s)")
+    args = parser.parse_args()
+
+    imports = measure_import_times()
+    renders = [measure_first_render() for _ in range(args.runs)]
+    first_runs = [r["first_run"] for r in renders]
+    reruns = [r["rerun"] for r in renders]
+
+    # Top-level packages plus the app's own modules
+    project = [
+        r for r in imports
+        if r["module"].startswith("utils.") or "." not in r["module"]
+    ]
+
+    print("── Import time (cumulative, slowest first) ──")
+    for row in sorted(project, key=lambda r: r["cumulative_ms"], reverse=True)[: args.top]:
+        print(f"{row['cumulative_ms']:9.1f} ms  {row['self_ms']:8.1f} ms self  {row['module']}")
+    print()
+    print("── Time to first rendered page ──")
+    print(f"first run: median {statistics.median(first_runs) * 1000:.0f} ms  (runs: "
+          + ", ".join(f"{v * 1000:.0f}" for v in first_runs) + ")")
+    print(f"rerun:     median {statistics.median(reruns) * 1000:.0f} ms")
+    if any(r["errors"] for r in renders):
+        print("warning: app.py raised during the benchmark run")
+
+    result = {
+        "imports": project,
+        "first_run_ms": [v * 1000 for v in first_runs],
+        "rerun_ms": [v * 1000 for v in reruns],
+        "first_run_median_ms": statistics.median(first_runs) * 1000,
+        "rerun_median_ms": statistics.median(reruns) * 1000,
+    }
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+
+    if args.max_first_run is not None and statistics.median(first_runs) > args.max_first_run:
+        print(f"FAIL: first render above {args.max_first_run:.2f} s")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
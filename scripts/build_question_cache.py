@@ -0,0 +1,156 @@
+"""
+Question Cache Builder
+=======================
+Precomputes clarifying questions for every built-in sidebar template
+(data/templates.json, both languages) × output template × question type,
+and writes them to data/precomputed_questions.json.gz for analyze_prompt
+to serve without an upstream call.
+
+The build is incremental: entries whose key still matches (same model,
+template text and interviewer prompt) are kept, stale ones are dropped and only
+missing combinations are requested. Re-run it after editing
+data/templates.json, data/output_templates.json, prompts/interviewer.txt
+or prompts/interviewer_examples.txt, or after switching
+INTERVIEWER_PROMPT_MODE;
+--check exits non-zero when the cache is out of date, for CI.
+
+Usage:
+    python scripts/build_question_cache.py [--model ID] [--workers 4]
+                                           [--stub | --base-url URL]
+                                           [--check] [--force]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import utils.ai_engine as ai_engine  # noqa: E402
+from utils.ai_engine import (  # noqa: E402
+    DEFAULT_MODEL,
+    OUTPUT_TEMPLATES,
+    QUESTION_TYPES,
+    analyze_prompt,
+    build_interviewer_instruction,
+)
+from utils.question_cache import (  # noqa: E402
+    CACHE_VERSION,
+    QUESTION_CACHE_FILE,
+    cache_key,
+    load_cache_file,
+    write_cache_file,
+)
+from utils.security import MAX_DOCUMENT_LENGTH, validate_and_sanitize_user_input  # noqa: E402
+from utils.template_store import BUILTIN_TEMPLATES_FILE  # noqa: E402
+
+# Offline builds can wait for the upstream; the app's budget is for users
+BUILD_LATENCY_BUDGET = 60.0
+
+
+def planned_combinations(model: str) -> dict[str, tuple[str, str, str]]:
+    """Return {cache key: (template text, output template, question type)} for ``model``."""
+    with open(BUILTIN_TEMPLATES_FILE, "r", encoding="utf-8") as f:
+        builtins = json.load(f)
+
+    texts = []
+    for data in builtins.values():
+        for lang in ("en", "id"):
+            sanitized, error = validate_and_sanitize_user_input(
+                data.get(lang, ""), max_length=MAX_DOCUMENT_LENGTH
+            )
+            if not error and sanitized.strip() and sanitized not in texts:
+                texts.append(sanitized)
+
+    plan = {}
+    for output_template in OUTPUT_TEMPLATES:
+        for question_type in QUESTION_TYPES:
+            for text in texts:
+                instruction = build_interviewer_instruction(question_type, output_template, text)
+                plan[cache_key(instruction, text, model)] = (text, output_template, question_type)
+    return plan
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="model that writes the questions")
+    parser.add_argument("--workers", type=int, default=4, help="concurrent upstream requests")
+    parser.add_argument("--stub", action="store_true", help="run against a local stub upstream")
+    parser.add_argument("--base-url", help="alternative OpenAI-compatible endpoint")
+    parser.add_argument("--check", action="store_true", help="only report staleness; exit 1 if out of date")
+    parser.add_argument("--force", action="store_true", help="rebuild every entry")
+    args = parser.parse_args()
+
+    plan = planned_combinations(args.model)
+    cache = load_cache_file()
+    existing = {} if args.force else cache.get("entries", {})
+    entries = {key: existing[key] for key in plan if key in existing}
+    missing = [key for key in plan if key not in entries]
+    stale = len(existing) - len(entries)
+
+    print(f"{len(plan)} combinations: {len(entries)} cached, {len(missing)} missing, {stale} stale")
+    if args.check:
+        return 1 if missing or stale else 0
+    if not missing and not stale:
+        return 0
+
+    if args.stub:
+        from stub_server import start_stub_server
+
+        os.environ["CEREBRAS_BASE_URL"] = start_stub_server()
+        os.environ.setdefault("CEREBRAS_API_KEY", "stub")
+    elif args.base_url:
+        os.environ["CEREBRAS_BASE_URL"] = args.base_url
+    ai_engine.ANALYZE_LATENCY_BUDGET = BUILD_LATENCY_BUDGET
+
+    def build(key: str) -> tuple[str, list[str] | None]:
+        text, output_template, question_type = plan[key]
+        result = analyze_prompt(
+            text,
+            model=args.model,
+            question_type=question_type,
+            output_template=output_template,
+            precomputed=False,
+        )
+        # Offline-bank answers are what the app already does without a cache
+        return key, result["questions"] if result.get("source") != "fallback" else None
+
+    failed = 0
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=args.workers) as pool:
+            futures = [pool.submit(build, key) for key in missing]
+            for done, future in enumerate(as_completed(futures), 1):
+                try:
+                    key, questions = future.result()
+                except Exception as e:
+                    failed += 1
+                    print(f"  request failed ({type(e).__name__}: {e})")
+                    continue
+                if questions:
+                    entries[key] = questions
+                else:
+                    failed += 1
+                if done % 50 == 0:
+                    print(f"  {done}/{len(missing)}")
+    finally:
+        # Keep whatever was built, even on Ctrl-C
+        write_cache_file({
+            "version": CACHE_VERSION,
+            "model": args.model,
+            "built_at": time.time(),
+            "entries": entries,
+        })
+
+    size_kb = os.path.getsize(QUESTION_CACHE_FILE) / 1024
+    print(f"Built {len(missing) - failed} entries in {time.perf_counter() - start:.1f} s "
+          f"({failed} failed); {len(entries)}/{len(plan)} cached, {size_kb:.0f} KiB")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
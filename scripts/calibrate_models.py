@@ -0,0 +1,170 @@
+"""
+Model Calibration
+==================
+Runs a fixed prompt set through every model in data/models.json with the
+real interviewer (analyze_prompt) system prompt and records, per model:
+
+  • ttft_ms          — median time to first streamed token
+  • tokens_per_sec   — median output rate after the first token
+  • latency_ms       — median end-to-end latency
+  • json_valid_rate  — share of replies that parse as JSON without repair
+
+The results are written back into data/models.json as a ``calibration``
+object next to each model entry; utils.ai_engine derives the UI tags
+from them.
+
+Usage:
+    python scripts/calibrate_models.py [--models ID ...] [--samples 2]
+                                       [--stub | --base-url URL] [--dry-run]
+
+--stub starts scripts/stub_server.py locally, for test environments
+without an API key.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from utils.ai_engine import (  # noqa: E402
+    DATA_DIR,
+    DEFAULT_QUESTION_TYPE,
+    QUESTIONS_RESPONSE_FORMAT,
+    build_interviewer_instruction,
+    get_cerebras_client,
+    parse_questions_response,
+)
+from utils.template_recommender import recommend_template  # noqa: E402
+from utils.text_utils import estimate_tokens  # noqa: E402
+
+MODELS_FILE = os.path.join(DATA_DIR, "models.json")
+
+CALIBRATION_PROMPTS = [
+    "Write a blog post about remote work for small teams.",
+    "Debug my Python script that crashes when reading a large CSV file.",
+    "Summarize this quarterly report for the executive team.",
+    "Design the architecture for a real-time chat application.",
+    "Tulis email profesional kepada klien tentang keterlambatan proyek.",
+]
+
+
+def _measure_once(client, model: str, prompt: str, structured: bool) -> dict:
+    """Stream one interviewer call and time it."""
+    messages = [
+        {"role": "system", "content": build_interviewer_instruction(
+            DEFAULT_QUESTION_TYPE, recommend_template(prompt), prompt)},
+        {"role": "user", "content": prompt},
+    ]
+    start = time.perf_counter()
+    first_token_at = None
+    parts: list[str] = []
+    completion_tokens = None
+
+    extra = {"response_format": QUESTIONS_RESPONSE_FORMAT} if structured else {}
+    stream = client.chat.completions.create(
+        model=model,
+        messages=messages,
+        temperature=0.7,
+        max_tokens=800,
+        stream=True,
+        **extra,
+    )
+    for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            if first_token_at is None:
+                first_token_at = time.perf_counter()
+            parts.append(chunk.choices[0].delta.content)
+        usage = getattr(chunk, "usage", None)
+        if usage and usage.completion_tokens:
+            completion_tokens = usage.completion_tokens
+    end = time.perf_counter()
+
+    text = "".join(parts)
+    first_token_at = first_token_at or end
+    tokens = completion_tokens or estimate_tokens(text)
+    try:
+        parse_questions_response(text, repair=False)
+        valid = True
+    except ValueError:
+        valid = False
+
+    return {
+        "ttft": first_token_at - start,
+        "latency": end - start,
+        "tokens_per_sec": tokens / max(end - first_token_at, 1e-6),
+        "valid": valid,
+    }
+
+
+def calibrate_model(client, model: str, samples: int, structured: bool = False) -> dict:
+    """Run the prompt set ``samples`` times against one model."""
+    runs, errors = [], 0
+    for _ in range(samples):
+        for prompt in CALIBRATION_PROMPTS:
+            try:
+                runs.append(_measure_once(client, model, prompt, structured))
+            except Exception as e:
+                errors += 1
+                print(f"  {model}: request failed ({type(e).__name__}: {e})")
+    attempts = len(runs) + errors
+    if not runs:
+        return {"errors": errors, "samples": attempts}
+
+    return {
+        "ttft_ms": round(statistics.median(r["ttft"] for r in runs) * 1000),
+        "tokens_per_sec": round(statistics.median(r["tokens_per_sec"] for r in runs), 1),
+        "latency_ms": round(statistics.median(r["latency"] for r in runs) * 1000),
+        "json_valid_rate": round(sum(r["valid"] for r in runs) / attempts, 3),
+        "samples": attempts,
+        "errors": errors,
+        "measured_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--models", nargs="*", help="model ids to calibrate (default: all)")
+    parser.add_argument("--samples", type=int, default=2, help="passes over the prompt set per model")
+    parser.add_argument("--stub", action="store_true", help="run against a local stub upstream")
+    parser.add_argument("--base-url", help="alternative OpenAI-compatible endpoint")
+    parser.add_argument("--dry-run", action="store_true", help="print results without writing models.json")
+    args = parser.parse_args()
+
+    if args.stub:
+        from stub_server import start_stub_server
+
+        os.environ["CEREBRAS_BASE_URL"] = start_stub_server()
+        os.environ.setdefault("CEREBRAS_API_KEY", "stub")
+    elif args.base_url:
+        os.environ["CEREBRAS_BASE_URL"] = args.base_url
+
+    with open(MODELS_FILE, "r", encoding="utf-8") as f:
+        config = json.load(f)
+
+    client = get_cerebras_client().with_options(max_retries=0, warm_tcp_connection=False)
+    for entry in config["available_models"]:
+        if args.models and entry["id"] not in args.models:
+            continue
+        print(f"Calibrating {entry['id']} ...")
+        entry["calibration"] = calibrate_model(
+            client, entry["id"], args.samples, entry.get("structured_output", False)
+        )
+        print(f"  {json.dumps(entry['calibration'])}")
+
+    if args.dry_run:
+        return 0
+    with open(MODELS_FILE, "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=2, ensure_ascii=False)
+        f.write("\n")
+    print(f"Wrote calibration to {MODELS_FILE}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
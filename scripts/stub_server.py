@@ -0,0 +1,186 @@
+"""
+Stub Upstream
+==============
+A tiny OpenAI/Cerebras-compatible chat-completions server for benchmarks
+and test environments, so tooling can run without an API key or quota.
+
+  • Interviewer requests (system prompt mentions "questions") get a JSON
+    list of five questions.
+  • Anything else gets one line per template section found in the system
+    prompt, like a well-behaved refiner.
+
+Latency is simulated with a time-to-first-token delay and a fixed
+token rate; both plain and ``stream=True`` responses are supported. With
+a prefill rate, the first-token delay also grows with the prompt length,
+so input-size changes show up in benchmarks. With a per-key request
+rate, each API key (the bearer token) is limited like a real account:
+requests beyond it get 429 with a Retry-After.
+
+Usage:
+    python scripts/stub_server.py [--port 8765] [--ttft 0.2] [--tps 400]
+                                  [--prefill-tps 0] [--key-rps 0]
+
+or, from Python, ``start_stub_server()`` returns the base URL to put in
+CEREBRAS_BASE_URL.
+"""
+
+import argparse
+import json
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_SECTION_RE = re.compile(r"^([A-Z][\w \-]{1,40}):", re.MULTILINE)
+
+
+def _fake_reply(messages: list[dict]) -> str:
+    """Build a plausible reply for the given chat messages."""
+    system = next((m["content"] for m in messages if m.get("role") == "system"), "")
+    if '"questions"' in system:
+        return json.dumps({"questions": [
+            "Who is the target audience for this prompt?",
+            "What is the primary goal or outcome you want?",
+            "What tone or style should be used?",
+            "Are there any specific constraints or limitations?",
+            "What format should the output be in?",
+        ]}, indent=2)
+
+    structure = system.split("EXACTLY as follows:", 1)[-1]
+    sections = [m.group(1) for m in _SECTION_RE.finditer(structure)] or ["Role", "Task", "Format"]
+    return "\n\n".join(f"{name}: Stub content for the {name.lower()} section." for name in sections)
+
+
+def _make_handler(
+    ttft: float,
+    tokens_per_sec: float,
+    prefill_tokens_per_sec: float = 0.0,
+    key_requests_per_sec: float = 0.0,
+):
+    # api key -> time its next request is allowed (1 s of burst allowed)
+    next_allowed: dict[str, float] = {}
+    limit_lock = threading.Lock()
+
+    def rate_limited(api_key: str) -> float:
+        """Seconds to wait if ``api_key`` is over its rate, else 0."""
+        if not key_requests_per_sec:
+            return 0.0
+        now = time.monotonic()
+        with limit_lock:
+            allowed = max(next_allowed.get(api_key, now - 1.0), now - 1.0)
+            if allowed > now:
+                return allowed - now
+            next_allowed[api_key] = allowed + 1 / key_requests_per_sec
+            return 0.0
+
+    class StubHandler(BaseHTTPRequestHandler):
+        def log_message(self, *args):  # keep benchmark output clean
+            pass
+
+        def do_GET(self):
+            # The SDK warms its TCP connection with GET /v1/tcp_warming
+            self._send_json({"ok": True})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+            wait = rate_limited(self.headers.get("Authorization", ""))
+            if wait:
+                self._send_json({"error": {"message": "Rate limit exceeded", "type": "rate_limit_error"}},
+                                status=429, headers={"Retry-After": f"{wait:.2f}"})
+                return
+            reply = _fake_reply(body.get("messages", []))
+            words = re.findall(r"\S+\s*", reply)
+            model = body.get("model", "stub")
+            usage = {
+                "prompt_tokens": sum(len(m.get("content", "").split()) for m in body.get("messages", [])),
+                "completion_tokens": len(words),
+                "total_tokens": 0,
+            }
+            usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+
+            prefill = usage["prompt_tokens"] / prefill_tokens_per_sec if prefill_tokens_per_sec else 0.0
+            time.sleep(ttft + prefill)
+            if body.get("stream"):
+                self._stream(model, words, usage)
+                return
+
+            time.sleep(len(words) / tokens_per_sec)
+            self._send_json({
+                "id": f"chatcmpl-{uuid.uuid4().hex}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "system_fingerprint": "stub",
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": reply},
+                    "finish_reason": "stop",
+                }],
+                "usage": usage,
+            })
+
+        def _stream(self, model: str, words: list[str], usage: dict):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.end_headers()
+            base = {"id": f"chatcmpl-{uuid.uuid4().hex}", "object": "chat.completion.chunk",
+                    "created": int(time.time()), "model": model, "system_fingerprint": "stub"}
+            try:
+                for word in words:
+                    chunk = {**base, "choices": [{"index": 0, "delta": {"content": word}, "finish_reason": None}]}
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                    self.wfile.flush()
+                    time.sleep(1 / tokens_per_sec)
+                final = {**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}], "usage": usage}
+                self.wfile.write(f"data: {json.dumps(final)}\n\ndata: [DONE]\n\n".encode())
+                self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # the client cancelled or hit its deadline
+
+        def _send_json(self, payload: dict, status: int = 200, headers: dict | None = None):
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    return StubHandler
+
+
+def start_stub_server(
+    port: int = 0,
+    ttft: float = 0.2,
+    tokens_per_sec: float = 400.0,
+    prefill_tokens_per_sec: float = 0.0,
+    key_requests_per_sec: float = 0.0,
+) -> str:
+    """Start the stub in a daemon thread and return its base URL."""
+    server = ThreadingHTTPServer(
+        ("127.0.0.1", port),
+        _make_handler(ttft, tokens_per_sec, prefill_tokens_per_sec, key_requests_per_sec),
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a stub chat-completions server.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--ttft", type=float, default=0.2, help="seconds before the first token")
+    parser.add_argument("--tps", type=float, default=400.0, help="simulated output tokens per second")
+    parser.add_argument("--prefill-tps", type=float, default=0.0,
+                        help="simulated input tokens per second (0: prompt length is free)")
+    parser.add_argument("--key-rps", type=float, default=0.0,
+                        help="requests per second allowed per API key before 429 (0: unlimited)")
+    args = parser.parse_args()
+    url = start_stub_server(args.port, args.ttft, args.tps, args.prefill_tps, args.key_rps)
+    print(f"Stub upstream listening on {url} — set CEREBRAS_BASE_URL={url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,88 @@
+import time
+
+import httpx
+import pytest
+from stub_server import start_stub_server
+
+from utils import ai_engine, key_pool
+from utils.cancellation import CallCancelled, CancelToken
+
+
+@pytest.fixture
+def slow_upstream(monkeypatch):
+    """A stub streaming at 20 tokens/s, a 1 s analyze budget and a closed circuit."""
+    monkeypatch.setenv("CEREBRAS_BASE_URL", start_stub_server(ttft=0.1, tokens_per_sec=20))
+    monkeypatch.setenv("CEREBRAS_API_KEY", "stub")
+    monkeypatch.setattr(key_pool, "_keys", None)
+    monkeypatch.setattr(ai_engine, "ANALYZE_LATENCY_BUDGET", 1.0)
+    monkeypatch.setattr(ai_engine, "_circuit_failures", 0)
+    monkeypatch.setattr(ai_engine, "_circuit_opened_at", None)
+    yield
+    monkeypatch.setattr(key_pool, "_keys", None)
+
+
+def test_streamed_analyze_falls_back_at_the_latency_budget(slow_upstream):
+    start = time.monotonic()
+    result = ai_engine.analyze_prompt(
+        "Write a blog post about remote work", precomputed=False, cancel_token=CancelToken("test", "analyze")
+    )
+    elapsed = time.monotonic() - start
+
+    assert result["source"] == "fallback"
+    assert len(result["questions"]) == 5
+    assert elapsed < 1.5
+    assert ai_engine._circuit_failures == 1
+
+
+def test_mid_stream_transport_errors_count_as_degradation():
+    assert ai_engine._is_upstream_degradation(httpx.ReadTimeout("read timed out"))
+    assert ai_engine._is_upstream_degradation(httpx.RemoteProtocolError("peer closed connection"))
+    assert ai_engine._is_upstream_degradation(ai_engine.UpstreamDeadlineExceeded("slow"))
+    assert not ai_engine._is_upstream_degradation(ValueError("bad json"))
+
+
+class RateLimited(Exception):
+    status_code = 429
+
+
+@pytest.fixture
+def failing_upstream(monkeypatch):
+    def fail(request, kind, cancel_token=None, deadline=None, **options):
+        raise RateLimited("Rate limit exceeded")
+
+    monkeypatch.setattr(ai_engine, "_complete", fail)
+
+
+def test_regenerate_sections_surfaces_upstream_errors(failing_upstream):
+    with pytest.raises(RateLimited, match="Rate limit"):
+        ai_engine.regenerate_sections("Role: chef\n\nTask: cook", "Cook dinner", {"Who?": "kids"}, ["Task"])
+
+
+def test_repair_keeps_the_refinement_when_the_repair_call_fails(failing_upstream):
+    refined = "Role: You are a chef."
+    assert ai_engine.repair_refined_prompt(refined, "Cook dinner") == refined
+
+
+def test_repair_is_cancellable(monkeypatch):
+    def cancelled(request, kind, cancel_token=None, deadline=None, **options):
+        raise CallCancelled("back")
+
+    monkeypatch.setattr(ai_engine, "_complete", cancelled)
+    with pytest.raises(CallCancelled):
+        ai_engine.repair_refined_prompt("Role: You are a chef.", "Cook dinner", cancel_token=CancelToken())
+
+
+class BadRequest(Exception):
+    status_code = 400
+
+    def __init__(self, message):
+        super().__init__(message)
+        self.message = message
+        self.body = {"message": message}
+
+
+def test_only_schema_errors_disable_structured_output():
+    assert ai_engine._rejects_response_format(BadRequest("response_format json_schema is not supported"))
+    assert ai_engine._rejects_response_format(BadRequest("Invalid schema: strict mode unsupported"))
+    assert not ai_engine._rejects_response_format(BadRequest("Please reduce the length of the messages"))
+    assert not ai_engine._rejects_response_format(RateLimited("schema"))
@@ -0,0 +1,80 @@
+from utils import context_compressor
+from utils.context_compressor import compress_context, fit_document
+from utils.text_utils import estimate_tokens
+
+CODE = "```python\ndef total(xs):\n    return sum(xs)\ndef total(xs):\n    return sum(xs)\n```"
+
+
+def test_blank_answers_and_duplicate_sentences_are_dropped():
+    prompt, answers, stats = compress_context(
+        "Write a post about remote work. Write a post about remote work.",
+        {"Audience?": "Small teams", "Tone?": "  ", "Topic?": "Write a post about remote work!"},
+    )
+    assert prompt == "Write a post about remote work."
+    assert answers == {"Audience?": "Small teams"}
+    assert stats["dropped_answers"] == 2
+    assert stats["duplicate_sentences"] == 2
+    assert stats["tokens_saved"] == stats["original_tokens"] - stats["compressed_tokens"] > 0
+
+
+def test_code_blocks_and_list_items_are_never_deduplicated():
+    raw = f"Speed this up.\n{CODE}\n- keep the API\n- keep the API"
+    prompt, _, stats = compress_context(raw, {})
+    assert CODE in prompt
+    assert prompt.count("- keep the API") == 2
+    assert stats["duplicate_sentences"] == 0
+
+
+def test_summarization_is_opt_in():
+    raw = " ".join(f"Ticket {i:04d} needs review." for i in range(300))
+    prompt, _, _ = compress_context(raw, {}, token_budget=100)
+    assert prompt == raw
+    assert context_compressor.REFINE_CONTEXT_SUMMARIZE is False
+
+    prompt, _, stats = compress_context(raw, {}, token_budget=100, summarize_over_budget=True)
+    assert stats["compressed_tokens"] <= 100
+    assert prompt.startswith("Ticket 0000 needs review.")
+
+
+def test_summarization_keeps_code_whole():
+    raw = " ".join(f"Ticket {i:04d} needs review." for i in range(300)) + "\n" + CODE
+    prompt, _, _ = compress_context(raw, {}, token_budget=80, summarize_over_budget=True)
+    assert prompt.endswith(CODE)
+
+
+def test_fit_document_within_budget_is_untouched():
+    text = "Short note.\n\n  indented"
+    assert fit_document(text, 100) is text
+
+
+def test_fit_document_shrinks_to_the_budget():
+    text = "\n".join(f"Line {i} about remote teams and tools." for i in range(2000)) + "\n" + CODE
+    fitted = fit_document(text, 400)
+    assert estimate_tokens(fitted) <= 400
+    assert fitted.endswith(CODE)
+
+
+def test_fit_document_cuts_text_without_units_that_fit():
+    assert fit_document("x" * 10_000, 50) == "x" * 200
+
+
+def test_text_with_nothing_to_drop_is_returned_unchanged():
+    raw = f"Write a  blog post.\n\n{CODE}\n\n   Keep it short!   Really.\n"
+    prompt, answers, _ = compress_context(raw, {"Audience?": "Devs.\n\n  - juniors"})
+    assert prompt is raw
+    assert answers == {"Audience?": "Devs.\n\n  - juniors"}
+
+
+def test_dropping_a_sentence_keeps_blank_lines_and_other_lines():
+    raw = f"Write a blog post.\n\n{CODE}\n\nWrite a blog post.  Use a  friendly tone."
+    prompt, _, stats = compress_context(raw, {})
+    assert stats["duplicate_sentences"] == 1
+    assert prompt == f"Write a blog post.\n\n{CODE}\n\nUse a  friendly tone."
+
+
+def test_dropped_paragraphs_leave_no_blank_runs():
+    text = "\n\n".join(f"Paragraph {i:04d} covers hiring. It has detail {i:04d}." for i in range(500))
+    fitted = fit_document(text, 300)
+    assert estimate_tokens(fitted) <= 300
+    assert "\n\n\n" not in fitted
+    assert not fitted.startswith("\n")
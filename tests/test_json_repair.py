@@ -0,0 +1,31 @@
+from utils.json_repair import salvage_questions
+
+
+def test_trailing_prose_after_the_object():
+    reply = '{"questions": ["Who is the audience?", "What tone?"]}\nHope this helps!'
+    assert salvage_questions(reply) == ["Who is the audience?", "What tone?"]
+
+
+def test_array_cut_off_mid_string_keeps_complete_items():
+    reply = '```json\n{"questions": ["Who is the audience?", "What tone?", "How lo'
+    assert salvage_questions(reply) == ["Who is the audience?", "What tone?"]
+
+
+def test_single_quotes_and_escapes():
+    reply = "{'questions': ['What\\'s the goal?', \"Any \\\"must\\\" words?\"]}"
+    assert salvage_questions(reply) == ["What's the goal?", 'Any "must" words?']
+
+
+def test_bare_array():
+    assert salvage_questions('Here: ["Who reads it?", "", "Why now?"]') == ["Who reads it?", "Why now?"]
+
+
+def test_numbered_list_fallback():
+    reply = "Sure! Some questions:\n1. Who reads it?\n- What format?\nThanks."
+    assert salvage_questions(reply) == ["Who reads it?", "What format?"]
+
+
+def test_nothing_to_salvage():
+    assert salvage_questions("") == []
+    assert salvage_questions(None) == []
+    assert salvage_questions("I cannot help with that.") == []
@@ -0,0 +1,42 @@
+from utils.output_validator import find_incomplete_sections, parse_sections, splice_sections
+
+NAMES = ["Role", "Task", "Format"]
+
+
+def test_parse_sections_accepts_heading_styles():
+    text = "## Role\nYou are an editor.\n\n**Task (main):** Fix the text.\n\n3. Format: Markdown list."
+    sections = parse_sections(text, NAMES)
+    assert {name: body for name, (_, _, body) in sections.items()} == {
+        "Role": "You are an editor.",
+        "Task": "Fix the text.",
+        "Format": "Markdown list.",
+    }
+    start, end, _ = sections["Task"]
+    assert text[start:end].startswith("**Task")
+
+
+def test_parse_sections_ignores_names_inside_sentences():
+    sections = parse_sections("Role: writer. Your task is hard.\nFormat: prose", NAMES)
+    assert set(sections) == {"Role", "Format"}
+
+
+def test_find_incomplete_sections():
+    text = "Role: You are a senior editor.\nTask:\nFormat: ok"
+    assert find_incomplete_sections(text, NAMES) == ["Task", "Format"]
+
+
+def test_splice_replaces_and_inserts_in_template_order():
+    text = "Here is your prompt.\n\nFormat: A table.\n\nRole: You are a chef."
+    spliced = splice_sections(text, NAMES, {"Task": "Plan a menu.", "Format": "A bulleted list."})
+    assert spliced == (
+        "Here is your prompt.\n\n"
+        "Role: You are a chef.\n\n"
+        "Task: Plan a menu.\n\n"
+        "Format: A bulleted list."
+    )
+
+
+def test_splice_keeps_untouched_sections_verbatim():
+    text = "**Role:** You are a chef.\n  Keep it *short*.\n\nTask: Plan a menu."
+    spliced = splice_sections(text, NAMES, {"Format": "Markdown."})
+    assert spliced.startswith("**Role:** You are a chef.\n  Keep it *short*.\n\nTask: Plan a menu.")
@@ -0,0 +1,45 @@
+from types import SimpleNamespace
+
+import pytest
+
+from utils import rate_limiter
+
+
+class _State(dict):
+    __getattr__ = dict.__getitem__
+    __setattr__ = dict.__setitem__
+
+
+@pytest.fixture
+def fake_st(monkeypatch):
+    written = []
+    fake = SimpleNamespace(session_state=_State(), context=SimpleNamespace(cookies={}))
+    monkeypatch.setattr(rate_limiter, "st", fake)
+    monkeypatch.setattr(rate_limiter, "_set_browser_cookie", written.append)
+    fake.written = written
+    return fake
+
+
+def test_browser_id_comes_from_the_cookie(fake_st):
+    fake_st.context.cookies[rate_limiter.BROWSER_COOKIE] = "ab" * 16
+    assert rate_limiter._browser_id() == "ab" * 16
+    assert fake_st.written == []
+
+
+def test_browser_without_a_cookie_gets_one_and_keeps_it(fake_st):
+    first = rate_limiter._browser_id()
+    assert fake_st.written == [first]
+    assert rate_limiter._browser_id() == first
+    assert fake_st.written == [first]
+
+
+def test_malformed_cookie_is_replaced(fake_st):
+    fake_st.context.cookies[rate_limiter.BROWSER_COOKIE] = "2|00|00|0"
+    browser_id = rate_limiter._browser_id()
+    assert browser_id != "2|00|00|0"
+    assert fake_st.written == [browser_id]
+
+
+def test_unreadable_cookies_fall_back_to_the_session(fake_st):
+    fake_st.context = SimpleNamespace()
+    assert rate_limiter._browser_id() is None
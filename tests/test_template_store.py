@@ -0,0 +1,75 @@
+import threading
+
+import pytest
+
+from utils import template_store
+
+
+@pytest.fixture(autouse=True)
+def store(tmp_path, monkeypatch):
+    """A fresh database seeded from the shipped built-ins."""
+    monkeypatch.setattr(template_store, "TEMPLATE_DB", str(tmp_path / "templates.db"))
+    monkeypatch.setattr(template_store, "_local", threading.local())
+    monkeypatch.setattr(template_store, "_seeded_mtime", None)
+
+
+def names(query, **kwargs):
+    return [t["name"] for t in template_store.search_templates(query, **kwargs)[0]]
+
+
+def test_listing_starts_with_builtins_and_pages():
+    first, has_more = template_store.search_templates(page_size=3)
+    assert [t["builtin"] for t in first] == [True, True, True]
+    assert has_more
+    assert names("", page=1, page_size=3)[0] not in [t["name"] for t in first]
+
+
+def test_typo_tolerant_search():
+    assert "Creative - Story" in names("storry")
+    assert names("blog post")[0] == "Writing - Blog Post"
+
+
+def test_short_query_matches_the_start_of_any_name_word():
+    assert "Writing - Blog Post" in names("wr")
+    assert "Writing - Blog Post" in names("bl")
+    assert "Writing - Blog Post" in names("B")
+    assert names("zq") == []
+
+
+def test_short_query_lists_whole_name_prefixes_first():
+    template_store.add_template("Blocker List", "Track blockers", author="alice")
+    found = names("bl", page_size=50)
+    assert found[0] == "Blocker List"
+    assert found.index("Writing - Blog Post") > 0
+
+
+def test_short_query_ignores_body_text():
+    template_store.add_template("Standup", "Zq notes for the daily meeting", author="alice")
+    assert names("zq") == []
+
+
+def test_added_template_is_searchable():
+    template_store.add_template("Podcast Outline", "Outline a podcast episode about {topic}", author="alice")
+    assert names("podcast")[0] == "Podcast Outline"
+
+
+def test_builtin_names_are_refused():
+    for name in ("Writing - Blog Post", "writing: blog post"):
+        with pytest.raises(ValueError, match="already taken"):
+            template_store.add_template(name, "mine now", author="alice")
+    blog = [t for t in template_store.search_templates("blog post")[0] if t["name"] == "Writing - Blog Post"][0]
+    assert blog["builtin"] and blog["en"] != "mine now"
+
+
+def test_only_the_author_can_replace_a_template():
+    first = template_store.add_template("Standup", "v1", author="alice")
+    assert template_store.add_template("Standup", "v2", author="alice") == first
+    for author in ("bob", None):
+        with pytest.raises(ValueError, match="already taken"):
+            template_store.add_template("Standup", "v3", author=author)
+    assert [t["en"] for t in template_store.search_templates("standup")[0]] == ["v2"]
+
+
+def test_empty_name_is_refused():
+    with pytest.raises(ValueError, match="empty"):
+        template_store.add_template("   ", "text")
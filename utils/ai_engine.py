@@ -6,12 +6,37 @@ Uses the Cerebras Cloud SDK. Models and templates loaded from data/ folder.
 """
 
 import json
+import logging
 import os
-from typing import Any
+import socket
+import threading
+import time
+from concurrent.futures import CancelledError as FutureCancelled, ThreadPoolExecutor, as_completed, wait
+from typing import TYPE_CHECKING, Any
 
-from cerebras.cloud.sdk import Cerebras
+from utils.cancellation import CallCancelled, CancelToken, record_cancelled, record_completed
+from utils.context_compressor import fit_document
+from utils.example_bank import all_example_lines, select_example_lines
+from utils.json_repair import salvage_questions
+from utils.key_pool import acquire_key, is_key_limited, peek_key, pool_size, release_key
+from utils.output_validator import (
+    find_incomplete_sections,
+    parse_sections,
+    score_refinement,
+    section_names,
+    splice_sections,
+)
+from utils.profiler import timed
+from utils.question_bank import fallback_questions
+from utils.question_cache import lookup_questions
+from utils.security import MAX_DOCUMENT_LENGTH, validate_and_sanitize_user_input
+from utils.text_utils import estimate_tokens
 
-from utils.security import validate_and_sanitize_user_input
+if TYPE_CHECKING:
+    # The SDK (and its pydantic models) is imported on first use, not at startup
+    from cerebras.cloud.sdk import Cerebras
+
+logger = logging.getLogger(__name__)
 
 # ── Paths ───────────────────────────────────────────────────────────
 _BASE_DIR = os.path.dirname(os.path.dirname(__file__))
@@ -25,10 +50,49 @@ def _load_json(filename: str) -> dict:
         return json.load(f)
 
 
+# A model within this factor of the fastest calibrated latency is tagged "fast"
+_FAST_LATENCY_FACTOR = 1.25
+# Below this JSON-validity rate the tag warns about unreliable output
+_MIN_JSON_VALID_RATE = 0.9
+
+
+def _model_tag(model: dict, models: list[dict]) -> dict:
+    """
+    Derive a model's UI tag from its measured calibration, if any.
+
+    Falls back to the hand-written ``tag``/``tag_color`` for models that
+    scripts/calibrate_models.py has not measured yet.
+    """
+    calibration = model.get("calibration") or {}
+    latency = calibration.get("latency_ms")
+    if latency is None:
+        return {"tag": model.get("tag", ""), "tag_color": model.get("tag_color", "#94A3B8")}
+
+    fastest = min(
+        m["calibration"]["latency_ms"]
+        for m in models
+        if (m.get("calibration") or {}).get("latency_ms") is not None
+    )
+    if latency <= fastest * _FAST_LATENCY_FACTOR:
+        tag, color = f"fast · {latency / 1000:.1f}s", "#22C55E"
+    else:
+        tag, color = f"{latency / 1000:.1f}s", "#A78BFA"
+
+    valid_rate = calibration.get("json_valid_rate", 1.0)
+    if valid_rate < _MIN_JSON_VALID_RATE:
+        tag, color = f"{tag} · {valid_rate:.0%} JSON", "#FACC15"
+    return {"tag": tag, "tag_color": color}
+
+
 _models_config = _load_json("models.json")
 AVAILABLE_MODELS: list[str] = [m["id"] for m in _models_config["available_models"]]
 MODEL_TAGS: dict[str, dict] = {
-    m["id"]: {"label": m["label"], "tag": m["tag"], "tag_color": m["tag_color"]}
+    m["id"]: {
+        "label": m["label"],
+        **_model_tag(m, _models_config["available_models"]),
+        "calibration": m.get("calibration"),
+        "structured_output": m.get("structured_output", False),
+    }
     for m in _models_config["available_models"]
 }
 DEFAULT_MODEL: str = _models_config["default_model"]
@@ -50,21 +114,82 @@ _QUESTION_TYPE_INSTRUCTIONS = {
     "Academic": "Ask scholarly questions about methodology, references, theoretical frameworks, evidence standards, and academic rigor.",
 }
 
-# ── Client singleton ───────────────────────────────────────────────
-_client: Cerebras | None = None
+# The engine stats panel (?debug=engine) is an operator tool, off unless enabled
+ENGINE_REPORT_ENABLED = os.getenv("ENGINE_STATS_REPORT", "0") == "1"
+
+
+# ── Clients ─────────────────────────────────────────────────────────
+def get_cerebras_client() -> "Cerebras":
+    """
+    Return the client of the key the pool would pick next.
+
+    Engine calls go through ``_complete``, which borrows a key per call
+    (see utils.key_pool); this is for callers that drive the SDK directly.
+    """
+    return peek_key().client
+
 
+# ── Degraded mode ───────────────────────────────────────────────────
+# Seconds analyze_prompt may wait upstream before serving local questions
+ANALYZE_LATENCY_BUDGET = float(os.getenv("ANALYZE_LATENCY_BUDGET", "8"))
+# Input tokens the interviewer sees; longer documents are summarized to fit
+ANALYZE_INPUT_TOKEN_BUDGET = int(os.getenv("ANALYZE_INPUT_TOKEN_BUDGET", "4000"))
+# Consecutive upstream failures that open the circuit, and how long it stays open
+CIRCUIT_FAILURE_THRESHOLD = 3
+CIRCUIT_COOLDOWN_SECONDS = 30.0
 
-def get_cerebras_client() -> Cerebras:
-    """Return a cached Cerebras client instance."""
-    global _client
-    if _client is None:
-        api_key = os.getenv("CEREBRAS_API_KEY")
-        if not api_key:
-            raise ValueError(
-                "CEREBRAS_API_KEY not found. "
-            )
-        _client = Cerebras(api_key=api_key)
-    return _client
+
+
+class UpstreamDeadlineExceeded(TimeoutError):
+    """Raised when a call's whole response took longer than its deadline."""
+
+
+_circuit_lock = threading.Lock()
+_circuit_failures = 0
+_circuit_opened_at: float | None = None
+
+
+def _circuit_is_open() -> bool:
+    """Return True while the upstream is considered down."""
+    global _circuit_opened_at, _circuit_failures
+    with _circuit_lock:
+        if _circuit_opened_at is None:
+            return False
+        if time.monotonic() - _circuit_opened_at >= CIRCUIT_COOLDOWN_SECONDS:
+            # Half-open: let the next request probe the upstream
+            _circuit_opened_at = None
+            _circuit_failures = CIRCUIT_FAILURE_THRESHOLD - 1
+            return False
+        return True
+
+
+def _record_upstream_result(ok: bool) -> None:
+    """Update the circuit breaker after an upstream call."""
+    global _circuit_opened_at, _circuit_failures
+    with _circuit_lock:
+        if ok:
+            _circuit_failures = 0
+            _circuit_opened_at = None
+            return
+        _circuit_failures += 1
+        if _circuit_failures >= CIRCUIT_FAILURE_THRESHOLD:
+            _circuit_opened_at = time.monotonic()
+
+
+def _is_upstream_degradation(error: Exception) -> bool:
+    """
+    Timeouts (per read or over the whole call), connection errors, 429s
+    and 5xx count as degradation, including transport errors raised while
+    a stream is being read.
+    """
+    import httpx
+    from cerebras.cloud.sdk import APIConnectionError, APIStatusError, APITimeoutError
+
+    if isinstance(error, (UpstreamDeadlineExceeded, APITimeoutError, APIConnectionError, httpx.TransportError)):
+        return True
+    if isinstance(error, APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return False
 
 
 def _load_system_prompt(filename: str) -> str:
@@ -74,28 +199,195 @@ def _load_system_prompt(filename: str) -> str:
         return f.read().strip()
 
 
-# ── Interviewer ─────────────────────────────────────────────────────
-def analyze_prompt(
-    raw_prompt: str,
-    model: str = DEFAULT_MODEL,
-    question_type: str = DEFAULT_QUESTION_TYPE,
-    output_template: str = DEFAULT_TEMPLATE,
-) -> dict[str, Any]:
+def _abort_stream(stream) -> None:
     """
-    Send the user's raw prompt to the AI analyst.
+    Abort a stream that another thread is reading.
 
-    The AI returns clarifying questions as JSON:
-        {"questions": ["q1", "q2", ...]}
+    Closing the socket alone does not wake a thread blocked in ``recv``;
+    shutting it down does, and the reader then sees end of stream.
+    """
+    network_stream = stream.response.extensions.get("network_stream")
+    sock = network_stream.get_extra_info("socket") if network_stream is not None else None
+    if sock is not None:
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass  # already closed
+    else:
+        stream.close()
+
+
+def _complete(
+    request: dict,
+    kind: str,
+    cancel_token: CancelToken | None = None,
+    deadline: float | None = None,
+    **client_options: Any,
+) -> str:
+    """
+    Run one chat completion on a pooled API key and return its text.
+
+    ``client_options`` go to the client's ``with_options`` (timeouts,
+    retries). A call refused with 429 or 5xx moves at once to a key it
+    has not tried yet; only on the last untried key does the SDK's own
+    retry-with-backoff apply. ``deadline`` (a ``time.monotonic()`` value)
+    bounds the whole call, retries included.
 
     Raises:
-        ValueError: If input fails validation or AI returns invalid JSON.
+        CallCancelled: If the token fired before the reply was complete.
+        UpstreamDeadlineExceeded: If the deadline passed first.
     """
-    # Validate & sanitize
-    sanitized, error = validate_and_sanitize_user_input(raw_prompt)
-    if error:
-        raise ValueError(error)
+    tried: set[int] = set()
+    key = acquire_key()
+    while True:
+        tried.add(key.index)
+        options = client_options if len(tried) >= pool_size() else {"max_retries": 0, **client_options}
+        if deadline is not None:
+            # The SDK timeout is per read; never let one outlast the deadline
+            options = {**options, "timeout": max(0.01, deadline - time.monotonic())}
+        client = key.client.with_options(**options) if options else key.client
+        try:
+            text = _complete_with(client, request, kind, cancel_token, deadline)
+        except Exception as e:
+            release_key(key, e)
+            retry_key = acquire_key(exclude=tried) if is_key_limited(e) else None
+            if retry_key is None:
+                raise
+            key = retry_key
+            continue
+        release_key(key)
+        return text
+
+
+def _complete_with(
+    client,
+    request: dict,
+    kind: str,
+    cancel_token: CancelToken | None = None,
+    deadline: float | None = None,
+) -> str:
+    """
+    Run one chat completion on ``client`` and return its text.
+
+    With a cancel token the response is streamed: the token is checked
+    between chunks and cancelling shuts down the connection, which wakes
+    the blocked read at once. ``create`` itself blocks until the response
+    headers arrive, so a call cancelled while waiting for its first token
+    is aborted as soon as they do. A stream still open at ``deadline`` is
+    shut down the same way; the client timeout covers the wait for the
+    headers.
+
+    Raises:
+        CallCancelled: If the token fired before the reply was complete.
+        UpstreamDeadlineExceeded: If a stream passed ``deadline``.
+    """
+    start = time.perf_counter()
+    if cancel_token is None:
+        response = client.chat.completions.create(**request)
+        text = response.choices[0].message.content or ""
+        usage = getattr(response, "usage", None)
+        record_completed(kind, getattr(usage, "completion_tokens", None) or estimate_tokens(text),
+                         time.perf_counter() - start)
+        return text
+
+    cancel_token.raise_if_cancelled()
+    stream = client.chat.completions.create(**request, stream=True)
+    unregister = cancel_token.on_cancel(lambda: _abort_stream(stream))
+    expired = threading.Event()
+    timer = None
+    if deadline is not None:
+        def expire() -> None:
+            expired.set()
+            _abort_stream(stream)
+
+        timer = threading.Timer(max(0.0, deadline - time.monotonic()), expire)
+        timer.daemon = True
+        timer.start()
+    parts: list[str] = []
+    try:
+        for chunk in stream:
+            if cancel_token.cancelled or expired.is_set():
+                break
+            if chunk.choices and chunk.choices[0].delta.content:
+                parts.append(chunk.choices[0].delta.content)
+    except Exception:
+        # Closing the stream from another thread surfaces here as a read error
+        if not (cancel_token.cancelled or expired.is_set()):
+            raise
+    finally:
+        if timer is not None:
+            timer.cancel()
+        unregister()
+        stream.close()
+
+    text = "".join(parts)
+    elapsed = time.perf_counter() - start
+    if expired.is_set() and not cancel_token.cancelled:
+        raise UpstreamDeadlineExceeded(f"{kind} took longer than {elapsed:.1f}s")
+    if cancel_token.cancelled:
+        record_cancelled(kind, cancel_token.reason or "cancelled", estimate_tokens(text),
+                         elapsed, request.get("max_tokens", 0))
+        raise CallCancelled(cancel_token.reason)
+    record_completed(kind, estimate_tokens(text), elapsed)
+    return text
+
+
+# ── Interviewer ─────────────────────────────────────────────────────
+QUESTIONS_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "clarifying_questions",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "questions": {"type": "array", "items": {"type": "string"}},
+            },
+            "required": ["questions"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+_structured_output_rejected: set[str] = set()
 
-    system_instruction = _load_system_prompt("interviewer.txt")
+
+def _rejects_response_format(error: Exception) -> bool:
+    """
+    A 400 that names the response format or its schema. Other bad
+    requests (context length, bad parameters) say nothing about the
+    model's structured output support.
+    """
+    if getattr(error, "status_code", None) != 400:
+        return False
+    detail = f"{getattr(error, 'message', '')} {getattr(error, 'body', '')} {error}".lower()
+    return "response_format" in detail or "schema" in detail
+_parse_lock = threading.Lock()
+_parse_stats: dict[str, dict[str, int]] = {}
+
+# "full" sends every example question with each analyze call; "lean" only
+# the few most relevant to the request (see utils.example_bank)
+INTERVIEWER_PROMPT_MODE = os.getenv("INTERVIEWER_PROMPT_MODE", "full")
+
+_prompt_lock = threading.Lock()
+_prompt_stats: dict[str, dict[str, float]] = {}
+
+
+def build_interviewer_instruction(
+    question_type: str = DEFAULT_QUESTION_TYPE,
+    output_template: str = DEFAULT_TEMPLATE,
+    raw_prompt: str = "",
+    lean: bool | None = None,
+) -> str:
+    """
+    Build the interviewer system prompt for a question style and template.
+
+    ``lean`` (default: INTERVIEWER_PROMPT_MODE == "lean") keeps only the
+    example questions relevant to ``raw_prompt``, the style and the
+    template sections.
+    """
+    if lean is None:
+        lean = INTERVIEWER_PROMPT_MODE == "lean"
 
     # Inject the selected output template into the system prompt
     template_data = OUTPUT_TEMPLATES.get(output_template, OUTPUT_TEMPLATES[DEFAULT_TEMPLATE])
@@ -103,8 +395,18 @@ def analyze_prompt(
     
     # Override question style in the system prompt based on selected type
     type_instruction = _QUESTION_TYPE_INSTRUCTIONS.get(question_type, _QUESTION_TYPE_INSTRUCTIONS[DEFAULT_QUESTION_TYPE])
+
+    if lean:
+        examples = select_example_lines(raw_prompt, [type_instruction, *template_data["sections"]])
+    else:
+        examples = all_example_lines()
+    system_instruction = (
+        _load_system_prompt("interviewer.txt")
+        + "\n\nExamples of good questions:\n"
+        + "\n".join(examples)
+    )
     
-    system_instruction += (
+    return system_instruction + (
         f"\n\nIMPORTANT: The user wants their final prompt to be in the '{output_template}' format.\n"
         f"This format consists of the following sections:\n{template_structure}\n"
         f"Your questions MUST help gather specific details to fill these sections.\n\n"
@@ -112,22 +414,11 @@ def analyze_prompt(
         f"Question style: '{question_type}'. {type_instruction}"
     )
 
-    client = get_cerebras_client()
-
-    response = client.chat.completions.create(
-        model=model,
-        messages=[
-            {"role": "system", "content": system_instruction},
-            {"role": "user", "content": sanitized},
-        ],
-        temperature=0.7,
-        max_tokens=800,
-    )
-
-    raw_text = response.choices[0].message.content.strip()
 
+def _parse_questions(raw_text: str, repair: bool = True) -> tuple[dict[str, Any], str]:
+    """Parse an interviewer reply; returns (result, "strict" | "repaired")."""
     # Parse JSON — handle possible markdown code fences
-    cleaned = raw_text
+    cleaned = (raw_text or "").strip()
     if cleaned.startswith("```"):
         lines = cleaned.split("\n")
         lines = [l for l in lines if not l.strip().startswith("```")]
@@ -135,75 +426,667 @@ def analyze_prompt(
 
     try:
         result = json.loads(cleaned)
+        if isinstance(result, dict) and isinstance(result.get("questions"), list):
+            return result, "strict"
+        error = "The AI returned an unexpected format. Please try again."
     except json.JSONDecodeError:
-        raise ValueError(
-            "The AI returned an invalid response. Please try again."
-        )
+        error = "The AI returned an invalid response. Please try again."
 
-    # Validate structure
-    if "questions" not in result or not isinstance(result["questions"], list):
-        raise ValueError(
-            "The AI returned an unexpected format. Please try again."
-        )
+    # Salvage complete questions from malformed or truncated output
+    questions = salvage_questions(cleaned) if repair else []
+    if questions:
+        return {"questions": questions}, "repaired"
+    raise ValueError(error)
 
-    return result
 
+def parse_questions_response(raw_text: str, repair: bool = True) -> dict[str, Any]:
+    """
+    Parse the interviewer's reply into {"questions": [...]}.
 
-# ── Refiner ─────────────────────────────────────────────────────────
-def refine_prompt(
+    With ``repair`` (the default), replies that are not valid JSON are
+    passed through utils.json_repair to salvage any complete questions.
+
+    Raises:
+        ValueError: If no questions can be recovered.
+    """
+    return _parse_questions(raw_text, repair)[0]
+
+
+def _supports_structured_output(model: str) -> bool:
+    """True if models.json declares JSON-schema output for the model."""
+    return MODEL_TAGS.get(model, {}).get("structured_output", False) and model not in _structured_output_rejected
+
+
+def _record_parse_outcome(model: str, outcome: str) -> None:
+    """Count strict / repaired / failed interviewer replies per model."""
+    with _parse_lock:
+        counts = _parse_stats.setdefault(model, {"strict": 0, "repaired": 0, "failed": 0})
+        counts[outcome] += 1
+    if outcome != "strict":
+        logger.warning("analyze_prompt: %s reply from %s", outcome, model)
+
+
+def _record_prompt_size(mode: str, instruction: str, full_instruction: str, seconds: float) -> None:
+    """Accumulate interviewer system-prompt size and call latency per mode."""
+    with _prompt_lock:
+        stats = _prompt_stats.setdefault(mode, {"calls": 0, "system_tokens": 0, "full_tokens": 0, "seconds": 0.0})
+        stats["calls"] += 1
+        stats["system_tokens"] += estimate_tokens(instruction)
+        stats["full_tokens"] += estimate_tokens(full_instruction)
+        stats["seconds"] += seconds
+
+
+def get_prompt_stats() -> dict[str, dict[str, float]]:
+    """
+    Return interviewer prompt size and latency per mode ("full", "lean").
+
+    ``token_reduction`` compares the system prompt sent with the full one
+    the same request would have carried; ``latency_ms`` is the mean
+    upstream time of successful calls.
+    """
+    with _prompt_lock:
+        raw = {mode: dict(stats) for mode, stats in _prompt_stats.items()}
+    report = {}
+    for mode, stats in raw.items():
+        calls = stats["calls"]
+        report[mode] = {
+            "calls": calls,
+            "system_tokens_avg": round(stats["system_tokens"] / calls, 1),
+            "token_reduction": round(1 - stats["system_tokens"] / stats["full_tokens"], 3),
+            "latency_ms": round(stats["seconds"] / calls * 1000),
+        }
+    return report
+
+
+def get_parse_stats() -> dict[str, dict[str, float]]:
+    """
+    Return interviewer parse outcomes per model.
+
+    ``retry_rate`` is the share of replies that would have forced the user
+    to retry without repair; ``failure_rate`` the share that still did.
+    """
+    with _parse_lock:
+        stats = {model: dict(counts) for model, counts in _parse_stats.items()}
+    for counts in stats.values():
+        total = counts["strict"] + counts["repaired"] + counts["failed"]
+        counts["retry_rate"] = (counts["repaired"] + counts["failed"]) / total if total else 0.0
+        counts["failure_rate"] = counts["failed"] / total if total else 0.0
+    return stats
+
+
+@timed("engine.analyze_prompt")
+def analyze_prompt(
     raw_prompt: str,
-    answers: dict[str, str],
     model: str = DEFAULT_MODEL,
+    question_type: str = DEFAULT_QUESTION_TYPE,
     output_template: str = DEFAULT_TEMPLATE,
-) -> str:
+    precomputed: bool = True,
+    cancel_token: CancelToken | None = None,
+) -> dict[str, Any]:
     """
-    Combine the raw prompt and user answers, then send to the AI refiner.
+    Send the user's raw prompt to the AI analyst.
+
+    The AI returns clarifying questions as JSON:
+        {"questions": ["q1", "q2", ...]}
 
-    Returns the refined prompt as a formatted string.
+    A document longer than ANALYZE_INPUT_TOKEN_BUDGET is summarized
+    locally first; clarifying questions only need its gist, and the
+    full text would overflow the model's context. An unmodified built-in
+    template is answered from the precomputed cache
+    (``"source": "precomputed"``) unless ``precomputed`` is False.
+    If the upstream exceeds ANALYZE_LATENCY_BUDGET, is unreachable, or the
+    circuit is open, five questions from the local bank are returned
+    instead, marked with ``"source": "fallback"``.
 
     Raises:
-        ValueError: If the AI fails to generate a refined prompt.
+        ValueError: If input fails validation or AI returns invalid JSON.
+        CallCancelled: If ``cancel_token`` fired mid-call.
     """
+    # Validate & sanitize
+    sanitized, error = validate_and_sanitize_user_input(
+        raw_prompt, max_length=MAX_DOCUMENT_LENGTH
+    )
+    if error:
+        raise ValueError(error)
+    sanitized = fit_document(sanitized, ANALYZE_INPUT_TOKEN_BUDGET)
+
+    system_instruction = build_interviewer_instruction(question_type, output_template, sanitized)
+    template_data = OUTPUT_TEMPLATES.get(output_template, OUTPUT_TEMPLATES[DEFAULT_TEMPLATE])
+
+    if precomputed:
+        cached = lookup_questions(system_instruction, sanitized, model)
+        if cached:
+            return {"questions": cached, "source": "precomputed"}
+
+    if _circuit_is_open():
+        return _fallback_result(sanitized, template_data["sections"])
+
+    client_options = {
+        "timeout": ANALYZE_LATENCY_BUDGET,
+        "max_retries": 0,
+        "warm_tcp_connection": False,
+    }
+
+    request = {
+        "model": model,
+        "messages": [
+            {"role": "system", "content": system_instruction},
+            {"role": "user", "content": sanitized},
+        ],
+        "temperature": 0.7,
+        "max_tokens": 800,
+    }
+    start = time.perf_counter()
+    # The budget covers the whole reply, however slowly it streams
+    deadline = time.monotonic() + ANALYZE_LATENCY_BUDGET
+    try:
+        if _supports_structured_output(model):
+            try:
+                reply = _complete(
+                    {**request, "response_format": QUESTIONS_RESPONSE_FORMAT}, "analyze", cancel_token,
+                    deadline, **client_options,
+                )
+            except Exception as e:
+                if not _rejects_response_format(e):
+                    raise
+                # The model rejected the schema; remember and use plain mode
+                _structured_output_rejected.add(model)
+                reply = _complete(request, "analyze", cancel_token, deadline, **client_options)
+        else:
+            reply = _complete(request, "analyze", cancel_token, deadline, **client_options)
+    except Exception as e:
+        if not _is_upstream_degradation(e):
+            raise
+        _record_upstream_result(ok=False)
+        return _fallback_result(sanitized, template_data["sections"])
+    _record_upstream_result(ok=True)
+    lean = INTERVIEWER_PROMPT_MODE == "lean"
+    _record_prompt_size(
+        "lean" if lean else "full",
+        system_instruction,
+        build_interviewer_instruction(question_type, output_template, sanitized, lean=False) if lean else system_instruction,
+        time.perf_counter() - start,
+    )
+
+    try:
+        result, outcome = _parse_questions(reply)
+    except ValueError:
+        _record_parse_outcome(model, "failed")
+        raise
+    _record_parse_outcome(model, outcome)
+    return result
+
+
+def _fallback_result(raw_prompt: str, sections: list[str]) -> dict[str, Any]:
+    """Build an analyze_prompt result from the offline question bank."""
+    return {
+        "questions": fallback_questions(raw_prompt, sections, count=5),
+        "source": "fallback",
+    }
+
+
+# ── Refiner ─────────────────────────────────────────────────────────
+# Output budget of one refinement
+REFINE_MAX_TOKENS = 1500
+# Output tokens allowed per section in a targeted repair request
+REPAIR_TOKENS_PER_SECTION = 200
+
+_repair_lock = threading.Lock()
+_repair_stats = {"validated": 0, "repaired": 0, "sections_repaired": 0, "repair_failures": 0}
+
+# English prompts cost fewer tokens downstream than most other languages
+_ENGLISH_OUTPUT_RULE = (
+    "Write the refined prompt in English, even if the user's prompt and answers "
+    "are in another language. Keep names, quoted text and code unchanged."
+)
+
+
+def build_refiner_instruction(output_template: str = DEFAULT_TEMPLATE, english: bool = False) -> str:
+    """Build the refiner system prompt for an output template."""
     system_instruction = _load_system_prompt("refiner.txt")
 
     # Inject the selected output template into the system prompt
     template_data = OUTPUT_TEMPLATES.get(output_template, OUTPUT_TEMPLATES[DEFAULT_TEMPLATE])
     template_structure = "\n".join(template_data["sections"])
-    system_instruction += (
+    instruction = system_instruction + (
         f"\n\nIMPORTANT: You MUST format your refined prompt output using the "
         f"'{output_template}' framework. Structure the output EXACTLY as follows:\n"
         f"{template_structure}\n\n"
         f"Fill in each section with content derived from the user's original prompt and their answers."
     )
+    if english:
+        instruction += f"\n\n{_ENGLISH_OUTPUT_RULE}"
+    return instruction
 
-    client = get_cerebras_client()
 
-    # Build the user message with context
+def build_refiner_message(raw_prompt: str, answers: dict[str, str]) -> str:
+    """Build the refiner user message from the raw prompt and answers."""
     answers_text = "\n".join(
         f"Q: {question}\nA: {answer}"
         for question, answer in answers.items()
     )
 
-    user_message = (
+    return (
         f"ORIGINAL PROMPT:\n{raw_prompt}\n\n"
         f"ADDITIONAL CONTEXT FROM USER:\n{answers_text}"
     )
 
-    response = client.chat.completions.create(
-        model=model,
-        messages=[
+
+@timed("engine.refine_prompt")
+def refine_prompt(
+    raw_prompt: str,
+    answers: dict[str, str],
+    model: str = DEFAULT_MODEL,
+    output_template: str = DEFAULT_TEMPLATE,
+    repair: bool = True,
+    english: bool = False,
+    cancel_token: CancelToken | None = None,
+) -> str:
+    """
+    Combine the raw prompt and user answers, then send to the AI refiner.
+
+    Returns the refined prompt as a formatted string. With ``repair``, the
+    result is checked against the template's sections and any missing or
+    empty ones are regenerated by a small follow-up call and spliced in.
+    With ``english``, the prompt is written in English whatever the input
+    language, in the same call.
+
+    Raises:
+        ValueError: If the AI fails to generate a refined prompt.
+        CallCancelled: If ``cancel_token`` fired mid-call.
+    """
+    system_instruction = build_refiner_instruction(output_template, english=english)
+    user_message = build_refiner_message(raw_prompt, answers)
+
+    refined = _complete({
+        "model": model,
+        "messages": [
             {"role": "system", "content": system_instruction},
             {"role": "user", "content": user_message},
         ],
-        temperature=0.7,
-        max_tokens=1500,
-    )
-
-    refined = response.choices[0].message.content.strip()
+        "temperature": 0.7,
+        "max_tokens": REFINE_MAX_TOKENS,
+    }, "refine", cancel_token).strip()
 
     if not refined:
         raise ValueError(
             "The AI returned an empty response. Please try again."
         )
 
+    if repair:
+        if cancel_token is not None:
+            cancel_token.raise_if_cancelled()
+        refined = repair_refined_prompt(refined, user_message, model, output_template, english, cancel_token)
+
     return refined
+
+
+# ── Best-of-N refinement ────────────────────────────────────────────
+# Candidates requested per best-of refinement, and the local score that
+# ends the race early
+BEST_OF_N = int(os.getenv("BEST_OF_N", "3"))
+BEST_OF_THRESHOLD = float(os.getenv("BEST_OF_THRESHOLD", "0.9"))
+# "" runs every candidate on the selected model; "all" spreads them over
+# data/models.json (selected model first); or a comma-separated list of ids
+BEST_OF_MODELS = os.getenv("BEST_OF_MODELS", "")
+# Candidate calls in flight across all sessions; more wait in the queue
+BEST_OF_WORKERS = int(os.getenv("BEST_OF_WORKERS", "8"))
+# How long the winner waits for cancelled losers to stop, for the report
+_LOSER_GRACE_SECONDS = 0.2
+
+_best_of_executor = ThreadPoolExecutor(max_workers=BEST_OF_WORKERS, thread_name_prefix="best-of")
+_best_of_lock = threading.Lock()
+_best_of_stats = {
+    "runs": 0,
+    "early_stops": 0,
+    "candidates_started": 0,
+    "candidates_scored": 0,
+    "candidates_cancelled": 0,
+    "winner_score_total": 0.0,
+}
+
+
+def _best_of_models(model: str) -> list[str]:
+    if BEST_OF_MODELS == "all":
+        return [model] + [m for m in AVAILABLE_MODELS if m != model]
+    if BEST_OF_MODELS:
+        return [m.strip() for m in BEST_OF_MODELS.split(",") if m.strip()]
+    return [model]
+
+
+@timed("engine.refine_best_of")
+def refine_best_of(
+    raw_prompt: str,
+    answers: dict[str, str],
+    model: str = DEFAULT_MODEL,
+    output_template: str = DEFAULT_TEMPLATE,
+    english: bool = False,
+    n: int | None = None,
+    threshold: float | None = None,
+    cancel_token: CancelToken | None = None,
+) -> tuple[str, dict[str, Any]]:
+    """
+    Request ``n`` refinements at once and keep the best.
+
+    Candidates run on a pool shared by all sessions (BEST_OF_WORKERS
+    calls at a time). Each is scored locally as it finishes
+    (utils.output_validator.score_refinement). The first one scoring at
+    least ``threshold`` wins at once: queued candidates are dropped and
+    running ones cancelled. Otherwise the best of all is used. The winner
+    then goes through the usual section repair.
+
+    Returns:
+        (refined prompt, report) where report has the candidate counts
+        by outcome (scored, failed, cancelled, and running for losers
+        still stopping when the report was made), the winning candidate,
+        its model and its score.
+
+    Raises:
+        ValueError: If every candidate failed (the first error).
+        CallCancelled: If ``cancel_token`` fired mid-call.
+    """
+    n = n or BEST_OF_N
+    threshold = BEST_OF_THRESHOLD if threshold is None else threshold
+    models = _best_of_models(model)
+    template_data = OUTPUT_TEMPLATES.get(output_template, OUTPUT_TEMPLATES[DEFAULT_TEMPLATE])
+    names = section_names(template_data)
+
+    owner = cancel_token.owner if cancel_token is not None else ""
+    tokens = [CancelToken(owner, "best-of") for _ in range(n)]
+    unregister = lambda: None  # noqa: E731
+    if cancel_token is not None:
+        unregister = cancel_token.on_cancel(
+            lambda: [token.cancel(cancel_token.reason or "cancelled") for token in tokens]
+        )
+
+    futures = {
+        _best_of_executor.submit(
+            refine_prompt,
+            raw_prompt,
+            answers,
+            model=models[i % len(models)],
+            output_template=output_template,
+            repair=False,
+            english=english,
+            cancel_token=tokens[i],
+        ): i
+        for i in range(n)
+    }
+
+    best: tuple[int, dict[str, float], str] | None = None
+    errors: list[Exception] = []
+    scored = cancelled = 0
+
+    def collect(future) -> bool:
+        """Record one finished candidate; True if it meets the threshold."""
+        nonlocal best, scored, cancelled
+        try:
+            text = future.result()
+        except (CallCancelled, FutureCancelled):
+            cancelled += 1
+            return False
+        except Exception as e:
+            errors.append(e)
+            return False
+        scored += 1
+        score = score_refinement(text, names, REFINE_MAX_TOKENS)
+        if best is None or score["score"] > best[1]["score"]:
+            best = (futures[future], score, text)
+        return score["score"] >= threshold
+
+    pending = set(futures)
+    try:
+        for future in as_completed(futures):
+            pending.discard(future)
+            if collect(future):
+                break
+    finally:
+        unregister()
+        for future in pending:
+            future.cancel()  # still queued: never starts
+        for token in tokens:
+            token.cancel("best-of: winner chosen")
+
+    # Count the losers by how they actually ended; don't wait on stragglers
+    done, pending = wait(pending, timeout=_LOSER_GRACE_SECONDS)
+    for future in done:
+        collect(future)
+
+    if cancel_token is not None:
+        cancel_token.raise_if_cancelled()
+    if best is None:
+        raise errors[0] if errors else ValueError("The AI returned an empty response. Please try again.")
+
+    winner, score, refined = best
+    early_stop = score["score"] >= threshold and scored + len(errors) < n
+    report = {
+        "candidates": n,
+        "scored": scored,
+        "failed": len(errors),
+        "cancelled": cancelled,
+        "running": len(pending),
+        "winner": winner + 1,
+        "model": models[winner % len(models)],
+        "score": score["score"],
+        "early_stop": early_stop,
+    }
+    with _best_of_lock:
+        _best_of_stats["runs"] += 1
+        _best_of_stats["early_stops"] += int(early_stop)
+        _best_of_stats["candidates_started"] += n
+        _best_of_stats["candidates_scored"] += scored
+        _best_of_stats["candidates_cancelled"] += cancelled
+        _best_of_stats["winner_score_total"] += score["score"]
+
+    refined = repair_refined_prompt(
+        refined, build_refiner_message(raw_prompt, answers), report["model"], output_template, english,
+        cancel_token,
+    )
+    return refined, report
+
+
+def get_best_of_stats() -> dict[str, float]:
+    """Return best-of counters, the early-stop rate and the mean winning score."""
+    with _best_of_lock:
+        stats = dict(_best_of_stats)
+    runs = stats.pop("runs")
+    total = stats.pop("winner_score_total")
+    return {
+        "runs": runs,
+        **stats,
+        "early_stop_rate": round(stats["early_stops"] / runs, 3) if runs else 0.0,
+        "mean_winner_score": round(total / runs, 3) if runs else 0.0,
+    }
+
+
+def _generate_sections(
+    refined: str,
+    user_message: str,
+    names: list[str],
+    model: str,
+    output_template: str,
+    task: str,
+    english: bool = False,
+    cancel_token: CancelToken | None = None,
+) -> dict[str, str]:
+    """
+    Ask for just the ``names`` sections of ``refined`` and return
+    {name: content} for those that came back.
+
+    Raises:
+        CallCancelled: If ``cancel_token`` fired mid-call.
+        Exception: Upstream errors (rate limits, 5xx, auth) as raised by
+            the SDK.
+    """
+    template_data = OUTPUT_TEMPLATES.get(output_template, OUTPUT_TEMPLATES[DEFAULT_TEMPLATE])
+    wanted = "\n".join(
+        entry for entry in template_data["sections"]
+        if entry.split(":", 1)[0].strip() in names
+    )
+    system_instruction = _load_system_prompt("refiner.txt") + (
+        f"\n\nIMPORTANT: A refined prompt in the '{output_template}' framework {task}. "
+        f"Write ONLY these sections, each starting with its name and a colon:\n"
+        f"{wanted}\n\n"
+        f"Stay consistent with the existing refined prompt. Do not repeat any other section."
+    )
+    if english:
+        system_instruction += f"\n\n{_ENGLISH_OUTPUT_RULE}"
+
+    text = _complete({
+        "model": model,
+        "messages": [
+            {"role": "system", "content": system_instruction},
+            {"role": "user", "content": f"{user_message}\n\nEXISTING REFINED PROMPT:\n{refined}"},
+        ],
+        "temperature": 0.3,
+        "max_tokens": REPAIR_TOKENS_PER_SECTION * len(names),
+    }, "sections", cancel_token).strip()
+
+    parsed = parse_sections(text, names)
+    generated = {name: parsed[name][2] for name in names if name in parsed and parsed[name][2]}
+    if not generated and len(names) == 1 and text:
+        generated = {names[0]: text}
+    return generated
+
+
+@timed("engine.repair_refined_prompt")
+def repair_refined_prompt(
+    refined: str,
+    user_message: str,
+    model: str = DEFAULT_MODEL,
+    output_template: str = DEFAULT_TEMPLATE,
+    english: bool = False,
+    cancel_token: CancelToken | None = None,
+) -> str:
+    """
+    Regenerate only the template sections missing from ``refined``.
+
+    The repair request asks for just those sections, with a small
+    max_tokens, and splices them into the existing text. On any failure
+    the original text is returned unchanged. ``english`` must match the
+    refinement, so the repaired sections are in the same language.
+
+    Raises:
+        CallCancelled: If ``cancel_token`` fired mid-call.
+    """
+    template_data = OUTPUT_TEMPLATES.get(output_template, OUTPUT_TEMPLATES[DEFAULT_TEMPLATE])
+    names = section_names(template_data)
+    incomplete = find_incomplete_sections(refined, names)
+
+    with _repair_lock:
+        _repair_stats["validated"] += 1
+    if not incomplete:
+        return refined
+
+    try:
+        repaired = _generate_sections(
+            refined,
+            user_message,
+            incomplete,
+            model,
+            output_template,
+            task="is missing some sections",
+            english=english,
+            cancel_token=cancel_token,
+        )
+    except CallCancelled:
+        raise
+    except Exception as e:
+        # The refinement itself succeeded; a failed repair only leaves it as is
+        logger.warning("Section repair failed: %s", e)
+        repaired = {}
+
+    with _repair_lock:
+        if repaired:
+            _repair_stats["repaired"] += 1
+            _repair_stats["sections_repaired"] += len(repaired)
+        else:
+            _repair_stats["repair_failures"] += 1
+
+    return splice_sections(refined, names, repaired) if repaired else refined
+
+
+@timed("engine.regenerate_sections")
+def regenerate_sections(
+    refined: str,
+    raw_prompt: str,
+    answers: dict[str, str],
+    sections: list[str],
+    model: str = DEFAULT_MODEL,
+    output_template: str = DEFAULT_TEMPLATE,
+    english: bool = False,
+    cancel_token: CancelToken | None = None,
+) -> str:
+    """
+    Rewrite only ``sections`` of ``refined`` from updated answers.
+
+    Used after the user edits an answer in the result view: the other
+    sections are kept verbatim, so output tokens scale with the sections
+    touched rather than the whole prompt. ``english`` keeps the rewritten
+    sections in English, like the refinement they are spliced into.
+
+    Raises:
+        ValueError: If none of the requested sections came back.
+        CallCancelled: If ``cancel_token`` fired mid-call.
+        Exception: Upstream errors from the SDK, unchanged.
+    """
+    template_data = OUTPUT_TEMPLATES.get(output_template, OUTPUT_TEMPLATES[DEFAULT_TEMPLATE])
+    regenerated = _generate_sections(
+        refined,
+        build_refiner_message(raw_prompt, answers),
+        sections,
+        model,
+        output_template,
+        task="must be updated because the user changed some answers",
+        english=english,
+        cancel_token=cancel_token,
+    )
+    if not regenerated:
+        raise ValueError("The AI returned an empty response. Please try again.")
+    return splice_sections(refined, section_names(template_data), regenerated)
+
+
+@timed("engine.translate_to_english")
+def translate_to_english(
+    refined_prompt: str,
+    model: str = DEFAULT_MODEL,
+    cancel_token: CancelToken | None = None,
+) -> str:
+    """
+    Render an already refined prompt in English, keeping its structure.
+
+    A cheap follow-up for results that were refined in another language:
+    the output budget is sized from the input, since the English version
+    is normally shorter.
+
+    Raises:
+        ValueError: If the AI returns an empty translation.
+        CallCancelled: If ``cancel_token`` fired mid-call.
+    """
+    system_instruction = _load_system_prompt("refiner.txt") + (
+        f"\n\nIMPORTANT: Translate the refined prompt below into English. "
+        f"Keep every section heading, the section order and the meaning exactly; "
+        f"do not add, drop or improve anything. {_ENGLISH_OUTPUT_RULE}"
+    )
+
+    translated = _complete({
+        "model": model,
+        "messages": [
+            {"role": "system", "content": system_instruction},
+            {"role": "user", "content": refined_prompt},
+        ],
+        "temperature": 0.2,
+        "max_tokens": min(1500, estimate_tokens(refined_prompt) + 200),
+    }, "translate", cancel_token).strip()
+    if not translated:
+        raise ValueError("The AI returned an empty response. Please try again.")
+    return translated
+
+
+def get_repair_stats() -> dict[str, float]:
+    """Return repair counters and the share of refinements that needed one."""
+    with _repair_lock:
+        stats = dict(_repair_stats)
+    attempted = stats["repaired"] + stats["repair_failures"]
+    stats["repair_rate"] = attempted / stats["validated"] if stats["validated"] else 0.0
+    return stats
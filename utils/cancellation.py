@@ -0,0 +1,116 @@
+"""
+Cancellation
+=============
+Cancel tokens for upstream LLM calls, and the accounting of what
+cancelling saved.
+
+A ``CancelToken`` belongs to one session and one step. Engine calls made
+with a token stream their response and check it between chunks; a
+cancel also shuts down the open connection from whichever thread calls
+``cancel()``, so the call stops at the transport level instead of
+running to completion. A call still waiting for its first token is
+aborted as soon as the response starts.
+
+Savings are estimates: a cancelled call is compared with the running
+mean output tokens and duration of completed calls of the same kind.
+"""
+
+import threading
+from typing import Callable
+
+
+class CallCancelled(Exception):
+    """Raised by an engine call whose cancel token fired."""
+
+
+class CancelToken:
+    """Thread-safe cancellation flag with close-on-cancel callbacks."""
+
+    def __init__(self, owner: str = "", step: str = ""):
+        self.owner = owner
+        self.step = step
+        self.reason: str | None = None
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: list[Callable[[], None]] = []
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self, reason: str = "cancelled") -> None:
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                pass  # the transport may already be closed
+
+    def on_cancel(self, callback: Callable[[], None]) -> Callable[[], None]:
+        """Register ``callback`` (run at once if already cancelled); returns an unregister function."""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+
+                def unregister() -> None:
+                    with self._lock:
+                        if callback in self._callbacks:
+                            self._callbacks.remove(callback)
+
+                return unregister
+        callback()
+        return lambda: None
+
+    def raise_if_cancelled(self) -> None:
+        if self._event.is_set():
+            raise CallCancelled(self.reason)
+
+
+# ── Accounting ──────────────────────────────────────────────────────
+_stats_lock = threading.Lock()
+_stats = {"cancelled": 0, "tokens_received": 0, "tokens_saved_est": 0, "seconds_saved_est": 0.0}
+# kind -> {"calls", "tokens", "seconds"} over completed calls
+_baselines: dict[str, dict[str, float]] = {}
+_reasons: dict[str, int] = {}
+
+
+def record_completed(kind: str, tokens: int, seconds: float) -> None:
+    """Feed a completed call into the per-kind baseline."""
+    with _stats_lock:
+        base = _baselines.setdefault(kind, {"calls": 0, "tokens": 0, "seconds": 0.0})
+        base["calls"] += 1
+        base["tokens"] += tokens
+        base["seconds"] += seconds
+
+
+def record_cancelled(kind: str, reason: str, tokens_received: int, elapsed: float, max_tokens: int) -> None:
+    """Count a cancelled call and estimate what it would have cost."""
+    with _stats_lock:
+        base = _baselines.get(kind)
+        if base and base["calls"]:
+            expected_tokens = base["tokens"] / base["calls"]
+            expected_seconds = base["seconds"] / base["calls"]
+        else:
+            # No history yet: assume half the output budget at the elapsed rate
+            expected_tokens = max_tokens / 2
+            expected_seconds = elapsed
+        _stats["cancelled"] += 1
+        _stats["tokens_received"] += tokens_received
+        _stats["tokens_saved_est"] += int(max(0.0, expected_tokens - tokens_received))
+        _stats["seconds_saved_est"] += max(0.0, expected_seconds - elapsed)
+        _reasons[reason] = _reasons.get(reason, 0) + 1
+
+
+def get_cancel_stats() -> dict:
+    """Return cancellation counters, estimated savings and reasons."""
+    with _stats_lock:
+        return {
+            **_stats,
+            "seconds_saved_est": round(_stats["seconds_saved_est"], 2),
+            "by_reason": dict(_reasons),
+        }
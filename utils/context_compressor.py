@@ -0,0 +1,271 @@
+"""
+Context Compressor
+===================
+Local pipeline stage that shrinks the refiner's input before it is sent
+upstream — no model download, no network call.
+
+  1. Questions the user left blank are dropped.
+  2. Prose sentences that repeat something already said (in the raw
+     prompt or an earlier answer) are removed.
+  3. Only with REFINE_CONTEXT_SUMMARIZE=1: if the result is still above
+     REFINE_CONTEXT_TOKEN_BUDGET, prose is reduced by extractive
+     summarization: sentences are scored by how central their terms are
+     to the whole context, and the best ones are kept in their original
+     order.
+
+Fenced code blocks, structured lines (list items, table rows, headings,
+indented lines) and blank lines are kept verbatim: they are never
+deduplicated or summarized. Lines that lose nothing are copied exactly,
+so text with nothing to drop comes back unchanged.
+
+``fit_document`` applies the same summarization to a single document,
+for calls that only need its gist (the interviewer).
+"""
+
+import math
+import os
+import re
+from collections import Counter
+from itertools import groupby
+from typing import Any
+
+from utils.text_utils import estimate_tokens, split_sentences, tokenize
+
+REFINE_CONTEXT_TOKEN_BUDGET = int(os.getenv("REFINE_CONTEXT_TOKEN_BUDGET", "1200"))
+# Summarization drops content, so the refiner only gets it when asked for
+REFINE_CONTEXT_SUMMARIZE = os.getenv("REFINE_CONTEXT_SUMMARIZE", "0") == "1"
+
+# Token-set overlap above which a sentence counts as a duplicate
+_DUPLICATE_JACCARD = 0.8
+# The raw prompt always keeps at least this share of the budget
+_MIN_PROMPT_SHARE = 0.5
+
+
+# ── Blocks ──────────────────────────────────────────────────────────
+_FENCE_RE = re.compile(r"^[ \t]*(```|~~~)")
+_STRUCTURED_RE = re.compile(r"^(?:\s{2,}|\t)\S|^\s*(?:[-*+•]\s|\d+[.)]\s|\||#|>)")
+
+
+def _split_units(text: str) -> list[tuple[str, bool, int]]:
+    """
+    Split text into (unit, verbatim, line) triples.
+
+    A fenced code block is one verbatim unit; a structured or blank line
+    is one verbatim unit; any other line is split into prose sentences.
+    ``line`` numbers the source line (or block) so ``_join_units`` can
+    restore the layout.
+    """
+    units: list[tuple[str, bool, int]] = []
+    fence: list[str] | None = None
+    marker = ""
+    for line_no, line in enumerate(text.split("\n")):
+        if fence is not None:
+            fence.append(line)
+            if line.strip().startswith(marker):
+                units.append(("\n".join(fence), True, line_no))
+                fence = None
+            continue
+        opening = _FENCE_RE.match(line)
+        if opening:
+            fence, marker = [line], opening.group(1)
+        elif not line.strip() or _STRUCTURED_RE.match(line):
+            units.append((line, True, line_no))
+        else:
+            units.extend((s, False, line_no) for s in split_sentences(line))
+    if fence is not None:  # unclosed fence: the rest of the text is code
+        units.append(("\n".join(fence), True, line_no))
+    return units
+
+
+def _join_units(units: list[tuple[str, bool, int]], text: str) -> str:
+    """
+    Rebuild ``text`` from its kept ``units``: a prose line that kept all
+    its sentences is copied from ``text``; one that lost some joins the
+    rest with spaces. Blank lines right after a dropped line are dropped
+    too, so removed paragraphs leave no gaps.
+    """
+    lines = text.split("\n")
+    out: list[str] = []
+    previous = -1
+    for line_no, group in groupby(units, key=lambda u: u[2]):
+        group = list(group)
+        if not lines[line_no].strip() and (line_no != previous + 1 or not out):
+            continue
+        previous = line_no
+        if group[0][1]:
+            out.append(group[0][0])  # verbatim: a whole line or fenced block
+        elif len(group) == len(split_sentences(lines[line_no])):
+            out.append(lines[line_no])
+        else:
+            out.append(" ".join(u[0] for u in group))
+    return "\n".join(out)
+
+
+def _summarize_units(
+    units: list[tuple[str, bool, int]], token_budget: int, focus: Counter | None = None
+) -> list[tuple[str, bool, int]]:
+    """Summarize the prose units into what the verbatim ones leave of the budget."""
+    prose = [i for i, u in enumerate(units) if not u[1]]
+    verbatim_tokens = sum(estimate_tokens(u[0]) for u in units if u[1])
+    chosen = _choose([units[i][0] for i in prose], max(0, token_budget - verbatim_tokens), focus)
+    kept = {prose[i] for i in chosen}
+    return [u for i, u in enumerate(units) if u[1] or i in kept]
+
+
+# ── Deduplication and summarization ─────────────────────────────────
+def _jaccard(a: set[str], b: set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def _dedupe(
+    units: list[tuple[str, bool, int]], seen: list[set[str]]
+) -> tuple[list[tuple[str, bool, int]], int]:
+    """Drop prose units that overlap an already-seen one; extends ``seen``."""
+    kept, dropped = [], 0
+    for unit in units:
+        if unit[1]:
+            kept.append(unit)
+            continue
+        terms = set(tokenize(unit[0]))
+        if terms and any(_jaccard(terms, s) >= _DUPLICATE_JACCARD for s in seen):
+            dropped += 1
+            continue
+        seen.append(terms)
+        kept.append(unit)
+    return kept, dropped
+
+
+def _choose(sentences: list[str], token_budget: int, focus: Counter | None = None) -> set[int]:
+    """
+    Indices of the highest-scoring sentences that fit ``token_budget``.
+
+    A sentence scores the average log-frequency of its terms across the
+    text, boosted by ``focus`` terms (e.g. from the questions) and slightly
+    by position, since opening sentences usually carry the request itself.
+    """
+    costs = [estimate_tokens(s) for s in sentences]
+    if sum(costs) <= token_budget:
+        return set(range(len(sentences)))
+
+    term_sets = [tokenize(s) for s in sentences]
+    freq = Counter(term for terms in term_sets for term in set(terms))
+    focus = focus or Counter()
+
+    scores = []
+    for i, terms in enumerate(term_sets):
+        if not terms:
+            scores.append(0.0)
+            continue
+        centrality = sum(math.log1p(freq[t]) + 2.0 * bool(focus[t]) for t in terms)
+        position = 1.0 + 1.0 / (1 + i)
+        scores.append(position * centrality / math.sqrt(len(terms)))
+
+    keep, used = set(), 0
+    for i in sorted(range(len(sentences)), key=lambda i: scores[i], reverse=True):
+        if used + costs[i] <= token_budget:
+            keep.add(i)
+            used += costs[i]
+    return keep
+
+
+def fit_document(text: str, token_budget: int) -> str:
+    """
+    Reduce ``text`` to about ``token_budget`` tokens, keeping its most
+    central prose sentences in order and its code blocks and structured
+    lines whole.
+
+    When the verbatim parts alone exceed the budget, whole units are kept
+    from the start until the budget is used; text with no unit that fits
+    is cut at the budget.
+    """
+    if estimate_tokens(text) <= token_budget:
+        return text
+    units = _split_units(text)
+    if sum(estimate_tokens(u[0]) for u in units if u[1]) <= token_budget:
+        kept = _summarize_units(units, token_budget)
+    else:
+        kept, used = [], 0
+        for unit in units:
+            used += estimate_tokens(unit[0])
+            if used > token_budget:
+                break
+            kept.append(unit)
+    if not kept:
+        return text[: token_budget * 4]
+    return _join_units(kept, text)
+
+
+def compress_context(
+    raw_prompt: str,
+    answers: dict[str, str],
+    token_budget: int = REFINE_CONTEXT_TOKEN_BUDGET,
+    summarize_over_budget: bool = REFINE_CONTEXT_SUMMARIZE,
+) -> tuple[str, dict[str, str], dict[str, Any]]:
+    """
+    Compress the raw prompt and answers for refine_prompt. Summarization
+    (step 3) only runs with ``summarize_over_budget``.
+
+    Returns:
+        (raw_prompt, answers, stats) — stats holds original/compressed
+        token estimates, tokens_saved, dropped_answers and
+        duplicate_sentences.
+    """
+    original_tokens = estimate_tokens(raw_prompt) + sum(
+        estimate_tokens(f"Q: {q}\nA: {a}") for q, a in answers.items()
+    )
+
+    # 1. Drop unanswered questions
+    answered = {q: a.strip() for q, a in answers.items() if a and a.strip()}
+    dropped_answers = len(answers) - len(answered)
+
+    # 2. Dedupe prose across the prompt and answers, in reading order
+    seen: list[set[str]] = []
+    all_prompt_units = _split_units(raw_prompt)
+    prompt_units, duplicates = _dedupe(all_prompt_units, seen)
+    compact_answers: dict[str, list[tuple[str, bool, int]]] = {}
+    for question, answer in answered.items():
+        kept, dropped = _dedupe(_split_units(answer), seen)
+        duplicates += dropped
+        if kept:
+            compact_answers[question] = kept
+        else:
+            dropped_answers += 1
+
+    # 3. Summarize down to the budget, prompt first (opt-in: it is lossy)
+    if summarize_over_budget:
+        focus = Counter(tokenize(" ".join(answered)))
+        answer_tokens = sum(
+            estimate_tokens(f"Q: {q}\nA: {_join_units(a, answered[q])}") for q, a in compact_answers.items()
+        )
+        prompt_budget = max(token_budget - answer_tokens, int(token_budget * _MIN_PROMPT_SHARE))
+        prompt_units = _summarize_units(prompt_units, prompt_budget, focus)
+
+        remaining = token_budget - estimate_tokens(_join_units(prompt_units, raw_prompt))
+        if answer_tokens > remaining > 0:
+            ratio = remaining / answer_tokens
+            compact_answers = {
+                q: _summarize_units(a, max(1, int(estimate_tokens(_join_units(a, answered[q])) * ratio)), focus)
+                or a[:1]
+                for q, a in compact_answers.items()
+            }
+
+    # Nothing dropped: hand the prompt on exactly as written
+    if len(prompt_units) == len(all_prompt_units):
+        compressed_prompt = raw_prompt
+    else:
+        compressed_prompt = _join_units(prompt_units, raw_prompt)
+    compressed_answers = {q: _join_units(a, answered[q]) for q, a in compact_answers.items()}
+
+    compressed_tokens = estimate_tokens(compressed_prompt) + sum(
+        estimate_tokens(f"Q: {q}\nA: {a}") for q, a in compressed_answers.items()
+    )
+    stats = {
+        "original_tokens": original_tokens,
+        "compressed_tokens": compressed_tokens,
+        "tokens_saved": max(0, original_tokens - compressed_tokens),
+        "dropped_answers": dropped_answers,
+        "duplicate_sentences": duplicates,
+    }
+    return compressed_prompt, compressed_answers, stats
@@ -0,0 +1,117 @@
+"""
+Interviewer Examples
+=====================
+The example questions shown to the interviewer model. They live in
+prompts/interviewer_examples.txt (one ``- "question"`` per line) rather
+than in the system prompt itself, so the prompt can be assembled in two
+ways:
+
+  • full — every example, as the interviewer has always been prompted
+  • lean — only the few examples most relevant to the request, picked
+    locally with BM25 over the raw prompt, the question style and the
+    sections of the selected output template
+
+The examples are short and the list is small, so the index is built in
+memory on first use.
+"""
+
+import math
+import os
+import re
+from collections import Counter
+
+from utils.text_utils import tokenize
+
+_BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+EXAMPLES_FILE = os.path.join(_BASE_DIR, "prompts", "interviewer_examples.txt")
+
+# Examples carried by a lean interviewer prompt
+LEAN_EXAMPLE_COUNT = 5
+
+_EXAMPLE_LINE_RE = re.compile(r'^\s*-\s*"(.+)"\s*$')
+
+# BM25 parameters (the usual defaults)
+_K1 = 1.2
+_B = 0.75
+# Query weights: matching the user's prompt matters more than the context
+_PROMPT_WEIGHT = 2.0
+_CONTEXT_WEIGHT = 1.0
+
+# ── Index ───────────────────────────────────────────────────────────
+_lines: list[str] | None = None
+_doc_terms: list[Counter] = []
+_doc_lengths: list[int] = []
+_idf: dict[str, float] = {}
+_avg_length = 1.0
+
+
+def _load() -> list[str]:
+    """Read and index the example file (cached in module-level vars)."""
+    global _lines, _doc_terms, _doc_lengths, _idf, _avg_length
+    if _lines is None:
+        with open(EXAMPLES_FILE, "r", encoding="utf-8") as f:
+            lines = [line.rstrip() for line in f if _EXAMPLE_LINE_RE.match(line)]
+        _doc_terms = [Counter(tokenize(_EXAMPLE_LINE_RE.match(line).group(1))) for line in lines]
+        _doc_lengths = [sum(terms.values()) for terms in _doc_terms]
+        _avg_length = (sum(_doc_lengths) / len(_doc_lengths)) if _doc_lengths else 1.0
+
+        doc_freq: Counter = Counter()
+        for terms in _doc_terms:
+            doc_freq.update(terms.keys())
+        n_docs = len(_doc_terms)
+        _idf = {
+            term: math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            for term, df in doc_freq.items()
+        }
+        _lines = lines
+    return _lines
+
+
+def _bm25(query: Counter, i: int) -> float:
+    terms = _doc_terms[i]
+    norm = _K1 * (1 - _B + _B * _doc_lengths[i] / _avg_length)
+    score = 0.0
+    for term, weight in query.items():
+        tf = terms.get(term)
+        if tf:
+            score += weight * _idf[term] * tf * (_K1 + 1) / (tf + norm)
+    return score
+
+
+# ── Public API ──────────────────────────────────────────────────────
+def all_example_lines() -> list[str]:
+    """Every example, as the ``- "question"`` lines of the file."""
+    return list(_load())
+
+
+def select_example_lines(
+    raw_prompt: str,
+    context: list[str] | None = None,
+    count: int = LEAN_EXAMPLE_COUNT,
+) -> list[str]:
+    """
+    Return the ``count`` example lines most relevant to a request.
+
+    ``context`` holds the other texts that describe the request (the
+    question style instruction, the template sections). Examples that
+    match nothing are filled in from the top of the file, where the
+    general-purpose questions are. The result keeps file order so the
+    same selection always yields the same prompt text.
+    """
+    lines = _load()
+    query: Counter = Counter()
+    for term in tokenize(raw_prompt):
+        query[term] += _PROMPT_WEIGHT
+    for text in context or []:
+        for term in tokenize(text):
+            query[term] += _CONTEXT_WEIGHT
+
+    scores = {i: _bm25(query, i) for i in range(len(lines))}
+    ranked = sorted(range(len(lines)), key=lambda i: (-scores[i], i))
+    chosen = [i for i in ranked[:count] if scores[i] > 0]
+    for i in range(len(lines)):
+        if len(chosen) >= count:
+            break
+        if i not in chosen:
+            chosen.append(i)
+    return [lines[i] for i in sorted(chosen)]
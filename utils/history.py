@@ -0,0 +1,163 @@
+"""
+Prompt History
+===============
+Per-user, persistent history of completed refinements, so past results
+can be searched and restored instead of being regenerated.
+
+Storage is a single SQLite file:
+  • ``entries``      — one row per refinement; the full session payload
+                       (raw prompt, questions, answers, refined prompt) is
+                       zlib-compressed JSON, only a short title is plain.
+  • ``entries_fts``  — contentless FTS5 index over the prompt, answers and
+                       result. The owner's id is indexed as a token too, so
+                       a search only ever touches that user's postings.
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any
+
+HISTORY_DB = "data/history.db"
+HISTORY_PAGE_SIZE = 10
+_TITLE_LENGTH = 80
+
+_local = threading.local()
+
+
+# ── Connection ──────────────────────────────────────────────────────
+def _get_connection() -> sqlite3.Connection:
+    """Return this thread's connection, creating the schema on first use."""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        os.makedirs(os.path.dirname(HISTORY_DB) or ".", exist_ok=True)
+        conn = sqlite3.connect(HISTORY_DB, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS entries (
+                id          INTEGER PRIMARY KEY,
+                user_id     TEXT NOT NULL,
+                created_at  REAL NOT NULL,
+                title       TEXT NOT NULL,
+                template    TEXT,
+                model       TEXT,
+                payload     BLOB NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_entries_user
+                ON entries (user_id, id DESC);
+            CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts
+                USING fts5(owner, body, content='', tokenize='porter unicode61');
+            """
+        )
+        _local.conn = conn
+    return conn
+
+
+def _owner_token(user_id: str) -> str:
+    """Map a user id (email or session id) to a single FTS-safe token."""
+    return "u" + hashlib.sha1(user_id.encode("utf-8")).hexdigest()[:16]
+
+
+def _fts_query(user_id: str, query: str) -> str:
+    """Build an FTS5 MATCH expression: owner AND every query word as a prefix."""
+    words = re.findall(r"\w+", query.lower())
+    terms = " ".join(f'"{w}"*' for w in words)
+    owner = f'owner:"{_owner_token(user_id)}"'
+    return f"{owner} AND body:({terms})" if terms else owner
+
+
+# ── Public API ──────────────────────────────────────────────────────
+def save_history_entry(
+    user_id: str,
+    raw_prompt: str,
+    questions: list[str],
+    answers: dict[str, str],
+    refined_prompt: str,
+    template: str | None = None,
+    model: str | None = None,
+) -> int:
+    """Store a completed refinement and return its entry id."""
+    payload = {
+        "raw_prompt": raw_prompt,
+        "questions": questions,
+        "answers": answers,
+        "refined_prompt": refined_prompt,
+    }
+    blob = zlib.compress(json.dumps(payload, ensure_ascii=False).encode("utf-8"), 6)
+    title = " ".join(raw_prompt.split())[:_TITLE_LENGTH]
+    body = "\n".join([raw_prompt, *answers.values(), refined_prompt])
+
+    conn = _get_connection()
+    with conn:
+        cur = conn.execute(
+            "INSERT INTO entries (user_id, created_at, title, template, model, payload) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (user_id, time.time(), title, template, model, blob),
+        )
+        entry_id = cur.lastrowid
+        conn.execute(
+            "INSERT INTO entries_fts (rowid, owner, body) VALUES (?, ?, ?)",
+            (entry_id, _owner_token(user_id), body),
+        )
+    return entry_id
+
+
+def search_history(
+    user_id: str,
+    query: str = "",
+    page: int = 0,
+    page_size: int = HISTORY_PAGE_SIZE,
+) -> tuple[list[dict[str, Any]], bool]:
+    """
+    Return one page of a user's history, newest first.
+
+    Only the lightweight columns are read; payloads stay compressed until
+    an entry is restored.
+
+    Returns:
+        (entries, has_more)
+    """
+    conn = _get_connection()
+    offset = max(page, 0) * page_size
+    if query.strip():
+        # FTS5 walks its own rowid order; the owner token keeps this per-user
+        rows = conn.execute(
+            "SELECT e.id, e.created_at, e.title, e.template, e.model FROM entries e "
+            "JOIN (SELECT rowid FROM entries_fts WHERE entries_fts MATCH ? "
+            "      ORDER BY rowid DESC LIMIT ? OFFSET ?) AS hits ON e.id = hits.rowid "
+            "WHERE e.user_id = ? ORDER BY e.id DESC",
+            (_fts_query(user_id, query), page_size + 1, offset, user_id),
+        ).fetchall()
+    else:
+        rows = conn.execute(
+            "SELECT id, created_at, title, template, model FROM entries "
+            "WHERE user_id = ? ORDER BY id DESC LIMIT ? OFFSET ?",
+            (user_id, page_size + 1, offset),
+        ).fetchall()
+
+    entries = [
+        {"id": r[0], "created_at": r[1], "title": r[2], "template": r[3], "model": r[4]}
+        for r in rows[:page_size]
+    ]
+    return entries, len(rows) > page_size
+
+
+def load_history_entry(user_id: str, entry_id: int) -> dict[str, Any] | None:
+    """Decompress and return a stored entry, or None if it isn't the user's."""
+    row = _get_connection().execute(
+        "SELECT payload, template, model FROM entries WHERE id = ? AND user_id = ?",
+        (entry_id, user_id),
+    ).fetchone()
+    if row is None:
+        return None
+    entry = json.loads(zlib.decompress(row[0]).decode("utf-8"))
+    entry["template"] = row[1]
+    entry["model"] = row[2]
+    return entry
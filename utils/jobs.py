@@ -0,0 +1,284 @@
+"""
+Engine Jobs
+============
+Runs upstream engine calls (analyze, refine) on a worker pool instead of
+the Streamlit script thread, so the script can keep rerunning while a
+call is in flight and the call can be cancelled.
+
+Each owner has at most one job. The owner is the user (their account,
+or for anonymous users their browser) plus a per-tab client token
+carried in the page URL, not the Streamlit session; see
+utils.rate_limiter.get_job_owner. A reload or a reconnect that starts a
+new session finds the same job again: it reattaches to a call still in
+flight, or picks up a result that finished while nobody was listening,
+instead of paying for the call a second time. A copied link opened by
+someone else, or a duplicated tab, belongs to a different owner and
+sees nothing. Finished jobs are kept for RESULT_TTL seconds for that
+purpose, together with the session values needed to rebuild the step
+around them.
+
+A job is cancelled, at the transport level through its CancelToken, when:
+  • a newer job for the same owner supersedes it,
+  • the owner navigates to a different step (Back, Start Over, history),
+  • its inputs change while it runs (the app compares fingerprints),
+  • the owner stops polling for JOB_IDLE_TIMEOUT seconds — the tab was
+    closed or the session ended.
+"""
+
+import itertools
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable
+
+from utils.cancellation import CancelToken
+from utils.profiler import capture_spans
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "16"))
+JOB_IDLE_TIMEOUT = float(os.getenv("JOB_IDLE_TIMEOUT", "15"))
+# How long a finished job stays available for a reconnecting client; 0 disables reattaching
+RESULT_TTL = float(os.getenv("RESULT_TTL", "300"))
+# How long one script run waits on a job before rerunning to poll again
+JOB_POLL_SECONDS = 0.5
+
+_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="engine-job")
+_ids = itertools.count(1)
+_lock = threading.Lock()
+_jobs: dict[str, "Job"] = {}
+_last_seen: dict[str, float] = {}
+_reaper_started = False
+# (owner, kind, fingerprint) -> submit time, to spot calls re-issued within
+# this window; independent of RESULT_TTL so reattaching can be measured off
+_DUPLICATE_WINDOW = 300.0
+_recent_calls: dict[tuple[str, str, str], float] = {}
+_stats = {"submitted": 0, "duplicates": 0, "deduplicated": 0, "reattached": 0, "recovered": 0}
+
+
+class Job:
+    """One engine call running for an owner at a given step."""
+
+    def __init__(
+        self,
+        owner: str,
+        step: str,
+        kind: str,
+        fingerprint: str,
+        token: CancelToken,
+        context: dict[str, Any],
+    ):
+        self.id = next(_ids)
+        self.owner = owner
+        self.step = step
+        self.kind = kind
+        self.fingerprint = fingerprint
+        self.token = token
+        # Session values the step needs if a new session reattaches
+        self.context = context
+        self.started_at = time.time()
+        self.finished_at: float | None = None
+        self.taken = False
+        self.future: Future | None = None
+        # Queue wait, run time and the engine spans inside it, for the
+        # profile of the rerun that collects the result
+        self.submitted_perf = time.perf_counter()
+        self.trace: list[dict[str, Any]] = []
+
+    def done(self) -> bool:
+        return self.future is not None and self.future.done()
+
+    def succeeded(self) -> bool:
+        return self.done() and not self.future.cancelled() and self.future.exception() is None
+
+
+# ── Registry ────────────────────────────────────────────────────────
+def submit_job(
+    owner: str,
+    step: str,
+    kind: str,
+    fingerprint: str,
+    context: dict[str, Any],
+    fn: Callable[..., Any],
+    *args: Any,
+    **kwargs: Any,
+) -> Job:
+    """
+    Start ``fn(*args, cancel_token=token, **kwargs)`` on the pool.
+
+    If the owner's current job is the same call (kind and fingerprint)
+    and is still running or holds an undelivered result, that job is
+    returned instead — a double click or a resubmit after a reconnect
+    does not reach the upstream again. Any other job the owner has is
+    cancelled as superseded.
+    """
+    now = time.time()
+    with _lock:
+        previous = _jobs.get(owner)
+        if (
+            previous is not None
+            and previous.kind == kind
+            and previous.fingerprint == fingerprint
+            and not previous.taken
+            and not previous.token.cancelled
+            and (not previous.done() or previous.succeeded())
+        ):
+            _stats["deduplicated"] += 1
+            _last_seen[owner] = now
+            return previous
+
+        call = (owner, kind, fingerprint)
+        if now - _recent_calls.get(call, 0.0) < _DUPLICATE_WINDOW:
+            _stats["duplicates"] += 1
+        _recent_calls[call] = now
+        _stats["submitted"] += 1
+
+        token = CancelToken(owner, step)
+        job = Job(owner, step, kind, fingerprint, token, context)
+        _jobs[owner] = job
+        _last_seen[owner] = now
+    if previous is not None and not previous.done():
+        previous.token.cancel("superseded")
+    job.future = _executor.submit(_run_job, job, fn, args, kwargs)
+    job.future.add_done_callback(lambda _: setattr(job, "finished_at", time.time()))
+    _ensure_reaper()
+    return job
+
+
+def _run_job(job: Job, fn: Callable[..., Any], args: tuple, kwargs: dict) -> Any:
+    """Run a job's call on a worker thread, tracing where its time went."""
+    run_started = time.perf_counter()
+    spans: list[dict[str, Any]] = []
+    try:
+        with capture_spans() as spans:
+            return fn(*args, cancel_token=job.token, **kwargs)
+    finally:
+        job.trace = [
+            {"name": f"job.{job.kind}.queued", "start": job.submitted_perf, "end": run_started, "depth": 1},
+            {"name": f"job.{job.kind}", "start": run_started, "end": time.perf_counter(), "depth": 1},
+            *({**span, "depth": span["depth"] + 1} for span in spans),
+        ]
+
+
+def get_job(owner: str) -> Job | None:
+    """Return the owner's current job if its result has not been taken yet."""
+    with _lock:
+        job = _jobs.get(owner)
+        return job if job is not None and not job.taken else None
+
+
+def take_job(job: Job, next_step: str) -> bool:
+    """
+    Mark ``job``'s result as delivered, moving the session to ``next_step``.
+
+    The job stays registered, now as part of ``next_step``, until
+    RESULT_TTL runs out or the client leaves that step, so that a client
+    which reconnects can still recover it. Returns True the first time,
+    so side effects such as saving history happen once.
+    """
+    with _lock:
+        first = not job.taken
+        job.taken = True
+        job.step = next_step
+        if RESULT_TTL <= 0 and _jobs.get(job.owner) is job:
+            del _jobs[job.owner]
+        return first
+
+
+def reattach_job(owner: str) -> Job | None:
+    """
+    Return the job a newly connected session should resume, if any.
+
+    That is a running job, or a successful one that finished less than
+    RESULT_TTL seconds ago — delivered to the lost session or not.
+    """
+    if RESULT_TTL <= 0:
+        return None
+    with _lock:
+        job = _jobs.get(owner)
+        if job is None or job.token.cancelled:
+            return None
+        if job.done():
+            if not job.succeeded() or time.time() - (job.finished_at or job.started_at) > RESULT_TTL:
+                return None
+            _stats["recovered"] += 1
+        else:
+            _stats["reattached"] += 1
+        _last_seen[owner] = time.time()
+        return job
+
+
+def cancel_jobs(owner: str, reason: str, keep_step: str | None = None) -> bool:
+    """
+    Cancel the owner's job unless it belongs to ``keep_step``; a finished
+    one is only forgotten, so it can no longer be recovered.
+
+    Returns True if a running job was cancelled.
+    """
+    with _lock:
+        job = _jobs.get(owner)
+        if job is None or job.step == keep_step:
+            return False
+        del _jobs[owner]
+    if job.done():
+        return False
+    job.token.cancel(reason)
+    return True
+
+
+def get_job_stats() -> dict:
+    """
+    Return submit counters.
+
+    ``duplicates`` counts upstream calls identical to one the same client
+    made in the last few minutes — the re-issued calls reattaching avoids;
+    ``deduplicated``, ``reattached`` and ``recovered`` count the calls it
+    saved.
+    """
+    with _lock:
+        return {**_stats, "live_jobs": len(_jobs)}
+
+
+# ── Liveness ────────────────────────────────────────────────────────
+def heartbeat(owner: str) -> None:
+    """Record that the owner's session is still rerunning."""
+    with _lock:
+        _last_seen[owner] = time.time()
+
+
+def _reap_idle() -> None:
+    """Cancel jobs whose owner stopped polling and drop expired results."""
+    now = time.time()
+    cutoff = now - JOB_IDLE_TIMEOUT
+    with _lock:
+        orphans = [
+            owner for owner, job in _jobs.items()
+            if not job.done() and _last_seen.get(owner, 0) < cutoff
+        ]
+        expired = [
+            owner for owner, job in _jobs.items()
+            if job.done() and now - (job.finished_at or job.started_at) > max(RESULT_TTL, 0)
+        ]
+        orphan_jobs = [_jobs.pop(owner) for owner in orphans]
+        for owner in expired:
+            del _jobs[owner]
+        for owner in [o for o, seen in _last_seen.items() if seen < cutoff and o not in _jobs]:
+            del _last_seen[owner]
+        for call in [c for c, at in _recent_calls.items() if now - at > _DUPLICATE_WINDOW]:
+            del _recent_calls[call]
+    for job in orphan_jobs:
+        job.token.cancel("session ended")
+
+
+def _ensure_reaper() -> None:
+    global _reaper_started
+    with _lock:
+        if _reaper_started:
+            return
+        _reaper_started = True
+
+    def loop() -> None:
+        while True:
+            time.sleep(max(1.0, JOB_IDLE_TIMEOUT / 3))
+            _reap_idle()
+
+    threading.Thread(target=loop, name="engine-job-reaper", daemon=True).start()
@@ -0,0 +1,67 @@
+"""
+JSON Repair
+============
+Fast, local salvage of the interviewer's ``{"questions": [...]}`` reply
+when it is not valid JSON — trailing prose, single quotes, code fences or
+an array cut off by ``max_tokens``.
+
+Only complete string literals are kept: a question truncated mid-string
+is dropped rather than guessed at.
+"""
+
+import re
+
+# A double- or single-quoted string literal, allowing escaped characters
+_STRING_RE = re.compile(r'"((?:[^"\\\n]|\\.)*)"|\'((?:[^\'\\\n]|\\.)*)\'')
+_QUESTIONS_KEY_RE = re.compile(r"""["']?questions["']?\s*:\s*\[""", re.IGNORECASE)
+# "1. Question?" / "- Question?" lines in a prose answer
+_LIST_QUESTION_RE = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s*(.+\?)\s*$", re.MULTILINE)
+
+_ESCAPES = {"n": "\n", "t": "\t", '"': '"', "'": "'", "\\": "\\", "/": "/"}
+
+
+def _unescape(literal: str) -> str:
+    return re.sub(r"\\(.)", lambda m: _ESCAPES.get(m.group(1), m.group(1)), literal)
+
+
+def _strings_until_close(text: str, start: int) -> list[str]:
+    """Collect complete string literals from ``start`` until the array closes."""
+    items = []
+    pos = start
+    while pos < len(text):
+        # Skip separators; stop at the closing bracket or anything unexpected
+        while pos < len(text) and text[pos] in " \t\r\n,":
+            pos += 1
+        if pos >= len(text) or text[pos] == "]":
+            break
+        match = _STRING_RE.match(text, pos)
+        if not match:
+            break
+        literal = match.group(1) if match.group(1) is not None else match.group(2)
+        items.append(_unescape(literal).strip())
+        pos = match.end()
+    return [item for item in items if item]
+
+
+def salvage_questions(text: str) -> list[str]:
+    """
+    Extract as many complete questions as possible from a malformed reply.
+
+    Tries, in order: the array after a ``questions`` key, a bare top-level
+    array, then numbered/bulleted lines ending in '?'.
+    """
+    text = text or ""
+
+    key = _QUESTIONS_KEY_RE.search(text)
+    if key:
+        questions = _strings_until_close(text, key.end())
+        if questions:
+            return questions
+
+    bracket = text.find("[")
+    if bracket != -1:
+        questions = _strings_until_close(text, bracket + 1)
+        if questions:
+            return questions
+
+    return [m.group(1).strip().strip('"') for m in _LIST_QUESTION_RE.finditer(text)]
@@ -0,0 +1,203 @@
+"""
+API Key Pool
+=============
+Spreads upstream calls over several Cerebras API keys, so the
+deployment's throughput is the sum of the keys' rate limits rather than
+one key's.
+
+Keys come from, in order:
+  • CEREBRAS_API_KEYS — comma-separated, in the environment or .env
+  • CEREBRAS_API_KEY — one key (commas also accepted)
+  • the same names in .streamlit/secrets.toml (a string or a list)
+
+Each key has its own client. A call borrows a key for its whole duration
+(``acquire_key`` / ``release_key``); the pick is the key with the fewest
+calls in flight (KEY_POOL_STRATEGY=least_loaded, the default) or the next
+one in turn (round_robin). A key that answers 429 or 5xx cools down for
+its Retry-After, or KEY_COOLDOWN_SECONDS, and is skipped meanwhile unless
+every key is cooling down.
+"""
+
+import itertools
+import os
+import threading
+import time
+from typing import TYPE_CHECKING, Any
+
+from utils.cancellation import CallCancelled
+
+if TYPE_CHECKING:
+    from cerebras.cloud.sdk import Cerebras
+
+KEY_POOL_STRATEGY = os.getenv("KEY_POOL_STRATEGY", "least_loaded")
+KEY_COOLDOWN_SECONDS = float(os.getenv("KEY_COOLDOWN_SECONDS", "30"))
+# Longest Retry-After honoured, so one odd header cannot park a key for long
+_MAX_COOLDOWN_SECONDS = 300.0
+
+
+class ApiKey:
+    """One pooled key, its client and its usage counters."""
+
+    def __init__(self, index: int, key: str):
+        self.index = index
+        self.key = key
+        # Shown in the engine stats; no part of the key itself
+        self.label = f"#{index + 1}"
+        self.in_flight = 0
+        self.cooldown_until = 0.0
+        self.stats = {"requests": 0, "ok": 0, "rate_limited": 0, "server_errors": 0,
+                      "other_errors": 0, "cancelled": 0}
+        self._client: "Cerebras | None" = None
+
+    @property
+    def client(self) -> "Cerebras":
+        if self._client is None:
+            from cerebras.cloud.sdk import Cerebras
+
+            self._client = Cerebras(api_key=self.key)
+        return self._client
+
+    def cooling_down(self, now: float) -> bool:
+        return self.cooldown_until > now
+
+
+_lock = threading.Lock()
+_keys: list[ApiKey] | None = None
+_turn = itertools.count()
+
+
+# ── Configuration ───────────────────────────────────────────────────
+def _split(value: Any) -> list[str]:
+    if isinstance(value, (list, tuple)):
+        return [str(v).strip() for v in value if str(v).strip()]
+    return [v.strip() for v in str(value or "").split(",") if v.strip()]
+
+
+def _configured_keys() -> list[str]:
+    for name in ("CEREBRAS_API_KEYS", "CEREBRAS_API_KEY"):
+        keys = _split(os.getenv(name))
+        if keys:
+            return keys
+    try:
+        import streamlit as st
+
+        for name in ("CEREBRAS_API_KEYS", "CEREBRAS_API_KEY"):
+            keys = _split(st.secrets.get(name))
+            if keys:
+                return keys
+    except Exception:
+        pass  # no secrets.toml
+    return []
+
+
+def _load_keys() -> list[ApiKey]:
+    """Build the pool on first use (duplicate keys are dropped)."""
+    global _keys
+    with _lock:
+        if _keys is None:
+            keys = list(dict.fromkeys(_configured_keys()))
+            if not keys:
+                raise ValueError(
+                    "CEREBRAS_API_KEY not found. "
+                )
+            _keys = [ApiKey(i, key) for i, key in enumerate(keys)]
+        return _keys
+
+
+def pool_size() -> int:
+    return len(_load_keys())
+
+
+# ── Selection ───────────────────────────────────────────────────────
+def _pick(candidates: list[ApiKey]) -> ApiKey:
+    turn = next(_turn)
+    if KEY_POOL_STRATEGY == "round_robin":
+        return candidates[turn % len(candidates)]
+    # Least loaded; equal loads take turns
+    return min(candidates, key=lambda k: (k.in_flight, (k.index - turn) % len(candidates)))
+
+
+def acquire_key(exclude: set[int] | None = None) -> ApiKey | None:
+    """
+    Borrow a key for one call; pair with ``release_key``.
+
+    Keys whose index is in ``exclude`` (already tried by this call) are
+    skipped. Returns None when every key is excluded. If all the others
+    are cooling down, the one that recovers first is returned.
+    """
+    keys = _load_keys()
+    now = time.monotonic()
+    with _lock:
+        candidates = [k for k in keys if not exclude or k.index not in exclude]
+        if not candidates:
+            return None
+        ready = [k for k in candidates if not k.cooling_down(now)]
+        key = _pick(ready) if ready else min(candidates, key=lambda k: k.cooldown_until)
+        key.in_flight += 1
+        key.stats["requests"] += 1
+        return key
+
+
+def peek_key() -> ApiKey:
+    """The key ``acquire_key`` would pick, without borrowing it."""
+    keys = _load_keys()
+    now = time.monotonic()
+    with _lock:
+        ready = [k for k in keys if not k.cooling_down(now)]
+        return _pick(ready) if ready else min(keys, key=lambda k: k.cooldown_until)
+
+
+def _retry_after(error: Exception) -> float | None:
+    response = getattr(error, "response", None)
+    try:
+        return float(response.headers.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def is_key_limited(error: Exception | None) -> bool:
+    """429 and 5xx: the key (or its share of the upstream) is saturated."""
+    status = getattr(error, "status_code", None)
+    return isinstance(status, int) and (status == 429 or status >= 500)
+
+
+def release_key(key: ApiKey, error: Exception | None = None) -> None:
+    """
+    Return a borrowed key, recording how its call went.
+
+    A 429 or 5xx starts the key's cooldown. Other errors (timeouts, bad
+    requests) say nothing about the key and only count under
+    ``other_errors``.
+    """
+    with _lock:
+        key.in_flight -= 1
+        if error is None:
+            key.stats["ok"] += 1
+        elif isinstance(error, CallCancelled):
+            key.stats["cancelled"] += 1
+        elif is_key_limited(error):
+            key.stats["rate_limited" if error.status_code == 429 else "server_errors"] += 1
+            retry_after = _retry_after(error)
+            cooldown = KEY_COOLDOWN_SECONDS if retry_after is None else min(retry_after, _MAX_COOLDOWN_SECONDS)
+            key.cooldown_until = max(key.cooldown_until, time.monotonic() + cooldown)
+        else:
+            key.stats["other_errors"] += 1
+
+
+def get_key_pool_stats() -> list[dict]:
+    """Per-key counters, load and remaining cooldown (keys shown by position only)."""
+    try:
+        keys = _load_keys()
+    except ValueError:
+        return []  # no key configured
+    now = time.monotonic()
+    with _lock:
+        return [
+            {
+                "key": k.label,
+                **k.stats,
+                "in_flight": k.in_flight,
+                "cooldown_s": round(max(0.0, k.cooldown_until - now), 1),
+            }
+            for k in keys
+        ]
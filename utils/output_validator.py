@@ -0,0 +1,142 @@
+"""
+Output Validator
+=================
+Checks a refined prompt against the sections its OUTPUT_TEMPLATES entry
+requires, splices repaired sections back in, and scores candidates
+against the refiner's output rules.
+
+Section names come from the text before the colon in each template
+``sections`` entry ("Role: Assign the expert identity." → "Role").
+Entries whose name contains a comma are sub-instructions of the previous
+section (e.g. "For each step, show: ..." in Chain of Thought) and are not
+required headings.
+"""
+
+import re
+
+from utils.text_utils import estimate_tokens
+
+# A section with fewer words than this counts as empty
+_MIN_SECTION_WORDS = 2
+# A candidate averaging fewer words per section reads as a stub
+_MIN_WORDS_PER_SECTION = 8
+# Share of max_tokens above which a candidate was probably cut off
+_TRUNCATION_SHARE = 0.95
+
+# Emphasis that prompts/refiner.txt forbids: **bold**, __bold__, *italics*, _italics_
+_EMPHASIS_RE = re.compile(r"\*\*[^*\n]+\*\*|__[^_\n]+__|(?<![*\w])\*[^*\s][^*\n]*\*(?![*\w])|(?<!\w)_[^_\s][^_\n]*_(?!\w)")
+
+# Weights of the score components; they sum to 1
+_SCORE_WEIGHTS = {"coverage": 0.5, "length": 0.2, "formatting": 0.2, "no_preamble": 0.1}
+
+
+def section_names(template_data: dict) -> list[str]:
+    """Return the required section headings of a template, in order."""
+    names = []
+    for entry in template_data.get("sections", []):
+        name = entry.split(":", 1)[0].strip()
+        if name and "," not in name and len(name.split()) <= 4:
+            names.append(name)
+    return names
+
+
+def _heading_re(name: str) -> re.Pattern:
+    """Match a heading line such as 'Role:', '## Role', '**Role (expert):**'."""
+    return re.compile(
+        # A closing '**' after the colon belongs to the heading, not the body
+        r"^[ \t>#*_\-\d.)]*" + re.escape(name)
+        + r"[ \t*_]*(?:\([^)\n]*\))?[ \t*_]*(?::(?:[*_]{1,2}(?=\s|$))?|$)",
+        re.IGNORECASE | re.MULTILINE,
+    )
+
+
+def parse_sections(text: str, names: list[str]) -> dict[str, tuple[int, int, str]]:
+    """
+    Locate each named section in ``text``.
+
+    Returns:
+        {name: (start, end, content)} for every heading found, where
+        start/end delimit the whole section (heading included) and content
+        is the stripped body text.
+    """
+    headings = []
+    for name in names:
+        match = _heading_re(name).search(text)
+        if match:
+            headings.append((match.start(), match.end(), name))
+    headings.sort()
+
+    sections = {}
+    for i, (start, body_start, name) in enumerate(headings):
+        end = headings[i + 1][0] if i + 1 < len(headings) else len(text)
+        sections[name] = (start, end, text[body_start:end].strip())
+    return sections
+
+
+def find_incomplete_sections(text: str, names: list[str]) -> list[str]:
+    """Return the required sections that are missing or empty, in template order."""
+    sections = parse_sections(text, names)
+    return [
+        name for name in names
+        if name not in sections or len(sections[name][2].split()) < _MIN_SECTION_WORDS
+    ]
+
+
+def splice_sections(text: str, names: list[str], repaired: dict[str, str]) -> str:
+    """
+    Insert or replace sections with ``repaired`` content.
+
+    The result keeps any preamble, then lists sections in template order;
+    untouched sections are copied verbatim.
+    """
+    sections = parse_sections(text, names)
+    first_start = min((s[0] for s in sections.values()), default=len(text))
+    blocks = [text[:first_start].rstrip()] if text[:first_start].strip() else []
+
+    for name in names:
+        if name in repaired:
+            blocks.append(f"{name}: {repaired[name].strip()}")
+        elif name in sections:
+            start, end, _ = sections[name]
+            blocks.append(text[start:end].strip())
+
+    return "\n\n".join(blocks)
+
+
+def score_refinement(text: str, names: list[str], max_tokens: int) -> dict[str, float]:
+    """
+    Score a refined prompt from 0 to 1 without a model call.
+
+    Components, each 0–1:
+        coverage     share of required sections present and non-empty
+        length       within budget: not cut off at ``max_tokens``, and not
+                     a stub of a few words per section
+        formatting   no bold/italic emphasis (forbidden by refiner.txt)
+        no_preamble  no opening chatter before the first section
+
+    Returns the components plus their weighted sum as ``score``.
+    """
+    sections = parse_sections(text, names)
+    incomplete = find_incomplete_sections(text, names)
+    coverage = 1 - len(incomplete) / len(names) if names else 1.0
+
+    words = len(text.split())
+    if estimate_tokens(text) >= max_tokens * _TRUNCATION_SHARE:
+        length = 0.0
+    else:
+        length = min(1.0, words / (_MIN_WORDS_PER_SECTION * max(len(names), 1)))
+
+    emphasis = len(_EMPHASIS_RE.findall(text))
+    formatting = 1 / (1 + emphasis)
+
+    first_start = min((start for start, _, _ in sections.values()), default=0)
+    no_preamble = 0.0 if text[:first_start].strip() else 1.0
+
+    components = {
+        "coverage": coverage,
+        "length": length,
+        "formatting": formatting,
+        "no_preamble": no_preamble,
+    }
+    components["score"] = round(sum(_SCORE_WEIGHTS[k] * v for k, v in components.items()), 3)
+    return components
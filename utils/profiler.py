@@ -0,0 +1,190 @@
+"""
+Rerun Profiler
+===============
+Lightweight timing of named sections of one Streamlit rerun, enabled by
+the PROFILE_RERUNS environment variable or the ``?debug=profile`` query
+parameter.
+
+  • ``mark(name)`` closes the current top-level section and opens the
+    next one, so app.py is instrumented without re-indenting its blocks.
+  • ``@timed(name)`` wraps functions such as the engine calls; they show
+    up nested under whichever section made the call.
+  • ``finish_rerun()`` returns the waterfall for the debug panel and adds
+    it to the process-wide aggregates; with PROFILE_LOG set, each rerun is
+    also appended to that file as one JSON line.
+
+Timelines are per thread (one script run per session thread). Work done
+on another thread, such as an engine job, is recorded with
+``capture_spans`` there and added to the rerun that collects its result
+with ``add_spans``; it started before that rerun, so its offsets are
+negative. When profiling is off, ``mark`` and ``timed`` cost a single
+attribute lookup.
+"""
+
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator
+
+PROFILE_RERUNS = os.getenv("PROFILE_RERUNS", "").lower() in ("1", "true", "yes")
+PROFILE_LOG = os.getenv("PROFILE_LOG", "")
+
+_local = threading.local()
+_totals_lock = threading.Lock()
+_totals: dict[str, dict[str, float]] = {}
+_reruns = 0
+
+
+class _Timeline:
+    def __init__(self, label: str):
+        self.label = label
+        self.origin = time.perf_counter()
+        self.spans: list[dict[str, Any]] = []
+        self.open_section: dict[str, Any] | None = None
+        self.depth = 0
+
+    def now_ms(self) -> float:
+        return (time.perf_counter() - self.origin) * 1000
+
+    def close_section(self) -> None:
+        if self.open_section is not None:
+            self.open_section["end_ms"] = self.now_ms()
+            self.open_section = None
+
+
+# ── Recording ───────────────────────────────────────────────────────
+def start_rerun(enabled: bool, label: str = "") -> None:
+    """
+    Begin timing a rerun. A timeline left open by st.rerun()/st.stop()
+    in the previous run of this thread is finished first.
+    """
+    if getattr(_local, "timeline", None) is not None:
+        finish_rerun()
+    _local.timeline = _Timeline(label) if (enabled or PROFILE_RERUNS) else None
+
+
+def mark(name: str) -> None:
+    """End the current top-level section and start one called ``name``."""
+    timeline = getattr(_local, "timeline", None)
+    if timeline is None:
+        return
+    timeline.close_section()
+    timeline.open_section = {"name": name, "start_ms": timeline.now_ms(), "end_ms": None, "depth": 0}
+    timeline.spans.append(timeline.open_section)
+
+
+def timed(name: str) -> Callable:
+    """Decorator: record each call as a span nested in the current section."""
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            timeline = getattr(_local, "timeline", None)
+            if timeline is None:
+                return func(*args, **kwargs)
+            timeline.depth += 1
+            span = {"name": name, "start_ms": timeline.now_ms(), "end_ms": None, "depth": timeline.depth}
+            timeline.spans.append(span)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                span["end_ms"] = timeline.now_ms()
+                timeline.depth -= 1
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def capture_spans() -> Iterator[list[dict[str, Any]]]:
+    """
+    Record ``@timed`` calls made on this thread inside the block, e.g. an
+    engine job on a worker thread. The yielded list is filled on exit with
+    spans holding perf_counter ``start``/``end`` seconds and depth.
+    """
+    previous = getattr(_local, "timeline", None)
+    timeline = _Timeline("capture")
+    _local.timeline = timeline
+    captured: list[dict[str, Any]] = []
+    try:
+        yield captured
+    finally:
+        _local.timeline = previous
+        captured.extend(
+            {
+                "name": s["name"],
+                "start": timeline.origin + s["start_ms"] / 1000,
+                "end": timeline.origin + (s["end_ms"] if s["end_ms"] is not None else timeline.now_ms()) / 1000,
+                "depth": s["depth"],
+            }
+            for s in timeline.spans
+        )
+
+
+def add_spans(spans: list[dict[str, Any]]) -> None:
+    """Add spans timed elsewhere (perf_counter seconds) to this thread's rerun."""
+    timeline = getattr(_local, "timeline", None)
+    if timeline is None:
+        return
+    for span in spans:
+        timeline.spans.append({
+            "name": span["name"],
+            "start_ms": (span["start"] - timeline.origin) * 1000,
+            "end_ms": (span["end"] - timeline.origin) * 1000,
+            "depth": span["depth"],
+        })
+
+
+def finish_rerun() -> list[dict[str, Any]]:
+    """
+    Stop timing and return this rerun's spans, in start order, each with
+    name, start_ms, duration_ms and depth. Empty when profiling is off.
+    """
+    global _reruns
+    timeline = getattr(_local, "timeline", None)
+    _local.timeline = None
+    if timeline is None:
+        return []
+    timeline.close_section()
+
+    spans = [
+        {
+            "name": s["name"],
+            "start_ms": round(s["start_ms"], 3),
+            # A span still open here was cut short by st.rerun()/st.stop()
+            "duration_ms": round((s["end_ms"] if s["end_ms"] is not None else timeline.now_ms()) - s["start_ms"], 3),
+            "depth": s["depth"],
+        }
+        for s in sorted(timeline.spans, key=lambda s: s["start_ms"])
+    ]
+
+    with _totals_lock:
+        _reruns += 1
+        for span in spans:
+            entry = _totals.setdefault(span["name"], {"calls": 0, "total_ms": 0.0, "max_ms": 0.0})
+            entry["calls"] += 1
+            entry["total_ms"] += span["duration_ms"]
+            entry["max_ms"] = max(entry["max_ms"], span["duration_ms"])
+
+    if PROFILE_LOG:
+        record = {"at": time.time(), "label": timeline.label, "spans": spans}
+        with open(PROFILE_LOG, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+    return spans
+
+
+# ── Aggregates ──────────────────────────────────────────────────────
+def get_profile_summary() -> dict[str, Any]:
+    """Return per-section call counts and total/mean/max ms over all reruns."""
+    with _totals_lock:
+        sections = {
+            name: {**entry, "mean_ms": entry["total_ms"] / entry["calls"]}
+            for name, entry in _totals.items()
+        }
+        reruns = _reruns
+    return {
+        "reruns": reruns,
+        "sections": dict(sorted(sections.items(), key=lambda kv: kv[1]["total_ms"], reverse=True)),
+    }
+
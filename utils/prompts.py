@@ -1,22 +1,22 @@
-import json
-import os
-
-TEMPLATE_FILE = "data/templates.json"
+from utils.template_store import TEMPLATE_PAGE_SIZE, add_template as _store_add_template, search_templates
 
 
 def get_templates():
-    """Load prompt templates from the JSON file."""
-    if not os.path.exists(TEMPLATE_FILE):
-        return {}
-    with open(TEMPLATE_FILE, "r", encoding="utf-8") as f:
-        return json.load(f)
+    """Load every prompt template as {name: {"icon", "en", "id"}}.
 
+    Reads the whole library; the sidebar pages through
+    utils.template_store.search_templates instead.
+    """
+    templates, page = {}, 0
+    while True:
+        batch, has_more = search_templates(page=page, page_size=TEMPLATE_PAGE_SIZE * 10)
+        for entry in batch:
+            templates[entry["name"]] = {"icon": entry["icon"], "en": entry["en"], "id": entry["id"]}
+        if not has_more:
+            return templates
+        page += 1
 
-def add_template(name: str, template: str):
-    """Add a new template to the JSON file."""
-    templates = get_templates()
-    templates[name] = template
 
-    os.makedirs("data", exist_ok=True)
-    with open(TEMPLATE_FILE, "w", encoding="utf-8") as f:
-        json.dump(templates, f, indent=2)
+def add_template(name: str, template: str):
+    """Add a new template to the template store (atomic, safe to call concurrently)."""
+    _store_add_template(name, template)
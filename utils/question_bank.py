@@ -0,0 +1,116 @@
+"""
+Offline Question Bank
+======================
+Degraded-mode question generator used when the upstream interviewer is
+slow or unavailable.
+
+Questions are harvested from the interviewer's example list in
+prompts/interviewer_examples.txt and from any extra bank files in prompts/question_banks/*.txt (one
+``- "question"`` per line). They are indexed by keyword so that, given a
+raw prompt and the sections of the selected output template, five
+relevant questions can be returned without a network call.
+"""
+
+import glob
+import os
+import re
+from collections import Counter
+
+from utils.text_utils import tokenize
+
+_BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+PROMPTS_DIR = os.path.join(_BASE_DIR, "prompts")
+QUESTION_BANK_DIR = os.path.join(PROMPTS_DIR, "question_banks")
+
+_QUESTION_LINE_RE = re.compile(r'^\s*-\s*"(.+)"\s*$')
+
+# Score weights: matching the user's prompt matters more than the template
+_PROMPT_WEIGHT = 2.0
+_SECTION_WEIGHT = 1.0
+
+# ── Index ───────────────────────────────────────────────────────────
+_bank: list[str] | None = None
+_bank_terms: list[set[str]] = []
+_inverted: dict[str, list[int]] = {}
+
+
+def _bank_files() -> list[str]:
+    """Return every file that contributes questions to the bank."""
+    files = [os.path.join(PROMPTS_DIR, "interviewer_examples.txt")]
+    files += sorted(glob.glob(os.path.join(QUESTION_BANK_DIR, "*.txt")))
+    return files
+
+
+def _parse_bank_file(filepath: str) -> list[str]:
+    """Extract ``- "question"`` lines from a prompt/bank file."""
+    with open(filepath, "r", encoding="utf-8") as f:
+        return [m.group(1) for m in map(_QUESTION_LINE_RE.match, f) if m]
+
+
+def _load_bank() -> list[str]:
+    """Load and index the question bank (cached in module-level vars)."""
+    global _bank, _bank_terms, _inverted
+    if _bank is None:
+        questions: list[str] = []
+        seen = set()
+        for filepath in _bank_files():
+            for q in _parse_bank_file(filepath):
+                if q.lower() not in seen:
+                    seen.add(q.lower())
+                    questions.append(q)
+
+        _bank_terms = [set(tokenize(q)) for q in questions]
+        _inverted = {}
+        for i, terms in enumerate(_bank_terms):
+            for term in terms:
+                _inverted.setdefault(term, []).append(i)
+        _bank = questions
+    return _bank
+
+
+# ── Public API ──────────────────────────────────────────────────────
+def fallback_questions(
+    raw_prompt: str,
+    sections: list[str] | None = None,
+    count: int = 5,
+) -> list[str]:
+    """
+    Pick ``count`` relevant questions from the local bank.
+
+    One question is chosen per template section first (best match for
+    that section, ties broken by relevance to the prompt), then the rest
+    are filled by overall score so the set stays varied.
+    """
+    bank = _load_bank()
+    if not bank:
+        return []
+
+    prompt_scores: Counter = Counter()
+    for term in set(tokenize(raw_prompt)):
+        for i in _inverted.get(term, ()):
+            prompt_scores[i] += _PROMPT_WEIGHT
+
+    chosen: list[int] = []
+    overall: Counter = Counter(prompt_scores)
+    for section in sections or []:
+        section_scores: Counter = Counter()
+        for term in set(tokenize(section)):
+            for i in _inverted.get(term, ()):
+                section_scores[i] += _SECTION_WEIGHT
+        overall.update(section_scores)
+        if len(chosen) >= count:
+            continue
+        candidates = [i for i in section_scores if i not in chosen]
+        if candidates:
+            best = max(candidates, key=lambda i: (section_scores[i], prompt_scores[i], -i))
+            chosen.append(best)
+
+    # Fill up by overall relevance, then by bank order for stability
+    ranked = sorted(range(len(bank)), key=lambda i: (-overall[i], i))
+    for i in ranked:
+        if len(chosen) >= count:
+            break
+        if i not in chosen:
+            chosen.append(i)
+
+    return [bank[i] for i in chosen[:count]]
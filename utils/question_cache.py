@@ -0,0 +1,80 @@
+"""
+Precomputed Questions
+======================
+Clarifying questions for the built-in sidebar templates, generated
+offline by scripts/build_question_cache.py and served by analyze_prompt
+without an upstream call.
+
+Each entry is keyed by a hash of the model, the exact interviewer system
+prompt and the exact template text. Editing a template, an output
+template, a question type, the interviewer prompt files or the prompt
+mode therefore changes the key: stale entries simply stop matching until
+the cache is rebuilt, and a modified prompt never gets another prompt's
+questions. A user who selected a model other than the one the cache was
+built with gets that model's own questions.
+
+The file is gzip-compressed JSON:
+    {"version": 2, "model": "...", "built_at": ..., "entries": {key: [questions]}}
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+from typing import Any
+
+_BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+QUESTION_CACHE_FILE = os.path.join(_BASE_DIR, "data", "precomputed_questions.json.gz")
+CACHE_VERSION = 2
+
+_lock = threading.Lock()
+_entries: dict[str, list[str]] = {}
+_loaded_mtime: float | None = None
+
+
+def cache_key(system_instruction: str, prompt: str, model: str) -> str:
+    """Key for one (model, interviewer prompt, template text) combination."""
+    digest = hashlib.sha1()
+    digest.update(model.encode("utf-8"))
+    digest.update(b"\x00")
+    digest.update(system_instruction.encode("utf-8"))
+    digest.update(b"\x00")
+    digest.update(prompt.strip().encode("utf-8"))
+    return digest.hexdigest()[:20]
+
+
+def load_cache_file(path: str = QUESTION_CACHE_FILE) -> dict[str, Any]:
+    """Read the whole cache file; an empty cache if it is missing or unreadable."""
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {"version": CACHE_VERSION, "entries": {}}
+    if data.get("version") != CACHE_VERSION:
+        return {"version": CACHE_VERSION, "entries": {}}
+    return data
+
+
+def write_cache_file(data: dict[str, Any], path: str = QUESTION_CACHE_FILE) -> None:
+    """Write the cache atomically (temp file + rename)."""
+    tmp_path = f"{path}.tmp"
+    with gzip.open(tmp_path, "wt", encoding="utf-8", compresslevel=9) as f:
+        json.dump(data, f, ensure_ascii=False, separators=(",", ":"), sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def lookup_questions(system_instruction: str, prompt: str, model: str) -> list[str] | None:
+    """Return precomputed questions for this exact prompt and model, or None."""
+    global _entries, _loaded_mtime
+    try:
+        mtime = os.path.getmtime(QUESTION_CACHE_FILE)
+    except OSError:
+        return None
+    if mtime != _loaded_mtime:
+        with _lock:
+            if mtime != _loaded_mtime:
+                _entries = load_cache_file().get("entries", {})
+                _loaded_mtime = mtime
+    questions = _entries.get(cache_key(system_instruction, prompt, model))
+    return list(questions) if questions else None
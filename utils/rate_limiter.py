@@ -7,13 +7,25 @@ Tracks per-user daily prompt usage with two tiers:
 """
 
 import json
+import logging
 import os
+import re
+import threading
 import uuid
 from datetime import date
 
 import streamlit as st
+import streamlit.components.v1 as components
+
+logger = logging.getLogger(__name__)
 
 RATE_LIMIT_FILE = "data/rate_limits.json"
+CLIENT_TOKEN_PARAM = "cid"
+_CLIENT_TOKEN_RE = re.compile(r"^[0-9a-f]{16,32}$")
+# First-party cookie holding a random per-browser id, set by this app
+BROWSER_COOKIE = "pi_browser"
+BROWSER_COOKIE_MAX_AGE = 30 * 24 * 3600
+_BROWSER_ID_RE = re.compile(r"^[0-9a-f]{32}$")
 LOGGED_IN_DAILY_LIMIT = 5
 ANONYMOUS_DAILY_LIMIT = 1
 
@@ -46,6 +58,119 @@ def get_or_create_session_id() -> str:
     return st.session_state.anonymous_session_id
 
 
+# client token -> Streamlit session currently holding it
+_token_lock = threading.Lock()
+_token_sessions: dict[str, str] = {}
+
+
+def _session_is_active(session_id: str) -> bool:
+    try:
+        from streamlit.runtime import Runtime
+
+        return Runtime.instance().is_active_session(session_id)
+    except Exception:
+        return False
+
+
+def get_or_create_client_token() -> str:
+    """
+    Return this tab's client token, which survives reloads and reconnects.
+
+    Kept in the page URL (``?cid=...``) so a new Streamlit session for the
+    same browser tab sees the same token. A duplicated tab (or a copied
+    link) arrives with a token another connected session still holds and
+    gets a fresh one instead. Unlike the session id it is not used for
+    rate limits or history; it only finds in-flight engine jobs.
+    """
+    token = st.session_state.get("client_token")
+    if token is None:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+        ctx = get_script_run_ctx()
+        session_id = ctx.session_id if ctx is not None else ""
+        token = st.query_params.get(CLIENT_TOKEN_PARAM, "")
+        with _token_lock:
+            holder = _token_sessions.get(token)
+            if (
+                not _CLIENT_TOKEN_RE.match(token)
+                or (holder is not None and holder != session_id and _session_is_active(holder))
+            ):
+                token = uuid.uuid4().hex
+            for stale in [t for t, s in _token_sessions.items() if not _session_is_active(s)]:
+                del _token_sessions[stale]
+            _token_sessions[token] = session_id
+        st.session_state.client_token = token
+    if st.query_params.get(CLIENT_TOKEN_PARAM) != token:
+        st.query_params[CLIENT_TOKEN_PARAM] = token
+    return token
+
+
+def _set_browser_cookie(browser_id: str) -> None:
+    """Write the browser cookie from the page; it arrives with the next connection."""
+    script = (
+        "<script>"
+        "const secure = window.parent.location.protocol === 'https:' ? '; Secure' : '';"
+        f"window.parent.document.cookie = '{BROWSER_COOKIE}={browser_id}; path=/; "
+        f"max-age={BROWSER_COOKIE_MAX_AGE}; SameSite=Strict' + secure;"
+        "</script>"
+    )
+    # st.iframe replaces components.html in newer Streamlit releases
+    if hasattr(st, "iframe"):
+        st.iframe(script, height="content")
+    else:
+        components.html(script, height=0)
+
+
+def _browser_id() -> str | None:
+    """
+    Return a stable id for the browser, kept in the app's own cookie.
+
+    The id is random and carries nothing else. The cookie only reaches the
+    server with the next connection, so a browser without one gets a new id
+    for this session and the page stores it for the reloads that follow.
+    A malformed cookie is replaced the same way. Returns None outside a
+    browser session, and the caller falls back to the session id.
+    """
+    browser_id = st.session_state.get("browser_id")
+    if browser_id is not None:
+        return browser_id
+    try:
+        raw = st.context.cookies.get(BROWSER_COOKIE)
+    except Exception as e:
+        logger.warning("Cannot read the %s cookie, jobs are owned per session: %s", BROWSER_COOKIE, e)
+        return None
+    if not isinstance(raw, str):
+        raw = None
+    if raw is not None and _BROWSER_ID_RE.match(raw):
+        browser_id = raw
+    else:
+        if raw is not None:
+            logger.warning("Replacing a malformed %s cookie", BROWSER_COOKIE)
+        browser_id = uuid.uuid4().hex
+        _set_browser_cookie(browser_id)
+    st.session_state.browser_id = browser_id
+    return browser_id
+
+
+def get_job_owner(user_id: str, is_anonymous: bool) -> str:
+    """
+    Return the engine-job owner for this tab: the user plus the client token.
+
+    The token alone is only a URL parameter, so anyone holding a copy of
+    the link could pick up the job's inputs and result. Logged-in users
+    are bound by their account. Anonymous users are bound by their browser
+    (the app's browser cookie), since their session id changes on every
+    reload. If the browser keeps no cookies, every reload brings a new id
+    and a reload simply cannot reattach.
+    """
+    identity = user_id
+    if is_anonymous:
+        browser = _browser_id()
+        if browser is not None:
+            identity = f"browser-{browser}"
+    return f"{identity}:{get_or_create_client_token()}"
+
+
 # ── Core logic ──────────────────────────────────────────────────────
 def _get_daily_limit(is_anonymous: bool) -> int:
     """Return the correct daily limit for the user type."""
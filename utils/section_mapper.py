@@ -0,0 +1,122 @@
+"""
+Answer → Section Mapping
+=========================
+Decides which sections of a refined prompt an edited answer influences,
+so only those are regenerated, and renders a word-level diff of the
+result.
+
+A section's terms are the words of its template description plus its
+current content. An edited answer (question, old and new text) scores
+each section by the IDF-weighted terms they share; a section whose
+content quotes the old answer verbatim is always included. Sections
+scoring at least half of the best score are affected.
+"""
+
+import difflib
+import html
+import math
+import re
+
+from utils.output_validator import parse_sections, section_names
+from utils.text_utils import estimate_tokens, tokenize
+
+# Sections scoring at least this share of the best one are regenerated
+_RELATIVE_CUTOFF = 0.5
+# An old answer shorter than this is too generic to look for verbatim
+_MIN_QUOTE_LENGTH = 4
+
+
+def _section_terms(template_data: dict, refined: str) -> dict[str, set[str]]:
+    names = section_names(template_data)
+    descriptions = {
+        entry.split(":", 1)[0].strip(): entry
+        for entry in template_data.get("sections", [])
+    }
+    sections = parse_sections(refined, names)
+    return {
+        name: set(tokenize(descriptions.get(name, name))) | set(tokenize(sections.get(name, (0, 0, ""))[2]))
+        for name in names
+    }
+
+
+def affected_sections(
+    changed: dict[str, tuple[str, str]],
+    template_data: dict,
+    refined: str,
+) -> list[str]:
+    """
+    Return the sections, in template order, that the changed answers touch.
+
+    Args:
+        changed: {question: (old answer, new answer)}
+        template_data: the OUTPUT_TEMPLATES entry the prompt was refined with
+        refined: the current refined prompt
+
+    An empty list means nothing could be matched and the caller should
+    regenerate the whole prompt.
+    """
+    terms = _section_terms(template_data, refined)
+    if not terms:
+        return []
+    sections = parse_sections(refined, list(terms))
+
+    doc_freq: dict[str, int] = {}
+    for section in terms.values():
+        for term in section:
+            doc_freq[term] = doc_freq.get(term, 0) + 1
+    n_sections = len(terms)
+
+    selected: set[str] = set()
+    for question, (old, new) in changed.items():
+        query = set(tokenize(f"{question} {old} {new}"))
+        scores = {
+            name: sum(math.log(1 + n_sections / doc_freq[t]) for t in query & section)
+            for name, section in terms.items()
+        }
+        best = max(scores.values())
+        if best > 0:
+            selected.update(name for name, score in scores.items() if score >= best * _RELATIVE_CUTOFF)
+
+        quote = old.strip().lower()
+        if len(quote) >= _MIN_QUOTE_LENGTH:
+            selected.update(
+                name for name, (_, _, content) in sections.items() if quote in content.lower()
+            )
+
+    return [name for name in terms if name in selected]
+
+
+def section_tokens(text: str, template_data: dict, names: list[str]) -> int:
+    """Estimated tokens in the named sections of ``text``, headings included."""
+    sections = parse_sections(text, section_names(template_data))
+    return sum(estimate_tokens(text[start:end]) for name, (start, end, _) in sections.items() if name in names)
+
+
+# ── Diff ────────────────────────────────────────────────────────────
+_DIFF_TOKEN_RE = re.compile(r"\s+|[^\s]+")
+
+
+def word_diff_html(old: str, new: str) -> str:
+    """
+    Render ``new`` with insertions highlighted and deletions struck out.
+
+    Whitespace is kept as-is so the result can go into a pre-wrapped
+    block; all text is HTML-escaped.
+    """
+    old_tokens = _DIFF_TOKEN_RE.findall(old)
+    new_tokens = _DIFF_TOKEN_RE.findall(new)
+    parts = []
+    matcher = difflib.SequenceMatcher(None, old_tokens, new_tokens, autojunk=False)
+    for op, i1, i2, j1, j2 in matcher.get_opcodes():
+        removed = html.escape("".join(old_tokens[i1:i2]))
+        added = html.escape("".join(new_tokens[j1:j2]))
+        if op == "equal":
+            parts.append(added)
+            continue
+        if removed.strip():
+            parts.append(f"<del style='color:#F87171;'>{removed}</del>")
+        if added.strip():
+            parts.append(f"<ins style='color:#4ADE80; text-decoration:none; background:rgba(74,222,128,0.12);'>{added}</ins>")
+        elif added:
+            parts.append(added)
+    return "".join(parts)
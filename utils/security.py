@@ -1,5 +1,26 @@
+import codecs
 import re
-from typing import Optional, Tuple
+from typing import IO, Iterable, Iterator, Optional, Tuple, Union
+
+# Largest document accepted through the streaming path (characters)
+MAX_DOCUMENT_LENGTH = 2_000_000
+STREAM_CHUNK_SIZE = 64 * 1024
+# Characters carried over between chunks; longer than any injection match
+_STREAM_OVERLAP = 128
+
+INJECTION_PATTERNS = [
+    r"ignore (all )?(previous|above|prior) (instructions|prompts)",
+    r"disregard (all )?(previous|above|prior) (instructions|prompts)",
+    r"(new|updated) instructions:",
+    r"act as (a )?(hacker|attacker|malicious)",
+    r"system prompt:",
+    r"pretend (you are|to be)",
+    r"let's play a game",
+    r"in this scenario",
+    r"override",
+    r"bypass",
+]
+_INJECTION_RES = [re.compile(p, re.IGNORECASE) for p in INJECTION_PATTERNS]
 
 
 def validate_input_length(input_text: str, max_length: int = 4000) -> bool:
@@ -28,21 +49,8 @@ def detect_prompt_injection(input_text: str) -> Tuple[bool, Optional[str]]:
     Returns:
         (is_injection, reason)
     """
-    injection_patterns = [
-        r"ignore (all )?(previous|above|prior) (instructions|prompts)",
-        r"disregard (all )?(previous|above|prior) (instructions|prompts)",
-        r"(new|updated) instructions:",
-        r"act as (a )?(hacker|attacker|malicious)",
-        r"system prompt:",
-        r"pretend (you are|to be)",
-        r"let's play a game",
-        r"in this scenario",
-        r"override",
-        r"bypass",
-    ]
-
-    for pattern in injection_patterns:
-        if re.search(pattern, input_text, re.IGNORECASE):
+    for pattern, compiled in zip(INJECTION_PATTERNS, _INJECTION_RES):
+        if compiled.search(input_text):
             return True, f"Detected potential injection pattern: {pattern}"
 
     # Check for excessive special characters (potential encoding attacks)
@@ -55,6 +63,7 @@ def detect_prompt_injection(input_text: str) -> Tuple[bool, Optional[str]]:
 
 def validate_and_sanitize_user_input(
     input_text: str,
+    max_length: int = 4000,
 ) -> Tuple[Optional[str], Optional[str]]:
     """
     Comprehensive input validation pipeline.
@@ -62,19 +71,107 @@ def validate_and_sanitize_user_input(
     Returns:
         (sanitized_text, error_message) — one of them is always None.
     """
-    # Check length
-    if not validate_input_length(input_text):
-        return None, "Input is too long (max 4000 characters)"
+    return validate_and_sanitize_stream([input_text], max_length=max_length)
+
+
+# ── Streaming validation ────────────────────────────────────────────
+def _iter_text_chunks(
+    source: Union[str, IO, Iterable[str]],
+    chunk_size: int = STREAM_CHUNK_SIZE,
+) -> Iterator[str]:
+    """Yield text chunks from a string, text/binary file or iterable of str."""
+    if isinstance(source, str):
+        for start in range(0, len(source), chunk_size):
+            yield source[start:start + chunk_size]
+        return
+
+    if hasattr(source, "read"):
+        # Binary uploads are decoded incrementally; invalid bytes are dropped
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+        while True:
+            block = source.read(chunk_size)
+            if not block:
+                break
+            yield decoder.decode(block) if isinstance(block, bytes) else block
+        tail = decoder.decode(b"", final=True)
+        if tail:
+            yield tail
+        return
+
+    for chunk in source:
+        for start in range(0, len(chunk), chunk_size):
+            yield chunk[start:start + chunk_size]
+
+
+def iter_validated_chunks(
+    source: Union[str, IO, Iterable[str]],
+    max_length: int = MAX_DOCUMENT_LENGTH,
+) -> Iterator[str]:
+    """
+    Single-pass, bounded-memory validation of a text stream.
+
+    Yields sanitized chunks (null bytes removed, invalid UTF-8 dropped,
+    leading/trailing whitespace stripped). Injection patterns are matched
+    over a sliding window that overlaps chunk boundaries, and the length
+    limit is checked as text arrives, so a violation stops reading at once.
 
-    # Detect injection
-    is_injection, reason = detect_prompt_injection(input_text)
-    if is_injection:
-        return None, f"Security alert: {reason}"
+    Raises:
+        ValueError: On the first violation, with the same messages as
+            validate_and_sanitize_user_input.
+    """
+    length = 0
+    non_ascii = 0
+    carry = ""        # tail of the previous chunk, for cross-boundary matches
+    pending_ws = ""   # trailing whitespace held back until more text arrives
+    started = False
+
+    for chunk in _iter_text_chunks(source):
+        length += len(chunk)
+        if length > max_length:
+            raise ValueError(f"Input is too long (max {max_length} characters)")
+
+        window = carry + chunk
+        for pattern, compiled in zip(INJECTION_PATTERNS, _INJECTION_RES):
+            if compiled.search(window):
+                raise ValueError(f"Security alert: Detected potential injection pattern: {pattern}")
+        carry = window[-_STREAM_OVERLAP:]
+
+        if not chunk.isascii():
+            non_ascii += sum(1 for c in chunk if ord(c) > 127)
+            chunk = chunk.encode("utf-8", "ignore").decode("utf-8")
+
+        chunk = chunk.replace("\x00", "")
+        if not started:
+            chunk = chunk.lstrip()
+            if not chunk:
+                continue
+            started = True
+        body = chunk.rstrip()
+        if body:
+            yield pending_ws + body
+            pending_ws = chunk[len(body):]
+        else:
+            pending_ws += chunk
+
+    if non_ascii > length * 0.5:
+        raise ValueError("Security alert: Too many special characters detected")
+
+
+def validate_and_sanitize_stream(
+    source: Union[str, IO, Iterable[str]],
+    max_length: int = MAX_DOCUMENT_LENGTH,
+) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Validate a large text, text stream or uploaded file in one pass.
 
-    # Sanitize
-    sanitized = sanitize_input(input_text)
+    Returns:
+        (sanitized_text, error_message) — one of them is always None.
+    """
+    try:
+        sanitized = "".join(iter_validated_chunks(source, max_length=max_length))
+    except ValueError as e:
+        return None, str(e)
 
-    # Final empty check
     if not sanitized:
         return None, "Input cannot be empty"
 
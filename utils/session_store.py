@@ -0,0 +1,210 @@
+"""
+Session Store
+==============
+Keeps each Streamlit session's memory footprint bounded.
+
+Only the artifacts the current step actually renders stay in
+``st.session_state``; the rest are spilled to a compact on-disk store
+(zlib-compressed JSON in SQLite) and replaced by a small ``SpillHandle``.
+``get_artifact`` transparently loads a spilled value back when it is
+read, without putting it back into session_state.
+
+If the working set alone exceeds SESSION_MEMORY_CAP bytes, the largest
+artifacts are spilled as well. The app enforces this at the start and at
+the end of every rerun, so no session holds more than the cap while it
+sits idle between reruns. ``memory_report`` lists the footprint of every
+live session on this server process as of its last rerun; it names
+sessions, so the app only shows it with SESSION_MEMORY_REPORT=1.
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from typing import Any, NamedTuple
+
+import streamlit as st
+
+from utils.rate_limiter import get_or_create_session_id
+
+SPILL_DB = "data/session_spill.db"
+SESSION_MEMORY_CAP = int(os.getenv("SESSION_MEMORY_CAP", str(64 * 1024)))
+# The cross-session memory report is an operator tool, off unless enabled
+MEMORY_REPORT_ENABLED = os.getenv("SESSION_MEMORY_REPORT", "0") == "1"
+# Spilled rows and report entries untouched for this long are purged
+SESSION_TTL_SECONDS = 6 * 3600
+
+ARTIFACT_KEYS = (
+    "raw_prompt", "questions", "answers", "refined_prompt", "english_prompt", "previous_refined_prompt",
+)
+WORKING_SETS: dict[str, set[str]] = {
+    "input": {"raw_prompt"},
+    "questions": {"raw_prompt", "questions"},
+    # The result step checks the raw prompt's language on every rerun
+    "result": {"raw_prompt", "answers", "refined_prompt", "english_prompt", "previous_refined_prompt"},
+}
+# Values smaller than this aren't worth a disk round trip
+_MIN_SPILL_BYTES = 256
+
+
+class SpillHandle(NamedTuple):
+    """Placeholder left in session_state for a spilled artifact."""
+
+    session_id: str
+    key: str
+    nbytes: int
+    # Size of the value when resident, to know whether it fits back
+    resident_bytes: int
+
+
+_local = threading.local()
+_reports_lock = threading.Lock()
+_reports: dict[str, dict[str, Any]] = {}
+
+
+# ── Disk store ──────────────────────────────────────────────────────
+def _get_connection() -> sqlite3.Connection:
+    """Return this thread's connection, creating the schema on first use."""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        os.makedirs(os.path.dirname(SPILL_DB) or ".", exist_ok=True)
+        conn = sqlite3.connect(SPILL_DB, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS spill ("
+            " session_id TEXT NOT NULL, key TEXT NOT NULL, payload BLOB NOT NULL,"
+            " updated_at REAL NOT NULL, PRIMARY KEY (session_id, key))"
+        )
+        with conn:
+            conn.execute(
+                "DELETE FROM spill WHERE updated_at < ?",
+                (time.time() - SESSION_TTL_SECONDS,),
+            )
+        _local.conn = conn
+    return conn
+
+
+def _spill(session_id: str, key: str, value: Any) -> SpillHandle:
+    """Write one artifact to disk and return its handle."""
+    blob = zlib.compress(json.dumps(value, ensure_ascii=False).encode("utf-8"), 6)
+    conn = _get_connection()
+    with conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO spill (session_id, key, payload, updated_at) "
+            "VALUES (?, ?, ?, ?)",
+            (session_id, key, blob, time.time()),
+        )
+    return SpillHandle(session_id, key, len(blob), _deep_sizeof(value))
+
+
+def _unspill(handle: SpillHandle) -> Any:
+    """Read a spilled artifact back from disk."""
+    row = _get_connection().execute(
+        "SELECT payload FROM spill WHERE session_id = ? AND key = ?",
+        (handle.session_id, handle.key),
+    ).fetchone()
+    if row is None:
+        return None
+    return json.loads(zlib.decompress(row[0]).decode("utf-8"))
+
+
+# ── Size accounting ─────────────────────────────────────────────────
+def _deep_sizeof(value: Any) -> int:
+    """Approximate in-process size of a JSON-like value, in bytes."""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(_deep_sizeof(k) + _deep_sizeof(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set)) and not isinstance(value, SpillHandle):
+        size += sum(_deep_sizeof(v) for v in value)
+    return size
+
+
+# ── Public API ──────────────────────────────────────────────────────
+def get_artifact(key: str, default: Any = None) -> Any:
+    """
+    Read an artifact from session_state, loading it from disk if spilled.
+
+    A loaded value is only returned, not stored back, so a spilled
+    artifact stays spilled.
+    """
+    value = st.session_state.get(key, default)
+    if isinstance(value, SpillHandle):
+        value = _unspill(value)
+        if value is None:
+            value = default
+    return value
+
+
+def enforce_working_set(step: str) -> None:
+    """
+    Spill every artifact outside ``step``'s working set, load spilled
+    working-set artifacts back while they fit, then spill the largest
+    remaining ones until the session fits SESSION_MEMORY_CAP.
+    """
+    session_id = get_or_create_session_id()
+    working = WORKING_SETS.get(step, set(ARTIFACT_KEYS))
+
+    resident: dict[str, int] = {}
+    for key in ARTIFACT_KEYS:
+        value = st.session_state.get(key)
+        if value is None or isinstance(value, SpillHandle):
+            continue
+        resident[key] = _deep_sizeof(value)
+
+    for key, nbytes in list(resident.items()):
+        if key not in working and nbytes >= _MIN_SPILL_BYTES:
+            st.session_state[key] = _spill(session_id, key, st.session_state[key])
+            del resident[key]
+
+    for key in sorted(working):
+        handle = st.session_state.get(key)
+        if isinstance(handle, SpillHandle) and sum(resident.values()) + handle.resident_bytes <= SESSION_MEMORY_CAP:
+            value = _unspill(handle)
+            if value is not None:
+                st.session_state[key] = value
+                resident[key] = handle.resident_bytes
+
+    for key in sorted(resident, key=resident.get, reverse=True):
+        if sum(resident.values()) <= SESSION_MEMORY_CAP:
+            break
+        st.session_state[key] = _spill(session_id, key, st.session_state[key])
+        del resident[key]
+
+    _update_report(session_id, step)
+
+
+def _update_report(session_id: str, step: str) -> None:
+    """Record this session's current footprint for memory_report()."""
+    resident = spilled = handles = 0
+    for key in ARTIFACT_KEYS:
+        value = st.session_state.get(key)
+        if isinstance(value, SpillHandle):
+            handles += 1
+            spilled += value.nbytes
+        elif value is not None:
+            resident += _deep_sizeof(value)
+    total_state = sum(_deep_sizeof(st.session_state[k]) for k in list(st.session_state.keys()))
+
+    now = time.time()
+    with _reports_lock:
+        _reports[session_id] = {
+            "session_id": session_id,
+            "step": step,
+            "resident_artifact_bytes": resident,
+            "spilled_bytes_on_disk": spilled,
+            "spilled_artifacts": handles,
+            "session_state_bytes": total_state,
+            "updated_at": now,
+        }
+        for sid in [s for s, r in _reports.items() if now - r["updated_at"] > SESSION_TTL_SECONDS]:
+            del _reports[sid]
+
+
+def memory_report() -> list[dict[str, Any]]:
+    """Return the last recorded footprint of every active session."""
+    with _reports_lock:
+        return sorted(_reports.values(), key=lambda r: r["updated_at"], reverse=True)
@@ -0,0 +1,183 @@
+"""
+Output Template Recommender
+============================
+Local keyword classifier that suggests an OUTPUT_TEMPLATES entry for a
+raw prompt — no LLM call, a few microseconds per lookup.
+
+Each template is indexed by the words of its name, description and
+sections (TF-IDF weighted), plus a small list of hand-picked hint words.
+Choices made by users are logged to data/template_choices.json and folded
+into the index as an extra, lower-weighted source of terms. Updates to the
+file are serialized by a lock and written atomically (temp file + rename),
+so concurrent sessions neither lose each other's choices nor read a
+half-written file.
+"""
+
+import json
+import math
+import os
+import tempfile
+import threading
+from collections import Counter
+
+from utils.ai_engine import DEFAULT_TEMPLATE, OUTPUT_TEMPLATES
+from utils.text_utils import tokenize
+
+CHOICES_FILE = "data/template_choices.json"
+
+_choices_lock = threading.Lock()
+
+# Weight of logged user choices relative to the template's own text
+_LEARNED_WEIGHT = 0.3
+# Maximum number of terms remembered per template from logged choices
+_MAX_LEARNED_TERMS = 500
+
+# Extra vocabulary the template texts don't mention but users do
+_KEYWORD_HINTS: dict[str, list[str]] = {
+    "RTF (Role-Task-Format)": [
+        "write", "generate", "create", "translate", "rewrite", "format", "tulis", "buat",
+    ],
+    "Chain of Thought": [
+        "debug", "bug", "error", "fix", "math", "calculate", "solve", "proof",
+        "algorithm", "optimize", "code", "kode", "hitung",
+    ],
+    "RISEN (Role-Instructions-Steps-End goal-Narrowing)": [
+        "project", "plan", "roadmap", "milestone", "deliverable", "launch", "proyek",
+    ],
+    "RODES (Role-Objective-Details-Examples-Sense check)": [
+        "design", "architecture", "system", "api", "schema", "proposal", "spec", "desain",
+    ],
+    "Chain of Density": [
+        "summarize", "summary", "tldr", "condense", "compress", "shorten", "ringkas", "ringkasan",
+    ],
+    "RACE (Role-Audience-Context-Expectation)": [
+        "email", "presentation", "pitch", "announcement", "blog", "post", "speech",
+        "story", "newsletter", "artikel", "cerita",
+    ],
+    "RISE (Research-Investigate-Synthesize-Evaluate)": [
+        "research", "analyze", "analysis", "compare", "investigate", "market", "riset", "analisis",
+    ],
+    "STAR (Situation-Task-Action-Result)": [
+        "interview", "case", "retrospective", "postmortem", "experience", "resume",
+    ],
+    "SOAP (Subjective-Objective-Assessment-Plan)": [
+        "incident", "report", "log", "diagnosis", "symptom", "outage", "laporan",
+    ],
+    "CLEAR (Collaborative-Limited-Emotional-Appreciable-Refinable)": [
+        "okr", "kpi", "goal", "objective", "team", "target", "quarter",
+    ],
+    "GROW (Goal-Reality-Options-Will)": [
+        "coach", "coaching", "career", "habit", "mentor", "learn", "improve", "belajar",
+    ],
+}
+
+
+# ── Learned choices ─────────────────────────────────────────────────
+def load_template_choices() -> dict:
+    """Load logged template choices ({template: {term: count}})."""
+    if not os.path.exists(CHOICES_FILE):
+        return {}
+    try:
+        with open(CHOICES_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def save_template_choices(choices: dict) -> None:
+    """Persist logged template choices to the JSON file atomically (temp file + rename)."""
+    directory = os.path.dirname(CHOICES_FILE) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".template_choices.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(choices, f, indent=2)
+        os.replace(tmp_path, CHOICES_FILE)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+# ── Index ───────────────────────────────────────────────────────────
+_index: dict[str, dict[str, float]] | None = None
+
+
+def _sublinear_tf(tf: float) -> float:
+    """1 + log(tf), continued linearly below 1 so learned fractional counts stay positive."""
+    return tf if tf < 1 else 1 + math.log(tf)
+
+
+def _build_index() -> dict[str, dict[str, float]]:
+    """Build L2-normalised TF-IDF vectors for every output template."""
+    learned = load_template_choices()
+    term_counts: dict[str, Counter] = {}
+    for name, data in OUTPUT_TEMPLATES.items():
+        text = " ".join([name, data.get("description", ""), *data.get("sections", [])])
+        counts = Counter(tokenize(text))
+        counts.update(tokenize(" ".join(_KEYWORD_HINTS.get(name, []))))
+        for term, n in learned.get(name, {}).items():
+            counts[term] += _LEARNED_WEIGHT * n
+        term_counts[name] = counts
+
+    doc_freq = Counter(term for counts in term_counts.values() for term in counts)
+    n_docs = len(term_counts)
+
+    index = {}
+    for name, counts in term_counts.items():
+        vector = {
+            term: _sublinear_tf(tf) * math.log((1 + n_docs) / (1 + doc_freq[term]))
+            for term, tf in counts.items()
+            if tf > 0
+        }
+        norm = math.sqrt(sum(w * w for w in vector.values())) or 1.0
+        index[name] = {term: w / norm for term, w in vector.items()}
+    return index
+
+
+def _get_index() -> dict[str, dict[str, float]]:
+    """Return the cached template index, building it on first use."""
+    global _index
+    if _index is None:
+        _index = _build_index()
+    return _index
+
+
+# ── Public API ──────────────────────────────────────────────────────
+def rank_templates(raw_prompt: str, top_k: int = 3) -> list[tuple[str, float]]:
+    """Return the ``top_k`` (template, score) pairs for a raw prompt."""
+    terms = tokenize(raw_prompt)
+    if not terms:
+        return []
+    index = _get_index()
+    query = Counter(terms)
+    scores = [
+        (name, sum(vector.get(term, 0.0) * n for term, n in query.items()))
+        for name, vector in index.items()
+    ]
+    scores = [s for s in scores if s[1] > 0]
+    scores.sort(key=lambda s: s[1], reverse=True)
+    return scores[:top_k]
+
+
+def recommend_template(raw_prompt: str) -> str:
+    """Return the best-matching output template, or DEFAULT_TEMPLATE."""
+    ranked = rank_templates(raw_prompt, top_k=1)
+    return ranked[0][0] if ranked else DEFAULT_TEMPLATE
+
+
+def record_template_choice(raw_prompt: str, template: str) -> None:
+    """Log the template a user actually ran with, to refine future suggestions."""
+    global _index
+    if template not in OUTPUT_TEMPLATES:
+        return
+    terms = tokenize(raw_prompt)
+    if not terms:
+        return
+
+    with _choices_lock:
+        choices = load_template_choices()
+        learned = Counter(choices.get(template, {}))
+        learned.update(set(terms))
+        choices[template] = dict(learned.most_common(_MAX_LEARNED_TERMS))
+        save_template_choices(choices)
+    _index = None  # Rebuild with the new counts on next lookup
@@ -0,0 +1,279 @@
+"""
+Template Store
+===============
+Indexed library of sidebar prompt templates, built to hold thousands of
+shared and user-contributed entries without slowing the sidebar down.
+
+Storage is a single SQLite file:
+  • ``templates``       — one row per template (name, icon, English and
+                          Indonesian text, author, built-in flag).
+  • ``template_grams``  — trigram postings over each template's name and
+                          text, for prefix, substring and typo-tolerant
+                          search. Name trigrams weigh twice as much.
+
+The built-in templates in data/templates.json are imported on first use
+and re-imported whenever that file changes. Every write is a single
+transaction, so concurrent additions from several sessions are safe.
+A user template can only replace that same author's template of the same
+name; names taken by a built-in or by someone else are refused.
+"""
+
+import hashlib
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any
+
+_BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+
+TEMPLATE_DB = "data/templates.db"
+BUILTIN_TEMPLATES_FILE = os.path.join(_BASE_DIR, "data", "templates.json")
+TEMPLATE_PAGE_SIZE = 10
+
+# Share of the query's trigrams a template must contain to match
+_FUZZY_MIN_SHARE = 0.5
+_NAME_WEIGHT = 2
+_BODY_WEIGHT = 1
+
+_local = threading.local()
+_seed_lock = threading.Lock()
+_seeded_mtime: float | None = None
+
+
+# ── Connection ──────────────────────────────────────────────────────
+def _get_connection() -> sqlite3.Connection:
+    """Return this thread's connection, creating the schema on first use."""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        os.makedirs(os.path.dirname(TEMPLATE_DB) or ".", exist_ok=True)
+        conn = sqlite3.connect(TEMPLATE_DB, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS templates (
+                id          INTEGER PRIMARY KEY,
+                name        TEXT NOT NULL UNIQUE,
+                name_key    TEXT NOT NULL,
+                icon        TEXT NOT NULL,
+                text_en     TEXT NOT NULL,
+                text_id     TEXT NOT NULL,
+                author      TEXT,
+                builtin     INTEGER NOT NULL DEFAULT 0,
+                updated_at  REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_templates_name_key
+                ON templates (name_key);
+            CREATE TABLE IF NOT EXISTS template_grams (
+                gram         TEXT NOT NULL,
+                template_id  INTEGER NOT NULL,
+                weight       INTEGER NOT NULL,
+                PRIMARY KEY (gram, template_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_template_grams_template
+                ON template_grams (template_id);
+            CREATE TABLE IF NOT EXISTS meta (
+                key    TEXT PRIMARY KEY,
+                value  TEXT NOT NULL
+            );
+            """
+        )
+        _local.conn = conn
+    return conn
+
+
+# ── Trigrams ────────────────────────────────────────────────────────
+_WORD_RE = re.compile(r"\w+")
+
+
+def _name_key(name: str) -> str:
+    return " ".join(_WORD_RE.findall(name.lower()))
+
+
+def _trigrams(text: str) -> set[str]:
+    """Word-padded trigrams, so 'blog' gives '  b', ' bl', 'blo', 'log', 'og '."""
+    grams = set()
+    for word in _WORD_RE.findall(text.lower()):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def _index_rows(template_id: int, name: str, text_en: str, text_id: str) -> list[tuple]:
+    """Posting rows for one template; a gram in the name keeps the name weight."""
+    weights = dict.fromkeys(_trigrams(f"{text_en} {text_id}"), _BODY_WEIGHT)
+    weights.update(dict.fromkeys(_trigrams(name), _NAME_WEIGHT))
+    return [(gram, template_id, weight) for gram, weight in weights.items()]
+
+
+def _upsert(
+    conn: sqlite3.Connection,
+    name: str,
+    icon: str,
+    text_en: str,
+    text_id: str,
+    author: str | None,
+    builtin: bool,
+) -> int:
+    """Insert or replace one template and its postings (caller owns the transaction)."""
+    conn.execute(
+        "INSERT INTO templates (name, name_key, icon, text_en, text_id, author, builtin, updated_at) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+        "ON CONFLICT (name) DO UPDATE SET name_key = excluded.name_key, icon = excluded.icon, "
+        "text_en = excluded.text_en, text_id = excluded.text_id, author = excluded.author, "
+        "builtin = excluded.builtin, updated_at = excluded.updated_at",
+        (name, _name_key(name), icon, text_en, text_id, author, int(builtin), time.time()),
+    )
+    template_id = conn.execute("SELECT id FROM templates WHERE name = ?", (name,)).fetchone()[0]
+    conn.execute("DELETE FROM template_grams WHERE template_id = ?", (template_id,))
+    conn.executemany(
+        "INSERT INTO template_grams (gram, template_id, weight) VALUES (?, ?, ?)",
+        _index_rows(template_id, name, text_en, text_id),
+    )
+    return template_id
+
+
+# ── Built-in seed ───────────────────────────────────────────────────
+def _ensure_seeded() -> None:
+    """Import data/templates.json when it is new or has changed on disk."""
+    global _seeded_mtime
+    try:
+        mtime = os.path.getmtime(BUILTIN_TEMPLATES_FILE)
+    except OSError:
+        return
+    if mtime == _seeded_mtime:
+        return
+
+    with _seed_lock:
+        if mtime == _seeded_mtime:
+            return
+        with open(BUILTIN_TEMPLATES_FILE, "rb") as f:
+            raw = f.read()
+        digest = hashlib.sha1(raw).hexdigest()
+
+        conn = _get_connection()
+        row = conn.execute("SELECT value FROM meta WHERE key = 'builtin_sha1'").fetchone()
+        if row is None or row[0] != digest:
+            builtins = json.loads(raw.decode("utf-8"))
+            with conn:
+                stale = conn.execute("SELECT id, name FROM templates WHERE builtin = 1").fetchall()
+                for template_id, name in stale:
+                    if name not in builtins:
+                        conn.execute("DELETE FROM template_grams WHERE template_id = ?", (template_id,))
+                        conn.execute("DELETE FROM templates WHERE id = ?", (template_id,))
+                for name, data in builtins.items():
+                    _upsert(
+                        conn, name, data.get("icon", "file-text"),
+                        data.get("en", ""), data.get("id", ""), None, builtin=True,
+                    )
+                conn.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES ('builtin_sha1', ?)", (digest,)
+                )
+        _seeded_mtime = mtime
+
+
+def _row_to_template(row: tuple) -> dict[str, Any]:
+    return {
+        "template_id": row[0],
+        "name": row[1],
+        "icon": row[2],
+        "en": row[3],
+        "id": row[4],
+        "author": row[5],
+        "builtin": bool(row[6]),
+    }
+
+
+_COLUMNS = "t.id, t.name, t.icon, t.text_en, t.text_id, t.author, t.builtin"
+
+
+# ── Public API ──────────────────────────────────────────────────────
+def add_template(
+    name: str,
+    text_en: str,
+    text_id: str = "",
+    icon: str = "file-text",
+    author: str | None = None,
+) -> int:
+    """
+    Add a template, or replace the author's own template of the same name.
+
+    Names are compared ignoring case and punctuation. A name already used
+    by a built-in, by an anonymous template or by another author raises
+    ValueError. The row and its index are written in one transaction.
+    Returns the template id.
+    """
+    name = name.strip()
+    if not name:
+        raise ValueError("Template name cannot be empty.")
+    _ensure_seeded()
+    conn = _get_connection()
+    with conn:
+        # BEGIN IMMEDIATE: no other writer can take the name between check and insert
+        conn.execute("BEGIN IMMEDIATE")
+        for existing, owner, builtin in conn.execute(
+            "SELECT name, author, builtin FROM templates WHERE name_key = ?", (_name_key(name),)
+        ):
+            if builtin or author is None or owner != author or existing != name:
+                raise ValueError(f"Template name '{name}' is already taken.")
+        return _upsert(conn, name, icon, text_en, text_id or text_en, author, builtin=False)
+
+
+def search_templates(
+    query: str = "",
+    page: int = 0,
+    page_size: int = TEMPLATE_PAGE_SIZE,
+) -> tuple[list[dict[str, Any]], bool]:
+    """
+    Return one page of templates matching ``query``.
+
+    No query lists the built-ins first, then everything else by name.
+    Queries shorter than three characters match the start of any word in
+    the name (through the word-start trigram, so still an index lookup),
+    whole-name prefixes first; longer ones rank by shared trigrams, which
+    tolerates typos and matches inside names and text.
+
+    Returns:
+        (templates, has_more)
+    """
+    _ensure_seeded()
+    conn = _get_connection()
+    offset = max(page, 0) * page_size
+    key = _name_key(query)
+    grams = _trigrams(query)
+
+    if not key:
+        rows = conn.execute(
+            # Built-ins first, in data/templates.json order, then by name
+            f"SELECT {_COLUMNS} FROM templates t "
+            f"ORDER BY t.builtin DESC, CASE WHEN t.builtin THEN t.id END, t.name_key "
+            f"LIMIT ? OFFSET ?",
+            (page_size + 1, offset),
+        ).fetchall()
+    elif len(key) < 3:
+        # 'bl' is the gram ' bl' of every name word starting with it
+        rows = conn.execute(
+            f"SELECT {_COLUMNS} FROM templates t JOIN template_grams g ON g.template_id = t.id "
+            f"WHERE g.gram = ? AND g.weight = ? "
+            f"ORDER BY t.name_key >= ? AND t.name_key < ? DESC, t.name_key LIMIT ? OFFSET ?",
+            (f"  {key}"[-3:], _NAME_WEIGHT, key, key + "\uffff", page_size + 1, offset),
+        ).fetchall()
+    else:
+        placeholders = ",".join("?" * len(grams))
+        min_hits = max(1, math.ceil(len(grams) * _FUZZY_MIN_SHARE))
+        rows = conn.execute(
+            f"SELECT {_COLUMNS} FROM templates t JOIN ("
+            f"  SELECT template_id, SUM(weight) AS score FROM template_grams "
+            f"  WHERE gram IN ({placeholders}) GROUP BY template_id HAVING COUNT(*) >= ?"
+            f") AS hits ON t.id = hits.template_id "
+            f"ORDER BY hits.score DESC, t.name_key LIMIT ? OFFSET ?",
+            (*grams, min_hits, page_size + 1, offset),
+        ).fetchall()
+
+    templates = [_row_to_template(r) for r in rows[:page_size]]
+    return templates, len(rows) > page_size
+
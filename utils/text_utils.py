@@ -0,0 +1,93 @@
+"""
+Text Utilities
+===============
+Shared, dependency-free helpers for the local (no-LLM) text features:
+tokenization with light stemming, sentence splitting and a cheap token
+estimate, used by the recommender, the question bank and the context
+compressor.
+"""
+
+import re
+
+STOPWORDS = {
+    "the", "and", "for", "with", "that", "this", "you", "your", "are", "what",
+    "who", "how", "why", "when", "where", "from", "into", "each", "all", "any",
+    "should", "will", "can", "about", "define", "specify", "describe", "provide",
+    "yang", "dan", "untuk", "dengan", "dari", "ini", "itu", "saya", "tentang",
+}
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_SUFFIXES = ("ization", "ation", "ize", "ing", "ed", "es", "s")
+
+
+def stem(word: str) -> str:
+    """Crude suffix stripping so 'summarize' and 'summarization' meet."""
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            word = word[: -len(suffix)]
+            if len(word) > 3 and word[-1] == word[-2]:
+                word = word[:-1]  # debugging → debugg → debug
+            break
+    return word
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercase, split, drop stopwords and very short tokens, then stem."""
+    return [
+        stem(w)
+        for w in _TOKEN_RE.findall(text.lower())
+        if len(w) >= 3 and w not in STOPWORDS
+    ]
+
+
+# Frequent English words, used to tell English text from other languages
+_COMMON_ENGLISH = set("""
+a about above after again all also an and any are as at be because been before
+being below between both but by can could did do does doing down during each
+few for from further had has have having he her here him his how i if in into
+is it its just make me more most my no not now of off on once only or other
+our out over own same she should so some such than that the their them then
+there these they this those through to too under until up very was we were
+what when where which while who whom why will with would you your
+write create explain generate use using include list step steps example examples
+format output role task goal context audience tone style length word words
+short long simple clear detailed professional technical creative code data
+user users team project plan report summary question questions answer answers
+information content topic article blog post email story language model prompt
+response section sections first second final new best key main specific each
+should must need needs want help provide describe define keep avoid ensure
+""".split())
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count without a tokenizer download: one token per four
+    characters.
+
+    The same rule applies to every language, so comparing an English and
+    an Indonesian text measures their length, not a guess about which
+    words a vocabulary happens to contain.
+    """
+    return -(-len(text) // 4)
+
+
+_WORD_RE = re.compile(r"[^\W\d_]+")
+
+# English prose scores ~0.5-0.7 here; Indonesian scores under 0.1
+_ENGLISH_SHARE_THRESHOLD = 0.3
+
+
+def looks_english(text: str) -> bool:
+    """Guess whether text is English from its share of common English words."""
+    words = _WORD_RE.findall(text.lower())
+    if not words:
+        return False
+    return sum(w in _COMMON_ENGLISH for w in words) / len(words) >= _ENGLISH_SHARE_THRESHOLD
+
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+|\n+")
+
+
+def split_sentences(text: str) -> list[str]:
+    """Split text on sentence punctuation and line breaks."""
+    return [s.strip() for s in _SENTENCE_RE.split(text) if s.strip()]